@@ -0,0 +1,143 @@
+"""Index subscriptions by their scheduled UTC minute of day.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "0008"
+down_revision: str | Sequence[str] | None = "0007"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("subscriptions", sa.Column("due_utc_minute", sa.SMALLINT(), nullable=True))
+    op.execute(
+        """
+        CREATE FUNCTION subscription_due_utc_minute(local_time TIME, timezone_offset_minutes SMALLINT)
+        RETURNS SMALLINT
+        LANGUAGE sql
+        IMMUTABLE
+        RETURN (
+            (
+                (EXTRACT(HOUR FROM local_time)::INTEGER * 60 + EXTRACT(MINUTE FROM local_time)::INTEGER
+                    - timezone_offset_minutes) % 1440 + 1440
+            ) % 1440
+        )::SMALLINT
+        """
+    )
+    op.execute(
+        """
+        UPDATE subscriptions AS s
+        SET due_utc_minute = subscription_due_utc_minute(st.time, u.timezone_offset_minutes)
+        FROM subscription_types AS st, users AS u
+        WHERE st.id = s.subscription_type_id
+          AND u.id = s.user_id
+        """
+    )
+    op.alter_column("subscriptions", "due_utc_minute", existing_type=sa.SMALLINT(), nullable=False)
+    op.create_check_constraint(
+        "subscriptions_due_utc_minute_range",
+        "subscriptions",
+        "due_utc_minute BETWEEN 0 AND 1439",
+    )
+    op.create_index(
+        "subscriptions_due_utc_minute_idx",
+        "subscriptions",
+        ["due_utc_minute", "subscription_type_id", "user_id"],
+        unique=False,
+    )
+
+    op.execute(
+        """
+        CREATE FUNCTION subscriptions_set_due_utc_minute() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            SELECT subscription_due_utc_minute(st.time, u.timezone_offset_minutes)
+            INTO NEW.due_utc_minute
+            FROM subscription_types AS st, users AS u
+            WHERE st.id = NEW.subscription_type_id
+              AND u.id = NEW.user_id;
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER subscriptions_set_due_utc_minute
+        BEFORE INSERT OR UPDATE OF subscription_type_id, user_id ON subscriptions
+        FOR EACH ROW EXECUTE FUNCTION subscriptions_set_due_utc_minute()
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION users_refresh_subscription_due_utc_minute() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            UPDATE subscriptions AS s
+            SET due_utc_minute = subscription_due_utc_minute(st.time, NEW.timezone_offset_minutes)
+            FROM subscription_types AS st
+            WHERE s.user_id = NEW.id
+              AND st.id = s.subscription_type_id;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER users_refresh_subscription_due_utc_minute
+        AFTER UPDATE OF timezone_offset_minutes ON users
+        FOR EACH ROW
+        WHEN (OLD.timezone_offset_minutes IS DISTINCT FROM NEW.timezone_offset_minutes)
+        EXECUTE FUNCTION users_refresh_subscription_due_utc_minute()
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION subscription_types_refresh_subscription_due_utc_minute() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            UPDATE subscriptions AS s
+            SET due_utc_minute = subscription_due_utc_minute(NEW.time, u.timezone_offset_minutes)
+            FROM users AS u
+            WHERE s.subscription_type_id = NEW.id
+              AND u.id = s.user_id;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER subscription_types_refresh_subscription_due_utc_minute
+        AFTER UPDATE OF "time" ON subscription_types
+        FOR EACH ROW
+        WHEN (OLD.time IS DISTINCT FROM NEW.time)
+        EXECUTE FUNCTION subscription_types_refresh_subscription_due_utc_minute()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER subscription_types_refresh_subscription_due_utc_minute ON subscription_types")
+    op.execute("DROP FUNCTION subscription_types_refresh_subscription_due_utc_minute()")
+    op.execute("DROP TRIGGER users_refresh_subscription_due_utc_minute ON users")
+    op.execute("DROP FUNCTION users_refresh_subscription_due_utc_minute()")
+    op.execute("DROP TRIGGER subscriptions_set_due_utc_minute ON subscriptions")
+    op.execute("DROP FUNCTION subscriptions_set_due_utc_minute()")
+    op.drop_index("subscriptions_due_utc_minute_idx", table_name="subscriptions")
+    op.drop_constraint("subscriptions_due_utc_minute_range", "subscriptions", type_="check")
+    op.drop_column("subscriptions", "due_utc_minute")
+    op.execute("DROP FUNCTION subscription_due_utc_minute(TIME, SMALLINT)")
@@ -0,0 +1,50 @@
+"""Notify listeners when subscription types change.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "0009"
+down_revision: str | Sequence[str] | None = "0008"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE FUNCTION subscription_types_notify_changed() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            PERFORM pg_notify('subscription_types_changed', TG_OP);
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER subscription_types_notify_changed
+        AFTER INSERT OR UPDATE OR DELETE ON subscription_types
+        FOR EACH STATEMENT EXECUTE FUNCTION subscription_types_notify_changed()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER subscription_types_notify_truncated
+        AFTER TRUNCATE ON subscription_types
+        FOR EACH STATEMENT EXECUTE FUNCTION subscription_types_notify_changed()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER subscription_types_notify_truncated ON subscription_types")
+    op.execute("DROP TRIGGER subscription_types_notify_changed ON subscription_types")
+    op.execute("DROP FUNCTION subscription_types_notify_changed()")
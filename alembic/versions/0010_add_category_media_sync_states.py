@@ -0,0 +1,37 @@
+"""Store per-category media sync fingerprints.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "0010"
+down_revision: str | Sequence[str] | None = "0009"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "category_media_sync_states",
+        sa.Column("subscription_type_id", sa.BIGINT(), nullable=False),
+        sa.Column("directory_path", sa.Text(), nullable=False),
+        sa.Column("folder_modified", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("item_count", sa.INTEGER(), nullable=False),
+        sa.Column("listing_hash", sa.Text(), nullable=False),
+        sa.Column("reconciled_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("checked_at", sa.DateTime(timezone=True), nullable=False),
+        sa.CheckConstraint("item_count >= 0", name="category_media_sync_states_item_count_nonnegative"),
+        sa.ForeignKeyConstraint(["subscription_type_id"], ["subscription_types.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("subscription_type_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("category_media_sync_states")
@@ -0,0 +1,31 @@
+"""Index pending category media for background materialization.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "0011"
+down_revision: str | Sequence[str] | None = "0010"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "category_media_pending_idx",
+        "category_media",
+        ["id"],
+        unique=False,
+        postgresql_where=sa.text("is_active AND telegram_file_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("category_media_pending_idx", table_name="category_media")
@@ -0,0 +1,46 @@
+"""Stage category media snapshots in an unlogged table.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "0012"
+down_revision: str | Sequence[str] | None = "0011"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "category_media_staging",
+        sa.Column("position", sa.BIGINT(), sa.Identity(always=True), nullable=False),
+        sa.Column("sync_run_id", sa.UUID(), nullable=False),
+        sa.Column("source_path", sa.Text(), nullable=False),
+        sa.Column("source_revision", sa.Text(), nullable=False),
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("mime_type", sa.Text(), nullable=False),
+        sa.Column("telegram_media_type", sa.Text(), nullable=False),
+        sa.Column("staged_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("position"),
+        prefixes=["UNLOGGED"],
+    )
+    op.create_index(
+        "category_media_staging_run_path_idx",
+        "category_media_staging",
+        ["sync_run_id", "source_path"],
+        unique=False,
+    )
+    op.create_index("category_media_staging_staged_at_idx", "category_media_staging", ["staged_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("category_media_staging_staged_at_idx", table_name="category_media_staging")
+    op.drop_index("category_media_staging_run_path_idx", table_name="category_media_staging")
+    op.drop_table("category_media_staging")
@@ -17,6 +17,7 @@ from cringe_pics_telebot.services.category_aliases import (
     InvalidCategoryAliasesError,
     parse_category_search_aliases,
 )
+from cringe_pics_telebot.services.subscriptions import invalidate_subscription_types_cache
 
 from .admin_access import IsAdministrator
 from .admin_category_callback_data import AdminCategoryAction, AdminCategoryCallbackData
@@ -82,6 +83,7 @@ async def receive_category_aliases(message: Message, state: FSMContext) -> None:
 
     async with transaction():
         updated = await update_subscription_type_search_aliases(category_id, search_aliases)
+    invalidate_subscription_types_cache()
     await state.clear()
 
     category = await get_subscription_type(category_id) if updated else None
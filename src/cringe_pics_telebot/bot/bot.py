@@ -9,6 +9,7 @@ from .admin_categories import router as admin_categories_router
 from .admin_panel import router as admin_panel_router
 from .images import router as images_router
 from .inline import router as inline_router
+from .rate_limit import TelegramRateLimitMiddleware, TelegramRateLimits
 from .user_registration import RegisterPrivateUserMiddleware
 
 dp = Dispatcher()
@@ -20,9 +21,15 @@ dp.include_router(admin_categories_router)
 dp.include_router(images_router)
 
 
-def create_bot(token: str, *, api_base_url: str | None = None) -> Bot:
-    session = None
+def create_bot(
+    token: str,
+    *,
+    api_base_url: str | None = None,
+    rate_limits: TelegramRateLimits | None = None,
+) -> Bot:
+    session = AiohttpSession()
     if api_base_url is not None:
         session = AiohttpSession(api=TelegramAPIServer.from_base(api_base_url))
+    session.middleware(TelegramRateLimitMiddleware(rate_limits))
 
     return Bot(token, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML.value))
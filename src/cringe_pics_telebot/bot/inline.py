@@ -1,7 +1,7 @@
 import hashlib
 import logging
-import random
-from collections.abc import Callable, Sequence
+from collections.abc import Sequence
+from datetime import timedelta
 
 from aiogram import Router
 from aiogram.types import (
@@ -14,17 +14,21 @@ from aiogram.types import (
 )
 
 from cringe_pics_telebot.repositories.postgres import SubscriptionType
-from cringe_pics_telebot.services.category_aliases import normalize_category_search_term
+from cringe_pics_telebot.services.category_aliases import category_search_terms, normalize_category_search_term
 from cringe_pics_telebot.services.inline_images import (
     MAX_INLINE_QUERY_RESULTS,
-    get_inline_images,
+    get_inline_page,
+    get_inline_snapshot,
 )
 from cringe_pics_telebot.services.random_image import CachedMedia, LinkedMedia
-from cringe_pics_telebot.services.subscriptions import get_subscription_types
+from cringe_pics_telebot.services.subscriptions import get_subscription_type_search_index
 
 logger = logging.getLogger(__name__)
 
 RANDOM_INLINE_RESULT_TITLE = "🎲 Выбрать случайную картинку"
+DEFAULT_INLINE_CACHE_TIME = timedelta(seconds=30)
+_OFFSET_SEPARATOR = ":"
+_SEED_LENGTH = 16
 
 type InlineMediaResult = (
     InlineQueryResultCachedGif | InlineQueryResultCachedPhoto | InlineQueryResultGif | InlineQueryResultPhoto
@@ -34,39 +38,57 @@ router = Router(name="inline")
 
 
 @router.inline_query()
-async def answer_inline_query(inline_query: InlineQuery) -> None:
+async def answer_inline_query(
+    inline_query: InlineQuery,
+    inline_cache_time: timedelta = DEFAULT_INLINE_CACHE_TIME,
+) -> None:
+    cache_time = int(inline_cache_time.total_seconds())
     subscription_types = await _find_subscription_types(inline_query.query)
     if not subscription_types:
-        await inline_query.answer([], cache_time=0, is_personal=True)
+        await inline_query.answer([], cache_time=cache_time, is_personal=False)
         return
 
+    seed, position = _parse_offset(inline_query.offset) or (
+        _snapshot_seed(inline_query, subscription_types=subscription_types),
+        0,
+    )
     try:
-        results = _prepare_inline_results(await _get_inline_results(subscription_types))
+        snapshot = await get_inline_snapshot(subscription_types, seed=seed)
+        page_end = position + MAX_INLINE_QUERY_RESULTS
+        results = _inline_results(
+            await get_inline_page(
+                subscription_types,
+                snapshot[position:page_end],
+                prefetch_ids=snapshot[page_end : page_end + MAX_INLINE_QUERY_RESULTS],
+            ),
+            with_random_result=position == 0,
+        )
     except Exception:
         logger.exception(
             "Failed to prepare inline results for user %d and categories %s",
             inline_query.from_user.id,
             ", ".join(subscription_type.name for subscription_type in subscription_types),
         )
-        results = []
+        # пустой ответ из-за ошибки не должен попасть в кэш Telegram
+        await inline_query.answer([], cache_time=0, is_personal=False)
+        return
 
-    answer_results: list[InlineQueryResultUnion] = [*results[:MAX_INLINE_QUERY_RESULTS]]
-    await inline_query.answer(answer_results, cache_time=0, is_personal=True)
+    answer_results: list[InlineQueryResultUnion] = [*results]
+    await inline_query.answer(
+        answer_results,
+        cache_time=cache_time,
+        is_personal=False,
+        next_offset=f"{seed}{_OFFSET_SEPARATOR}{page_end}" if page_end < len(snapshot) else "",
+    )
 
 
 async def _find_subscription_types(query: str) -> list[SubscriptionType]:
     if not normalize_category_search_term(query):
         return []
 
-    return [
-        subscription_type
-        for subscription_type in await get_subscription_types()
-        if category_matches_query(
-            query,
-            subscription_type.name,
-            subscription_type.search_aliases,
-        )
-    ]
+    subscription_types, search_index = await get_subscription_type_search_index()
+    matched_ids = search_index.find(query)
+    return [subscription_type for subscription_type in subscription_types if subscription_type.id in matched_ids]
 
 
 def category_matches_query(query: str, category: str, search_aliases: Sequence[str] = ()) -> bool:
@@ -74,64 +96,46 @@ def category_matches_query(query: str, category: str, search_aliases: Sequence[s
     if not normalized_query:
         return False
 
-    normalized_terms = {
-        normalized_term
-        for term in (category, *search_aliases)
-        if (normalized_term := normalize_category_search_term(term))
-    }
-    return any(normalized_query in term for term in normalized_terms)
-
+    return any(normalized_query in term for term in category_search_terms(category, search_aliases))
 
-async def _get_inline_results(subscription_types: list[SubscriptionType]) -> list[InlineMediaResult]:
-    seen_paths: set[str] = set()
-    results: list[InlineMediaResult] = []
 
-    for subscription_type, image in await get_inline_images(subscription_types, limit_per_category=None):
-        if image.path in seen_paths:
-            continue
+def _snapshot_seed(inline_query: InlineQuery, *, subscription_types: Sequence[SubscriptionType]) -> str:
+    category_ids = ",".join(str(subscription_type.id) for subscription_type in subscription_types)
+    key = f"{inline_query.from_user.id}:{normalize_category_search_term(inline_query.query)}:{category_ids}"
+    return hashlib.sha256(key.encode()).hexdigest()[:_SEED_LENGTH]
 
-        seen_paths.add(image.path)
-        results.append(_inline_result(image, subscription_type=subscription_type))
 
-    return results
+def _parse_offset(offset: str) -> tuple[str, int] | None:
+    seed, separator, position = offset.partition(_OFFSET_SEPARATOR)
+    if not separator or len(seed) != _SEED_LENGTH or not position.isdecimal():
+        return None
+    return seed, int(position)
 
 
-def _prepare_inline_results(
-    results: list[InlineMediaResult],
+def _inline_results(
+    images: Sequence[tuple[SubscriptionType, CachedMedia | LinkedMedia]],
     *,
-    chooser: Callable[[Sequence[InlineMediaResult]], InlineMediaResult] | None = None,
-    shuffler: Callable[[list[InlineMediaResult]], None] | None = None,
+    with_random_result: bool,
 ) -> list[InlineMediaResult]:
-    if not results:
-        return []
+    results = [_inline_result(image, subscription_type=subscription_type) for subscription_type, image in images]
+    if with_random_result and results:
+        results[0] = _random_result(results[0])
+    return results
+
 
-    selected_result = (chooser or random.choice)(results)
-    random_result = selected_result.model_copy(
+def _random_result(result: InlineMediaResult) -> InlineMediaResult:
+    return result.model_copy(
         update={
-            "id": _random_result_id(selected_result.id),
+            "id": _random_result_id(result.id),
             "title": RANDOM_INLINE_RESULT_TITLE,
         }
     )
-    ordinary_results = [result for result in results if result.id != selected_result.id]
-    shuffled_results = _shuffle_inline_results(ordinary_results, shuffler=shuffler)
-
-    return [random_result, *shuffled_results[: MAX_INLINE_QUERY_RESULTS - 1]]
 
 
 def _random_result_id(result_id: str) -> str:
     return hashlib.sha256(f"random:{result_id}".encode()).hexdigest()
 
 
-def _shuffle_inline_results(
-    results: list[InlineMediaResult],
-    *,
-    shuffler: Callable[[list[InlineMediaResult]], None] | None = None,
-) -> list[InlineMediaResult]:
-    shuffled_results = results.copy()
-    (shuffler or random.shuffle)(shuffled_results)
-    return shuffled_results
-
-
 def _inline_result(
     image: CachedMedia | LinkedMedia,
     *,
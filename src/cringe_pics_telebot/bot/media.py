@@ -1,6 +1,8 @@
 import logging
+from dataclasses import dataclass
 
 from aiogram import Bot
+from aiogram.methods import SendAnimation, SendPhoto
 from aiogram.types import (
     InputMediaAnimation,
     InputMediaPhoto,
@@ -14,19 +16,53 @@ logger = logging.getLogger(__name__)
 
 
 async def add_image_to_message(*, message: Message, image: LinkedMedia | CachedMedia) -> Message | bool:
-    media = image.id if isinstance(image, CachedMedia) else image.url
-    edited_message = await message.edit_media(_input_media(image=image, media=media))
+    edited_message = await message.edit_media(_input_media(image=image, media=_media(image)))
     logger.info("Added image %s using %s", image.path, "file_id" if isinstance(image, CachedMedia) else "URL")
     return edited_message
 
 
-async def send_image_to_chat(*, bot: Bot, chat_id: int, image: LinkedMedia | CachedMedia) -> Message:
-    media = image.id if isinstance(image, CachedMedia) else image.url
+_PREPARED_CHAT_ID = 0
+"""Заглушка получателя в заготовке запроса; настоящий чат подставляется при отправке"""
+
+
+@dataclass(frozen=True, slots=True)
+class PreparedImageSend:
+    request: SendPhoto | SendAnimation
+    """Проверенный запрос отправки картинки без получателя"""
+
+    def for_chat(self, chat_id: int) -> SendPhoto | SendAnimation:
+        # копия заготовки не проходит валидацию pydantic заново
+        return self.request.model_copy(update={"chat_id": chat_id})
+
+
+class ImageSendPlan:
+    """Заготовки запросов на одну рассылку: картинка, которую получают многие чаты, собирается один раз"""
+
+    def __init__(self) -> None:
+        self._prepared: dict[str, PreparedImageSend] = {}
+
+    def prepare(self, image: LinkedMedia | CachedMedia) -> PreparedImageSend:
+        media = _media(image)
+        prepared = self._prepared.get(media)
+        if prepared is None:
+            prepared = self._prepared[media] = prepare_image_send(image)
+        return prepared
+
+    async def send(self, *, bot: Bot, chat_id: int, image: LinkedMedia | CachedMedia) -> Message:
+        return await bot(self.prepare(image).for_chat(chat_id))
+
+
+def prepare_image_send(image: LinkedMedia | CachedMedia) -> PreparedImageSend:
+    media = _media(image)
 
     if _is_animation(image):
-        return await bot.send_animation(chat_id=chat_id, animation=media)
+        return PreparedImageSend(SendAnimation(chat_id=_PREPARED_CHAT_ID, animation=media))
+
+    return PreparedImageSend(SendPhoto(chat_id=_PREPARED_CHAT_ID, photo=media))
 
-    return await bot.send_photo(chat_id=chat_id, photo=media)
+
+async def send_image_to_chat(*, bot: Bot, chat_id: int, image: LinkedMedia | CachedMedia) -> Message:
+    return await bot(prepare_image_send(image).for_chat(chat_id))
 
 
 def get_message_media_file_ids(message: Message) -> tuple[str, str]:
@@ -52,5 +88,9 @@ def _input_media(
     return InputMediaPhoto(media=media)
 
 
+def _media(image: LinkedMedia | CachedMedia) -> str:
+    return image.id if isinstance(image, CachedMedia) else image.url
+
+
 def _is_animation(image: LinkedMedia | CachedMedia) -> bool:
     return "gif" in image.mime_type
@@ -1,18 +1,35 @@
 import asyncio
 import logging
 import os
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
 from contextlib import AsyncExitStack, asynccontextmanager, suppress
 from datetime import timedelta
+from functools import partial
+
+from aiogram import Bot
 
 from cringe_pics_telebot.bot.bot import create_bot, dp
+from cringe_pics_telebot.bot.inline import DEFAULT_INLINE_CACHE_TIME
+from cringe_pics_telebot.bot.rate_limit import TelegramRateLimits
+from cringe_pics_telebot.repositories.postgres import PoolSettings, get_pool_stats
 from cringe_pics_telebot.repositories.postgres import connect as connect_postgres
 from cringe_pics_telebot.repositories.redis import connect as connect_redis
+from cringe_pics_telebot.repositories.yandex import ConnectorSettings
 from cringe_pics_telebot.repositories.yandex import connect as connect_yandex
+from cringe_pics_telebot.repositories.yandex import get_connection_stats as get_yandex_connection_stats
 from cringe_pics_telebot.services.admin_broadcasts import DEFAULT_CHECK_INTERVAL as ADMIN_BROADCAST_CHECK_INTERVAL
 from cringe_pics_telebot.services.admin_broadcasts import run_admin_broadcasts
-from cringe_pics_telebot.services.media_sync import DEFAULT_SYNC_INTERVAL, run_media_sync
+from cringe_pics_telebot.services.download_urls import LOCAL_DOWNLOAD_URL_CACHE_SIZE, configure_local_download_urls
+from cringe_pics_telebot.services.hot_media import HOT_MEDIA_CACHE_SIZE, configure_hot_media, run_hot_media_invalidation
+from cringe_pics_telebot.services.media_delivery import run_materialization_notifications
+from cringe_pics_telebot.services.media_sync import DEFAULT_RECENT_UPLOADS_LIMIT, DEFAULT_SYNC_INTERVAL, run_media_sync
+from cringe_pics_telebot.services.media_warmup import (
+    DEFAULT_WARMUP_BATCH_SIZE,
+    DEFAULT_WARMUP_INTERVAL,
+    warm_up_pending_media,
+)
 from cringe_pics_telebot.services.subscription_broadcasts import DEFAULT_CHECK_INTERVAL, run_subscription_broadcasts
+from cringe_pics_telebot.services.subscriptions import run_subscription_types_invalidation
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -32,12 +49,51 @@ async def _connect_postgres() -> AsyncGenerator:
         database=database,
         port=port,
         host=host,
+        pool=_postgres_pool_settings(),
     ):
         logger.info("Connected to the database!")
 
         yield
 
 
+def _postgres_pool_settings() -> PoolSettings:
+    defaults = PoolSettings()
+    recycle_seconds = float(
+        os.environ.get(
+            "POSTGRES_POOL_RECYCLE_SECONDS",
+            defaults.pool_recycle.total_seconds() if defaults.pool_recycle is not None else 0,
+        )
+    )
+    return PoolSettings(
+        pool_size=int(os.environ.get("POSTGRES_POOL_SIZE", defaults.pool_size)),
+        max_overflow=int(os.environ.get("POSTGRES_POOL_MAX_OVERFLOW", defaults.max_overflow)),
+        pool_timeout=timedelta(
+            seconds=float(os.environ.get("POSTGRES_POOL_TIMEOUT_SECONDS", defaults.pool_timeout.total_seconds()))
+        ),
+        pool_recycle=timedelta(seconds=recycle_seconds) if recycle_seconds > 0 else None,
+        pool_pre_ping=os.environ.get("POSTGRES_POOL_PRE_PING", "").lower() in {"1", "true", "yes"},
+        statement_cache_size=int(os.environ.get("POSTGRES_STATEMENT_CACHE_SIZE", defaults.statement_cache_size)),
+        pgbouncer=os.environ.get("POSTGRES_PGBOUNCER", "").lower() in {"1", "true", "yes"},
+    )
+
+
+async def _log_postgres_pool_stats(interval: timedelta) -> None:
+    while True:
+        await asyncio.sleep(interval.total_seconds())
+        stats = get_pool_stats()
+        logger.info(
+            "PostgreSQL pool: size=%d checked_out=%d checked_in=%d overflow=%d checkouts=%d "
+            "total_wait=%.3fs max_wait=%.3fs",
+            stats.size,
+            stats.checked_out,
+            stats.checked_in,
+            stats.overflow,
+            stats.checkouts,
+            stats.total_wait.total_seconds(),
+            stats.max_wait.total_seconds(),
+        )
+
+
 @asynccontextmanager
 async def _create_yandex_client() -> AsyncGenerator:
     logger.info("Connecting to Yandex...")
@@ -46,14 +102,36 @@ async def _create_yandex_client() -> AsyncGenerator:
     except KeyError:
         logger.exception("Failed to get Yandex token")
         raise
-    else:
-        connect_yandex(
-            yandex_key,
-            api_base_url=os.environ.get("YANDEX_DISK_API_BASE_URL"),
-        )
-    logger.info("Connected to the Yandex!")
+    requests_per_second = float(
+        os.environ.get("YANDEX_REQUESTS_PER_SECOND", ConnectorSettings().requests_per_second or 0),
+    )
+    async with connect_yandex(
+        yandex_key,
+        api_base_url=os.environ.get("YANDEX_DISK_API_BASE_URL"),
+        connector=ConnectorSettings(requests_per_second=requests_per_second if requests_per_second > 0 else None),
+    ):
+        logger.info("Connected to the Yandex!")
+        try:
+            yield
+        finally:
+            _log_yandex_connection_stats()
+
+
+async def _log_yandex_connection_stats_periodically(interval: timedelta) -> None:
+    while True:
+        await asyncio.sleep(interval.total_seconds())
+        _log_yandex_connection_stats()
 
-    yield
+
+def _log_yandex_connection_stats() -> None:
+    stats = get_yandex_connection_stats()
+    logger.info(
+        "Yandex connections: requests=%d created=%d reused=%d dns_cache_hits=%d",
+        stats.requests,
+        stats.created,
+        stats.reused,
+        stats.dns_cache_hits,
+    )
 
 
 @asynccontextmanager
@@ -69,17 +147,52 @@ async def _connect_redis() -> AsyncGenerator:
         yield
 
 
+def _telegram_rate_limits() -> TelegramRateLimits:
+    defaults = TelegramRateLimits()
+    return TelegramRateLimits(
+        global_per_second=float(
+            os.environ.get("TELEGRAM_GLOBAL_RATE_LIMIT_PER_SECOND", defaults.global_per_second),
+        ),
+        private_chat_per_second=float(
+            os.environ.get("TELEGRAM_CHAT_RATE_LIMIT_PER_SECOND", defaults.private_chat_per_second),
+        ),
+        interactive_reserve=float(
+            os.environ.get("TELEGRAM_INTERACTIVE_RATE_RESERVE", defaults.interactive_reserve),
+        ),
+    )
+
+
+def _media_warmup(bot: Bot) -> Callable[[], Awaitable[object]] | None:
+    chat_id = os.environ.get("MEDIA_WARMUP_CHAT_ID")
+    if not chat_id:
+        return None
+    return partial(
+        warm_up_pending_media,
+        bot,
+        chat_id=int(chat_id),
+        batch_size=int(os.environ.get("MEDIA_WARMUP_BATCH_SIZE", DEFAULT_WARMUP_BATCH_SIZE)),
+        interval=timedelta(
+            seconds=float(os.environ.get("MEDIA_WARMUP_INTERVAL_SECONDS", DEFAULT_WARMUP_INTERVAL.total_seconds()))
+        ),
+    )
+
+
 async def start_polling() -> None:
     connectors = (_connect_postgres, _create_yandex_client, _connect_redis)
     async with AsyncExitStack() as stack:
         for connector in connectors:
             await stack.enter_async_context(connector())
+        configure_local_download_urls(
+            max_size=int(os.environ.get("DOWNLOAD_URL_LOCAL_CACHE_SIZE", LOCAL_DOWNLOAD_URL_CACHE_SIZE)),
+        )
+        configure_hot_media(max_size=int(os.environ.get("HOT_MEDIA_CACHE_SIZE", HOT_MEDIA_CACHE_SIZE)))
 
         logger.info("Polling...")
         try:
             bot = create_bot(
                 os.environ["TELEGRAM_BOT_TOKEN"],
                 api_base_url=os.environ.get("TELEGRAM_API_BASE_URL"),
+                rate_limits=_telegram_rate_limits(),
             )
         except KeyError:
             logger.exception("Failed to get Telegram bot token")
@@ -96,7 +209,12 @@ async def start_polling() -> None:
         media_sync_interval = float(
             os.environ.get("MEDIA_SYNC_INTERVAL_SECONDS", DEFAULT_SYNC_INTERVAL.total_seconds())
         )
-        background_tasks = (
+        media_sync_full_interval = os.environ.get("MEDIA_SYNC_FULL_RECONCILE_INTERVAL_SECONDS")
+        media_sync_recent_uploads_interval = os.environ.get("MEDIA_SYNC_RECENT_UPLOADS_INTERVAL_SECONDS")
+        media_sync_recent_uploads_limit = int(
+            os.environ.get("MEDIA_SYNC_RECENT_UPLOADS_LIMIT", DEFAULT_RECENT_UPLOADS_LIMIT),
+        )
+        background_tasks = [
             asyncio.create_task(
                 run_subscription_broadcasts(
                     bot,
@@ -109,10 +227,42 @@ async def start_polling() -> None:
                     interval=timedelta(seconds=admin_broadcast_interval),
                 )
             ),
-            asyncio.create_task(run_media_sync(interval=timedelta(seconds=media_sync_interval))),
+            asyncio.create_task(
+                run_media_sync(
+                    interval=timedelta(seconds=media_sync_interval),
+                    full_reconcile_interval=(
+                        timedelta(seconds=float(media_sync_full_interval)) if media_sync_full_interval else None
+                    ),
+                    recent_uploads_interval=(
+                        timedelta(seconds=float(media_sync_recent_uploads_interval))
+                        if media_sync_recent_uploads_interval
+                        else None
+                    ),
+                    recent_uploads_limit=media_sync_recent_uploads_limit,
+                    after_sync=_media_warmup(bot),
+                )
+            ),
+            asyncio.create_task(run_subscription_types_invalidation()),
+            asyncio.create_task(run_materialization_notifications()),
+            asyncio.create_task(run_hot_media_invalidation()),
+        ]
+        inline_cache_time = float(
+            os.environ.get("INLINE_QUERY_CACHE_TIME_SECONDS", DEFAULT_INLINE_CACHE_TIME.total_seconds())
         )
+        pool_stats_interval = float(os.environ.get("POSTGRES_POOL_STATS_INTERVAL_SECONDS", "0"))
+        if pool_stats_interval > 0:
+            background_tasks.append(
+                asyncio.create_task(_log_postgres_pool_stats(timedelta(seconds=pool_stats_interval))),
+            )
+        yandex_stats_interval = float(os.environ.get("YANDEX_CONNECTION_STATS_INTERVAL_SECONDS", "0"))
+        if yandex_stats_interval > 0:
+            background_tasks.append(
+                asyncio.create_task(
+                    _log_yandex_connection_stats_periodically(timedelta(seconds=yandex_stats_interval)),
+                ),
+            )
         try:
-            await dp.start_polling(bot)
+            await dp.start_polling(bot, inline_cache_time=timedelta(seconds=inline_cache_time))
         finally:
             for background_task in background_tasks:
                 background_task.cancel()
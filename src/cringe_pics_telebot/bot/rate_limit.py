@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+from enum import StrEnum
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from cringe_pics_telebot.repositories import redis as cache
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY_PREFIX = "telegram-rate-limit"
+_PAUSE_KEY = f"{RATE_LIMIT_KEY_PREFIX}:retry-after"
+_GLOBAL_KEY = f"{RATE_LIMIT_KEY_PREFIX}:global"
+
+type Sleep = Callable[[float], Awaitable[None]]
+
+
+class SendPriority(StrEnum):
+    interactive = "interactive"
+    bulk = "bulk"
+
+
+_send_priority: ContextVar[SendPriority] = ContextVar("_send_priority", default=SendPriority.interactive)
+
+
+@dataclass(frozen=True, slots=True)
+class TelegramRateLimits:
+    global_per_second: float = 30
+    """Общий лимит отправок бота в секунду"""
+    private_chat_per_second: float = 1
+    """Лимит отправок в один личный чат в секунду"""
+    group_chat_per_second: float = 20 / 60
+    """Лимит отправок в одну группу в секунду"""
+    chat_burst: float = 3
+    """Сколько сообщений можно отправить в один чат без ожидания"""
+    interactive_reserve: float = 5
+    """Сколько глобальных токенов массовые рассылки оставляют интерактивным ответам"""
+    max_retries: int = 3
+    """Сколько раз повторить запрос после `retry_after` от Telegram"""
+
+
+@contextmanager
+def bulk_sends() -> Iterator[None]:
+    token = _send_priority.set(SendPriority.bulk)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TelegramRateLimitMiddleware(BaseRequestMiddleware):
+    def __init__(self, limits: TelegramRateLimits | None = None, *, sleep: Sleep = asyncio.sleep) -> None:
+        self._limits = limits or TelegramRateLimits()
+        self._sleep = sleep
+        self._bulk_queue: asyncio.Lock | None = None
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        attempt = 0
+        while True:
+            await self._acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as error:
+                if attempt >= self._limits.max_retries:
+                    raise
+                attempt += 1
+                logger.warning(
+                    "Telegram asked to retry %s in chat %s after %d seconds",
+                    type(method).__name__,
+                    chat_id,
+                    error.retry_after,
+                )
+                await self._pause(timedelta(seconds=error.retry_after))
+
+    async def _acquire(self, chat_id: int | str) -> None:
+        priority = _send_priority.get()
+        buckets = self._buckets(chat_id, priority=priority)
+        if priority is SendPriority.interactive:
+            await self._take_token(buckets)
+            return
+
+        # массовые отправки упираются в общий бакет: в Redis ходит только первая в очереди процесса,
+        # остальные ждут локально, а не повторяют запрос после каждого отказа
+        if self._bulk_queue is None:
+            self._bulk_queue = asyncio.Lock()
+        async with self._bulk_queue:
+            await self._take_token(buckets)
+
+    async def _take_token(self, buckets: list[cache.RateLimitBucket]) -> None:
+        while True:
+            try:
+                wait = await cache.take_rate_limit_token(pause_key=_PAUSE_KEY, buckets=buckets)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to take Telegram rate limit token, sending without limit")
+                return
+
+            if wait <= timedelta(0):
+                return
+            await self._sleep(wait.total_seconds())
+
+    async def _pause(self, ttl: timedelta) -> None:
+        try:
+            await cache.pause_rate_limit(pause_key=_PAUSE_KEY, ttl=ttl)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to share Telegram retry_after pause")
+            await self._sleep(ttl.total_seconds())
+
+    def _buckets(self, chat_id: int | str, *, priority: SendPriority) -> list[cache.RateLimitBucket]:
+        reserve = self._limits.interactive_reserve if priority is SendPriority.bulk else 0
+        chat_rate = (
+            self._limits.private_chat_per_second
+            if isinstance(chat_id, int) and chat_id > 0
+            else self._limits.group_chat_per_second
+        )
+        return [
+            cache.RateLimitBucket(
+                key=_GLOBAL_KEY,
+                rate=self._limits.global_per_second,
+                capacity=self._limits.global_per_second,
+                reserve=reserve,
+            ),
+            cache.RateLimitBucket(
+                key=f"{RATE_LIMIT_KEY_PREFIX}:chat:{chat_id}",
+                rate=chat_rate,
+                capacity=self._limits.chat_burst,
+            ),
+        ]
@@ -0,0 +1,30 @@
+import asyncio
+from time import monotonic
+
+from aiohttp import (
+    ClientHandlerType,
+    ClientMiddlewareType,
+    ClientRequest,
+    ClientResponse,
+)
+
+
+def aiohttp_rate_limit_middleware_factory(requests_per_second: float) -> ClientMiddlewareType:
+    """Равномерно распределяет запросы сессии, не больше `requests_per_second` в секунду"""
+    if requests_per_second <= 0:
+        raise ValueError("Request rate limit must be positive")
+
+    interval = 1 / requests_per_second
+    next_request_at = 0.0
+
+    async def rate_limit_middleware(request: ClientRequest, handler: ClientHandlerType) -> ClientResponse:
+        nonlocal next_request_at
+        now = monotonic()
+        # место в очереди занимается до ожидания, поэтому одновременные запросы не проскакивают вместе
+        scheduled_at = max(now, next_request_at)
+        next_request_at = scheduled_at + interval
+        if scheduled_at > now:
+            await asyncio.sleep(scheduled_at - now)
+        return await handler(request)
+
+    return rate_limit_middleware
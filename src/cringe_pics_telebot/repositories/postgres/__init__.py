@@ -1,10 +1,10 @@
 from .admin_broadcasts import complete_admin_broadcast as complete_admin_broadcast
 from .admin_broadcasts import create_admin_broadcast as create_admin_broadcast
-from .admin_broadcasts import finish_admin_broadcast_delivery as finish_admin_broadcast_delivery
+from .admin_broadcasts import finish_admin_broadcast_deliveries as finish_admin_broadcast_deliveries
 from .admin_broadcasts import get_admin_broadcast as get_admin_broadcast
 from .admin_broadcasts import get_admin_broadcast_recipient_ids as get_admin_broadcast_recipient_ids
-from .admin_broadcasts import get_admin_broadcast_users as get_admin_broadcast_users
 from .admin_broadcasts import get_dispatchable_admin_broadcasts as get_dispatchable_admin_broadcasts
+from .admin_broadcasts import get_due_admin_broadcast_user_ids as get_due_admin_broadcast_user_ids
 from .admin_broadcasts import get_scheduled_admin_broadcasts as get_scheduled_admin_broadcasts
 from .admin_broadcasts import reserve_admin_broadcast_deliveries as reserve_admin_broadcast_deliveries
 from .admin_broadcasts import set_admin_broadcast_recipients as set_admin_broadcast_recipients
@@ -12,39 +12,54 @@ from .admin_broadcasts import soft_delete_admin_broadcast as soft_delete_admin_b
 from .admin_broadcasts import update_admin_broadcast_message as update_admin_broadcast_message
 from .admin_broadcasts import update_admin_broadcast_schedule as update_admin_broadcast_schedule
 from .administrators import is_administrator as is_administrator
-from .category_media import (
-    deactivate_category_media_missing_from_snapshot as deactivate_category_media_missing_from_snapshot,
-)
+from .category_media import delete_staged_category_media as delete_staged_category_media
+from .category_media import get_active_category_media_revisions as get_active_category_media_revisions
 from .category_media import get_category_media as get_category_media
+from .category_media import get_category_media_by_ids as get_category_media_by_ids
 from .category_media import (
     get_category_media_by_subscription_types as get_category_media_by_subscription_types,
 )
+from .category_media import get_category_media_ids as get_category_media_ids
+from .category_media import get_category_media_summaries as get_category_media_summaries
+from .category_media import get_pending_category_media as get_pending_category_media
 from .category_media import invalidate_category_media_file_id as invalidate_category_media_file_id
 from .category_media import materialize_category_media as materialize_category_media
+from .category_media import merge_staged_category_media as merge_staged_category_media
+from .category_media import stage_category_media_sources as stage_category_media_sources
 from .category_media import upsert_category_media_snapshot as upsert_category_media_snapshot
+from .category_media_sync_states import get_category_media_sync_states as get_category_media_sync_states
+from .category_media_sync_states import save_category_media_sync_state as save_category_media_sync_state
 from .connection import AlreadyConnectedError as AlreadyConnectedError
 from .connection import DbConnectionError as DbConnectionError
+from .connection import ListenUnavailableError as ListenUnavailableError
 from .connection import NotConnectedError as NotConnectedError
+from .connection import PoolSettings as PoolSettings
+from .connection import PoolStats as PoolStats
 from .connection import connect as connect
 from .connection import get_connection as get_connection
+from .connection import get_pool_stats as get_pool_stats
+from .connection import listen as listen
 from .connection import transaction as transaction
 from .entities import CategoryMedia as CategoryMedia
 from .entities import CategoryMediaReconcileResult as CategoryMediaReconcileResult
 from .entities import CategoryMediaSource as CategoryMediaSource
 from .entities import CategoryMediaStatus as CategoryMediaStatus
+from .entities import CategoryMediaSummary as CategoryMediaSummary
+from .entities import CategoryMediaSyncState as CategoryMediaSyncState
 from .entities import Subscription as Subscription
 from .entities import SubscriptionType as SubscriptionType
 from .entities import TelegramMediaType as TelegramMediaType
 from .entities import User as User
 from .subscription import create_subscription as create_subscription
 from .subscription import delete_subscription as delete_subscription
-from .subscription import get_subscription_users as get_subscription_users
+from .subscription import get_due_subscription_user_ids as get_due_subscription_user_ids
 from .subscription import get_user_subscriptions as get_user_subscriptions
+from .subscription_types import SUBSCRIPTION_TYPES_CHANNEL as SUBSCRIPTION_TYPES_CHANNEL
 from .subscription_types import get_subscription_type as get_subscription_type
 from .subscription_types import get_subscription_types as get_subscription_types
 from .subscription_types import update_subscription_type_search_aliases as update_subscription_type_search_aliases
 from .users import create_user as create_user
-from .users import deactivate_user as deactivate_user
+from .users import deactivate_users as deactivate_users
 from .users import get_active_users as get_active_users
 from .users import get_user_timezone_offset as get_user_timezone_offset
 from .users import set_user_timezone_offset as set_user_timezone_offset
@@ -1,8 +1,9 @@
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
 from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import delete, or_, select, update
+import sqlalchemy as sa
+from sqlalchemy import delete, exists, func, literal, or_, select, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.engine import Row
 
@@ -10,9 +11,9 @@ from .connection import get_connection
 from .entities import (
     AdminBroadcast,
     AdminBroadcastDelivery,
+    AdminBroadcastDeliveryOutcome,
     AdminBroadcastDeliveryStatus,
     AdminBroadcastStatus,
-    User,
 )
 from .tables import admin_broadcast_deliveries, admin_broadcast_recipients, admin_broadcasts, users
 
@@ -157,29 +158,30 @@ async def get_admin_broadcast_recipient_ids(broadcast_id: int) -> list[int]:
         )
 
 
-async def get_admin_broadcast_users(broadcast_id: int) -> list[User]:
+async def get_due_admin_broadcast_user_ids(*, broadcast_id: int, min_timezone_offset_minutes: int) -> list[int]:
     recipient = admin_broadcast_recipients.alias("recipient")
+    delivery = admin_broadcast_deliveries.alias("delivery")
     async with get_connection() as conn:
-        rows = (
-            await conn.execute(
-                select(users)
-                .outerjoin(
-                    recipient,
-                    (recipient.c.broadcast_id == broadcast_id) & (recipient.c.user_id == users.c.id),
+        return list(
+            (
+                await conn.scalars(
+                    select(users.c.id)
+                    .outerjoin(
+                        recipient,
+                        (recipient.c.broadcast_id == broadcast_id) & (recipient.c.user_id == users.c.id),
+                    )
+                    .where(or_(users.c.is_active.is_(True), recipient.c.user_id.is_not(None)))
+                    .where(users.c.timezone_offset_minutes >= min_timezone_offset_minutes)
+                    .where(
+                        ~exists().where(
+                            delivery.c.broadcast_id == broadcast_id,
+                            delivery.c.user_id == users.c.id,
+                        )
+                    )
+                    .order_by(users.c.id)
                 )
-                .where(or_(users.c.is_active.is_(True), recipient.c.user_id.is_not(None)))
-                .order_by(users.c.id)
-            )
-        ).all()
-    return [
-        User(
-            id=row.id,
-            timezone_offset_minutes=row.timezone_offset_minutes,
-            is_active=row.is_active,
-            created_at=row.created_at,
+            ).all()
         )
-        for row in rows
-    ]
 
 
 async def soft_delete_admin_broadcast(broadcast_id: int) -> bool:
@@ -247,22 +249,34 @@ async def reserve_admin_broadcast_deliveries(
     return [_admin_broadcast_delivery_from_row(row) for row in rows]
 
 
-async def finish_admin_broadcast_delivery(
-    delivery_id: int,
-    *,
-    status: AdminBroadcastDeliveryStatus,
-    error: str | None = None,
-) -> None:
-    if status is AdminBroadcastDeliveryStatus.pending:
+async def finish_admin_broadcast_deliveries(outcomes: Sequence[AdminBroadcastDeliveryOutcome]) -> int:
+    if not outcomes:
+        return 0
+    if any(outcome.status is AdminBroadcastDeliveryStatus.pending for outcome in outcomes):
         raise ValueError("A finished delivery cannot have pending status")
 
+    outcome_rows = (
+        func.unnest(
+            literal([outcome.delivery_id for outcome in outcomes], sa.ARRAY(sa.BIGINT)),
+            literal([outcome.status.value for outcome in outcomes], sa.ARRAY(sa.VARCHAR)),
+            literal([outcome.error for outcome in outcomes], sa.ARRAY(sa.VARCHAR)),
+        )
+        .table_valued("delivery_id", "status", "error")
+        .render_derived(name="outcome")
+    )
     async with get_connection() as conn:
-        await conn.execute(
+        result = await conn.execute(
             update(admin_broadcast_deliveries)
-            .where(admin_broadcast_deliveries.c.id == delivery_id)
+            .where(admin_broadcast_deliveries.c.id == outcome_rows.c.delivery_id)
             .where(admin_broadcast_deliveries.c.status == AdminBroadcastDeliveryStatus.pending)
-            .values(status=status, error=error, finished_at=datetime.now(UTC))
+            .values(
+                status=outcome_rows.c.status,
+                error=outcome_rows.c.error,
+                finished_at=datetime.now(UTC),
+            )
+            .returning(admin_broadcast_deliveries.c.id)
         )
+    return len(result.all())
 
 
 async def complete_admin_broadcast(broadcast_id: int) -> bool:
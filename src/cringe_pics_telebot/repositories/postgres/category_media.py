@@ -1,19 +1,39 @@
 from collections.abc import Collection, Sequence
 from datetime import UTC, datetime
 from typing import Any
+from uuid import UUID
 
-from sqlalchemy import case, or_, select, update
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import (
+    BIGINT,
+    Column,
+    ColumnElement,
+    DateTime,
+    and_,
+    case,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    not_,
+    or_,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import Insert, distinct_on, insert
 from sqlalchemy.engine import Row
 
 from .connection import get_connection
 from .entities.category_media import (
     CategoryMedia,
+    CategoryMediaReconcileResult,
     CategoryMediaSource,
     CategoryMediaStatus,
+    CategoryMediaSummary,
     TelegramMediaType,
 )
-from .tables import category_media
+from .tables import category_media, category_media_staging
 
 
 async def get_category_media_by_subscription_types(
@@ -21,7 +41,6 @@ async def get_category_media_by_subscription_types(
     *,
     active_only: bool = True,
     ready_only: bool = False,
-    with_for_update: bool = False,
 ) -> list[CategoryMedia]:
     if subscription_type_ids is not None and not subscription_type_ids:
         return []
@@ -34,14 +53,103 @@ async def get_category_media_by_subscription_types(
     if ready_only:
         query = query.where(category_media.c.status == CategoryMediaStatus.ready)
     query = query.order_by(category_media.c.subscription_type_id, category_media.c.id)
-    if with_for_update:
-        query = query.with_for_update()
 
     async with get_connection() as conn:
         rows = (await conn.execute(query)).all()
     return [_category_media_from_row(row) for row in rows]
 
 
+async def get_category_media_summaries(subscription_type_ids: Sequence[int]) -> list[CategoryMediaSummary]:
+    """Возвращает активные медиа категорий без полей, которые нужны только для отправки"""
+    if not subscription_type_ids:
+        return []
+
+    query = (
+        select(
+            category_media.c.id,
+            category_media.c.subscription_type_id,
+            category_media.c.source_path,
+            category_media.c.telegram_file_id.is_not(None).label("is_ready"),
+        )
+        .where(category_media.c.subscription_type_id.in_(subscription_type_ids))
+        .where(category_media.c.is_active.is_(True))
+        .order_by(category_media.c.subscription_type_id, category_media.c.id)
+    )
+    async with get_connection() as conn:
+        rows = (await conn.execute(query)).all()
+    return [
+        CategoryMediaSummary(
+            id=row.id,
+            subscription_type_id=row.subscription_type_id,
+            source_path=row.source_path,
+            is_ready=row.is_ready,
+        )
+        for row in rows
+    ]
+
+
+async def get_category_media_ids(subscription_type_ids: Sequence[int] | None) -> list[int]:
+    if subscription_type_ids is not None and not subscription_type_ids:
+        return []
+
+    query = select(category_media.c.id).where(category_media.c.is_active.is_(True))
+    if subscription_type_ids is not None:
+        query = query.where(category_media.c.subscription_type_id.in_(subscription_type_ids))
+    query = query.order_by(category_media.c.id)
+
+    async with get_connection() as conn:
+        return list((await conn.scalars(query)).all())
+
+
+async def get_category_media_by_ids(media_ids: Collection[int], *, active_only: bool = True) -> list[CategoryMedia]:
+    if not media_ids:
+        return []
+
+    query = select(category_media).where(category_media.c.id.in_(set(media_ids)))
+    if active_only:
+        query = query.where(category_media.c.is_active.is_(True))
+    query = query.order_by(category_media.c.id)
+
+    async with get_connection() as conn:
+        rows = (await conn.execute(query)).all()
+    return [_category_media_from_row(row) for row in rows]
+
+
+async def get_pending_category_media(*, limit: int, after_id: int = 0) -> list[CategoryMedia]:
+    """Возвращает активные файлы без `file_id` Telegram с идентификатором больше `after_id`, старые первыми"""
+    query = (
+        select(category_media)
+        .where(category_media.c.is_active.is_(True))
+        .where(category_media.c.telegram_file_id.is_(None))
+        .where(category_media.c.id > after_id)
+        .order_by(category_media.c.id)
+        .limit(limit)
+    )
+    async with get_connection() as conn:
+        rows = (await conn.execute(query)).all()
+    return [_category_media_from_row(row) for row in rows]
+
+
+async def get_active_category_media_revisions(
+    *,
+    subscription_type_id: int,
+    source_paths: Collection[str],
+) -> dict[str, str]:
+    """Возвращает ревизии активных файлов категории по их путям"""
+    if not source_paths:
+        return {}
+
+    query = (
+        select(category_media.c.source_path, category_media.c.source_revision)
+        .where(category_media.c.subscription_type_id == subscription_type_id)
+        .where(category_media.c.source_path.in_(set(source_paths)))
+        .where(category_media.c.is_active.is_(True))
+    )
+    async with get_connection() as conn:
+        rows = (await conn.execute(query)).all()
+    return {row.source_path: row.source_revision for row in rows}
+
+
 async def get_category_media(media_id: int, *, with_for_update: bool = False) -> CategoryMedia | None:
     query = select(category_media).where(category_media.c.id == media_id)
     if with_for_update:
@@ -58,87 +166,158 @@ async def upsert_category_media_snapshot(
     seen_at: datetime | None = None,
 ) -> None:
     sources_by_path = {source.source_path: source for source in sources}
-    unique_sources = tuple(sources_by_path.values())
+    if not sources_by_path:
+        return
+
     now = seen_at or datetime.now(UTC)
+    statement = insert(category_media).values(
+        [
+            {
+                "subscription_type_id": subscription_type_id,
+                "source_path": source.source_path,
+                "source_revision": source.source_revision,
+                "name": source.name,
+                "mime_type": source.mime_type,
+                "telegram_media_type": source.telegram_media_type,
+                "is_active": True,
+                "last_seen_at": now,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for source in sources_by_path.values()
+        ]
+    )
     async with get_connection() as conn:
-        if unique_sources:
-            statement = insert(category_media).values(
-                [
-                    {
-                        "subscription_type_id": subscription_type_id,
-                        "source_path": source.source_path,
-                        "source_revision": source.source_revision,
-                        "name": source.name,
-                        "mime_type": source.mime_type,
-                        "telegram_media_type": source.telegram_media_type,
-                        "is_active": True,
-                        "last_seen_at": now,
-                        "created_at": now,
-                        "updated_at": now,
-                    }
-                    for source in unique_sources
-                ]
-            )
-            excluded = statement.excluded
-            revision_changed = category_media.c.source_revision != excluded.source_revision
-            metadata_changed = or_(
-                category_media.c.name != excluded.name,
-                category_media.c.mime_type != excluded.mime_type,
-                category_media.c.telegram_media_type != excluded.telegram_media_type,
-            )
-            row_changed = or_(
-                revision_changed,
-                metadata_changed,
-                category_media.c.is_active.is_(False),
-            )
-            await conn.execute(
-                statement.on_conflict_do_update(
-                    constraint="category_media_subscription_type_source_path_key",
-                    set_={
-                        "source_revision": excluded.source_revision,
-                        "name": excluded.name,
-                        "mime_type": excluded.mime_type,
-                        "telegram_media_type": excluded.telegram_media_type,
-                        "telegram_file_id": case(
-                            (revision_changed, None),
-                            else_=category_media.c.telegram_file_id,
-                        ),
-                        "telegram_file_unique_id": case(
-                            (revision_changed, None),
-                            else_=category_media.c.telegram_file_unique_id,
-                        ),
-                        "materialized_at": case(
-                            (revision_changed, None),
-                            else_=category_media.c.materialized_at,
-                        ),
-                        "is_active": True,
-                        "last_seen_at": now,
-                        "updated_at": case(
-                            (row_changed, now),
-                            else_=category_media.c.updated_at,
-                        ),
-                    },
+        await conn.execute(_update_on_conflict(statement, now=now))
+
+
+async def stage_category_media_sources(*, sync_run_id: UUID, sources: Sequence[CategoryMediaSource]) -> None:
+    """Загружает порцию снимка прогона через `COPY`; при повторе пути применится последний вариант"""
+    if not sources:
+        return
+
+    async with get_connection() as conn:
+        raw_connection = await (await conn.connection()).get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        assert driver_connection is not None
+        await driver_connection.copy_records_to_table(
+            category_media_staging.name,
+            records=[
+                (
+                    sync_run_id,
+                    source.source_path,
+                    source.source_revision,
+                    source.name,
+                    source.mime_type,
+                    source.telegram_media_type.value,
+                )
+                for source in sources
+            ],
+            columns=[category_media_staging.c.sync_run_id.name, *(column.name for column in _STAGED_SOURCE_COLUMNS)],
+        )
+
+
+async def delete_staged_category_media(*, sync_run_id: UUID, stale_before: datetime) -> None:
+    """Удаляет снимок прогона, а заодно снимки, брошенные упавшими процессами до `stale_before`"""
+    async with get_connection() as conn:
+        await conn.execute(
+            delete(category_media_staging).where(
+                or_(
+                    category_media_staging.c.sync_run_id == sync_run_id,
+                    category_media_staging.c.staged_at < stale_before,
                 )
             )
+        )
 
 
-async def deactivate_category_media_missing_from_snapshot(
+async def merge_staged_category_media(
     *,
+    sync_run_id: UUID,
     subscription_type_id: int,
-    source_paths: Collection[str],
     seen_at: datetime | None = None,
-) -> int:
+) -> CategoryMediaReconcileResult:
+    """Применяет снимок прогона `sync_run_id` к каталогу категории.
+
+    Файлы из снимка добавляются или обновляются, остальные активные файлы категории деактивируются.
+    Счётчики считает сам `INSERT ... ON CONFLICT` по `RETURNING old` (PostgreSQL 18), поэтому категорию
+    не нужно заранее читать и блокировать целиком.
+    """
     now = seen_at or datetime.now(UTC)
-    query = (
+    staged = category_media_staging
+    in_category = category_media.c.subscription_type_id == subscription_type_id
+    timestamp = literal(now, DateTime(timezone=True))
+    merge = insert(category_media).from_select(
+        [
+            "subscription_type_id",
+            *(column.name for column in _STAGED_SOURCE_COLUMNS),
+            "is_active",
+            "last_seen_at",
+            "created_at",
+            "updated_at",
+        ],
+        select(literal(subscription_type_id, BIGINT), *_STAGED_SOURCE_COLUMNS, true(), timestamp, timestamp, timestamp)
+        .where(staged.c.sync_run_id == sync_run_id)
+        .ext(distinct_on(staged.c.source_path))
+        .order_by(staged.c.source_path, staged.c.position.desc()),
+    )
+    old_id = _old(category_media.c.id)
+    old_is_active = _old(category_media.c.is_active)
+    source_changed = or_(
+        *(
+            _old(column) != column
+            for column in (
+                category_media.c.source_revision,
+                category_media.c.name,
+                category_media.c.mime_type,
+                category_media.c.telegram_media_type,
+            )
+        )
+    )
+    merged = (
+        _update_on_conflict(merge, now=now)
+        .returning(
+            old_id.is_(None).label("created"),
+            and_(old_id.is_not(None), source_changed).label("changed"),
+            old_is_active.is_(False).label("reactivated"),
+            and_(old_is_active.is_(True), not_(source_changed)).label("unchanged"),
+        )
+        .cte("merged")
+    )
+    deactivated = (
         update(category_media)
-        .where(category_media.c.subscription_type_id == subscription_type_id)
+        .where(in_category)
         .where(category_media.c.is_active.is_(True))
+        .where(
+            ~exists()
+            .where(staged.c.sync_run_id == sync_run_id)
+            .where(staged.c.source_path == category_media.c.source_path)
+        )
+        .values(is_active=False, updated_at=now)
+        .returning(category_media.c.id)
+        .cte("deactivated")
     )
-    if source_paths:
-        query = query.where(category_media.c.source_path.not_in(source_paths))
+    # слияние и деактивация затрагивают непересекающиеся строки и выполняются одним запросом:
+    # блокируются только изменяемые строки и только до конца транзакции сверки
+    counters = select(
+        func.count().label("discovered"),
+        func.count().filter(merged.c.created).label("created"),
+        func.count().filter(merged.c.changed).label("changed"),
+        func.count().filter(merged.c.reactivated).label("reactivated"),
+        select(func.count()).select_from(deactivated).scalar_subquery().label("deactivated"),
+        func.count().filter(merged.c.unchanged).label("unchanged"),
+    ).select_from(merged)
+
     async with get_connection() as conn:
-        deactivated = await conn.execute(query.values(is_active=False, updated_at=now).returning(category_media.c.id))
-    return len(deactivated.all())
+        counts = (await conn.execute(counters)).one()
+
+    return CategoryMediaReconcileResult(
+        discovered=counts.discovered,
+        created=counts.created,
+        changed=counts.changed,
+        reactivated=counts.reactivated,
+        deactivated=counts.deactivated,
+        unchanged=counts.unchanged,
+    )
 
 
 async def materialize_category_media(
@@ -195,6 +374,62 @@ async def invalidate_category_media_file_id(
     return _category_media_from_row(row) if row is not None else None
 
 
+_STAGED_SOURCE_COLUMNS = (
+    category_media_staging.c.source_path,
+    category_media_staging.c.source_revision,
+    category_media_staging.c.name,
+    category_media_staging.c.mime_type,
+    category_media_staging.c.telegram_media_type,
+)
+
+
+def _old(column: Column[Any]) -> ColumnElement[Any]:
+    """Значение столбца до изменения строки в `RETURNING`; у вставленной строки — `NULL`"""
+    return literal_column(f"old.{column.name}", type_=column.type)
+
+
+def _update_on_conflict(statement: Insert, *, now: datetime) -> Insert:
+    excluded = statement.excluded
+    revision_changed = category_media.c.source_revision != excluded.source_revision
+    metadata_changed = or_(
+        category_media.c.name != excluded.name,
+        category_media.c.mime_type != excluded.mime_type,
+        category_media.c.telegram_media_type != excluded.telegram_media_type,
+    )
+    row_changed = or_(
+        revision_changed,
+        metadata_changed,
+        category_media.c.is_active.is_(False),
+    )
+    return statement.on_conflict_do_update(
+        constraint="category_media_subscription_type_source_path_key",
+        set_={
+            "source_revision": excluded.source_revision,
+            "name": excluded.name,
+            "mime_type": excluded.mime_type,
+            "telegram_media_type": excluded.telegram_media_type,
+            "telegram_file_id": case(
+                (revision_changed, None),
+                else_=category_media.c.telegram_file_id,
+            ),
+            "telegram_file_unique_id": case(
+                (revision_changed, None),
+                else_=category_media.c.telegram_file_unique_id,
+            ),
+            "materialized_at": case(
+                (revision_changed, None),
+                else_=category_media.c.materialized_at,
+            ),
+            "is_active": True,
+            "last_seen_at": now,
+            "updated_at": case(
+                (row_changed, now),
+                else_=category_media.c.updated_at,
+            ),
+        },
+    )
+
+
 def _category_media_from_row(row: Row[Any]) -> CategoryMedia:
     return CategoryMedia(
         id=row.id,
@@ -0,0 +1,47 @@
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+
+from .connection import get_connection
+from .entities.category_media_sync_state import CategoryMediaSyncState
+from .tables import category_media_sync_states
+
+
+async def get_category_media_sync_states() -> list[CategoryMediaSyncState]:
+    async with get_connection() as conn:
+        rows = (await conn.execute(select(category_media_sync_states))).all()
+    return [_category_media_sync_state_from_row(row) for row in rows]
+
+
+async def save_category_media_sync_state(state: CategoryMediaSyncState) -> None:
+    values = {
+        "subscription_type_id": state.subscription_type_id,
+        "directory_path": state.directory_path,
+        "folder_modified": state.folder_modified,
+        "item_count": state.item_count,
+        "listing_hash": state.listing_hash,
+        "reconciled_at": state.reconciled_at,
+        "checked_at": state.checked_at,
+    }
+    statement = insert(category_media_sync_states).values(values)
+    async with get_connection() as conn:
+        await conn.execute(
+            statement.on_conflict_do_update(
+                index_elements=[category_media_sync_states.c.subscription_type_id],
+                set_={key: value for key, value in values.items() if key != "subscription_type_id"},
+            )
+        )
+
+
+def _category_media_sync_state_from_row(row: Row[Any]) -> CategoryMediaSyncState:
+    return CategoryMediaSyncState(
+        subscription_type_id=row.subscription_type_id,
+        directory_path=row.directory_path,
+        folder_modified=row.folder_modified,
+        item_count=row.item_count,
+        listing_hash=row.listing_hash,
+        reconciled_at=row.reconciled_at,
+        checked_at=row.checked_at,
+    )
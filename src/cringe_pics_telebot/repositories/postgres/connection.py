@@ -1,13 +1,21 @@
-from collections.abc import AsyncGenerator
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator
 from contextlib import asynccontextmanager
 from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+from time import monotonic
+from typing import Any
+from uuid import uuid4
 
-from sqlalchemy import URL
+from sqlalchemy import URL, AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import ConnectionPoolEntry
 
 _session: ContextVar[AsyncSession] = ContextVar("_session")
 _sessionmaker: ContextVar[async_sessionmaker] = ContextVar("_sessionmaker")
 _engine: ContextVar[AsyncEngine] = ContextVar("_asyncpg_engine")
+_pool_settings: ContextVar[PoolSettings] = ContextVar("_pool_settings")
 
 
 class DbConnectionError(Exception): ...
@@ -19,6 +27,65 @@ class NotConnectedError(DbConnectionError): ...
 class AlreadyConnectedError(DbConnectionError): ...
 
 
+class ListenUnavailableError(DbConnectionError): ...
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class PoolSettings:
+    pool_size: int = 10
+    """Сколько соединений пул держит открытыми"""
+    max_overflow: int = 20
+    """Сколько соединений можно открыть сверх `pool_size` во время всплесков нагрузки"""
+    pool_timeout: timedelta = timedelta(seconds=30)
+    """Сколько ждать свободное соединение, прежде чем упасть с ошибкой"""
+    pool_recycle: timedelta | None = timedelta(minutes=30)
+    """Через сколько переоткрывать соединение; `None` — не переоткрывать"""
+    pool_pre_ping: bool = False
+    """Проверять соединение перед выдачей из пула; добавляет лишний запрос к каждой выдаче"""
+    statement_cache_size: int = 100
+    """Размер кэша подготовленных выражений на одно соединение"""
+    pgbouncer: bool = False
+    """Режим совместимости с PgBouncer в режиме transaction: без кэша подготовленных выражений"""
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class PoolStats:
+    size: int
+    """Настроенный размер пула"""
+    checked_in: int
+    """Свободные соединения в пуле"""
+    checked_out: int
+    """Соединения, выданные сессиям"""
+    overflow: int
+    """Соединения сверх `size`; отрицательное значение — пул ещё не заполнен"""
+    checkouts: int
+    """Сколько раз соединение выдавалось из пула с момента подключения"""
+    total_wait: timedelta
+    """Суммарное время ожидания соединения"""
+    max_wait: timedelta
+    """Самое долгое ожидание соединения"""
+
+
+class _InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул, который считает выдачи соединений и время их ожидания"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started_at = monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            wait = monotonic() - started_at
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+
 @asynccontextmanager
 async def connect(
     *,
@@ -27,6 +94,7 @@ async def connect(
     database: str,
     port: int,
     host: str,
+    pool: PoolSettings | None = None,
 ) -> AsyncGenerator[tuple[AsyncEngine, async_sessionmaker]]:
     try:
         _engine.get()
@@ -34,6 +102,7 @@ async def connect(
     except LookupError:
         pass
 
+    pool = pool or PoolSettings()
     with (
         _engine.set(
             create_async_engine(
@@ -44,10 +113,18 @@ async def connect(
                     host=host,
                     port=port,
                     database=database,
-                )
+                ),
+                poolclass=_InstrumentedPool,
+                pool_size=pool.pool_size,
+                max_overflow=pool.max_overflow,
+                pool_timeout=pool.pool_timeout.total_seconds(),
+                pool_recycle=int(pool.pool_recycle.total_seconds()) if pool.pool_recycle is not None else -1,
+                pool_pre_ping=pool.pool_pre_ping,
+                connect_args=_connect_args(pool),
             )
         ),
         _sessionmaker.set(async_sessionmaker(_engine.get())),
+        _pool_settings.set(pool),
     ):
         yield _engine.get(), _sessionmaker.get()
         await _engine.get().dispose()
@@ -60,6 +137,21 @@ def get_engine() -> AsyncEngine:
         raise NotConnectedError from e
 
 
+def get_pool_stats() -> PoolStats:
+    pool = get_engine().pool
+    if not isinstance(pool, _InstrumentedPool):
+        raise DbConnectionError("Pool metrics are unavailable for this engine")
+    return PoolStats(
+        size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+        checkouts=pool.checkouts,
+        total_wait=timedelta(seconds=pool.total_wait),
+        max_wait=timedelta(seconds=pool.max_wait),
+    )
+
+
 def get_sessionmaker() -> async_sessionmaker:
     try:
         return _sessionmaker.get()
@@ -77,6 +169,40 @@ async def get_connection() -> AsyncGenerator[AsyncSession]:
                 yield session
 
 
+@asynccontextmanager
+async def listen(channel: str) -> AsyncGenerator[AsyncIterator[str]]:
+    """Подписывается на `NOTIFY` канала на отдельном соединении из пула"""
+    pool = _pool_settings.get(None)
+    if pool is not None and pool.pgbouncer:
+        # PgBouncer в режиме transaction отдаёт серверное соединение только на время транзакции,
+        # поэтому подписка `LISTEN` на нём молча не получает уведомлений
+        raise ListenUnavailableError(f"Cannot listen to {channel!r} through PgBouncer in transaction mode")
+    notifications: asyncio.Queue[str | None] = asyncio.Queue()
+
+    def on_notification(connection: object, pid: int, channel: str, payload: str) -> None:
+        notifications.put_nowait(payload)
+
+    def on_termination(connection: object) -> None:
+        notifications.put_nowait(None)
+
+    async def receive() -> AsyncIterator[str]:
+        while (payload := await notifications.get()) is not None:
+            yield payload
+        raise DbConnectionError(f"Listener connection for {channel!r} was closed")
+
+    async with get_engine().connect() as conn:
+        driver_connection = (await conn.get_raw_connection()).driver_connection
+        assert driver_connection is not None
+        driver_connection.add_termination_listener(on_termination)
+        await driver_connection.add_listener(channel, on_notification)
+        try:
+            yield receive()
+        finally:
+            driver_connection.remove_termination_listener(on_termination)
+            if not driver_connection.is_closed():
+                await driver_connection.remove_listener(channel, on_notification)
+
+
 @asynccontextmanager
 async def transaction() -> AsyncGenerator[None]:
     async with get_connection() as conn:
@@ -85,3 +211,22 @@ async def transaction() -> AsyncGenerator[None]:
         else:
             async with conn.begin():
                 yield
+
+
+def _connect_args(pool: PoolSettings) -> dict[str, Any]:
+    if pool.pgbouncer:
+        # PgBouncer в режиме transaction отдаёт разные серверные соединения,
+        # поэтому подготовленные выражения не кэшируются и получают уникальные имена
+        return {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": _unique_prepared_statement_name,
+        }
+    return {
+        "prepared_statement_cache_size": pool.statement_cache_size,
+        "statement_cache_size": pool.statement_cache_size,
+    }
+
+
+def _unique_prepared_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
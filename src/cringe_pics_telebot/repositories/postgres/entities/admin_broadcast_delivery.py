@@ -18,3 +18,10 @@ class AdminBroadcastDelivery:
     attempted_at: datetime
     finished_at: datetime | None
     error: str | None
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class AdminBroadcastDeliveryOutcome:
+    delivery_id: int
+    status: AdminBroadcastDeliveryStatus
+    error: str | None = None
@@ -42,6 +42,15 @@ class CategoryMedia:
     updated_at: datetime
 
 
+@dataclass(frozen=True, slots=True)
+class CategoryMediaSummary:
+    id: int
+    subscription_type_id: int
+    source_path: str
+    is_ready: bool
+    """Есть ли у медиа `file_id` Telegram"""
+
+
 @dataclass(frozen=True, slots=True)
 class CategoryMediaReconcileResult:
     discovered: int
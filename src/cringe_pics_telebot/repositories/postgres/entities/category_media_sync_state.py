@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CategoryMediaSyncState:
+    subscription_type_id: int
+    """ID категории"""
+    directory_path: str
+    """Папка на Яндекс Диске, для которой снят отпечаток"""
+    folder_modified: datetime | None
+    """Время изменения папки по данным Яндекс Диска"""
+    item_count: int
+    """Сколько элементов было в папке"""
+    listing_hash: str
+    """Хэш путей и ревизий изображений папки"""
+    reconciled_at: datetime
+    """Когда каталог категории последний раз сверялся с папкой"""
+    checked_at: datetime
+    """Когда папку последний раз проверяли на изменения"""
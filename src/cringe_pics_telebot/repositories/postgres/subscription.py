@@ -4,8 +4,8 @@ from sqlalchemy.dialects.postgresql import insert
 from cringe_pics_telebot.entities.subscriptions import SubscriptionInfo
 
 from .connection import get_connection
-from .entities import CreateSubscription, Subscription, User
-from .tables import subscription_types, subscriptions, users
+from .entities import CreateSubscription, Subscription
+from .tables import subscription_types, subscriptions
 
 st = subscription_types
 s = subscriptions
@@ -60,27 +60,21 @@ async def get_user_subscriptions(user_id: int) -> list[SubscriptionInfo]:
         ]
 
 
-async def get_subscription_users(subscription_type_id: int) -> list[User]:
+async def get_due_subscription_user_ids(due_utc_minute: int) -> dict[int, list[int]]:
     async with get_connection() as conn:
         rows = (
             await conn.execute(
-                select(users)
-                .select_from(s.join(users, users.c.id == s.c.user_id))
-                .where(s.c.subscription_type_id == subscription_type_id)
+                select(s.c.subscription_type_id, s.c.user_id)
+                .where(s.c.due_utc_minute == due_utc_minute)
                 .distinct()
-                .order_by(users.c.id)
+                .order_by(s.c.subscription_type_id, s.c.user_id)
             )
         ).fetchall()
 
-        return [
-            User(
-                id=row.id,
-                timezone_offset_minutes=row.timezone_offset_minutes,
-                is_active=row.is_active,
-                created_at=row.created_at,
-            )
-            for row in rows
-        ]
+    user_ids_by_subscription_type: dict[int, list[int]] = {}
+    for row in rows:
+        user_ids_by_subscription_type.setdefault(row.subscription_type_id, []).append(row.user_id)
+    return user_ids_by_subscription_type
 
 
 async def delete_subscription(*, user_id: int, subscription_type_id: int) -> None:
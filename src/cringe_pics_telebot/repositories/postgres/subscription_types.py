@@ -8,6 +8,9 @@ from .connection import get_connection
 from .entities.subscription_type import SubscriptionType
 from .tables import subscription_types
 
+SUBSCRIPTION_TYPES_CHANNEL = "subscription_types_changed"
+"""Канал `NOTIFY`, в который триггер пишет после любого изменения `subscription_types`"""
+
 
 async def get_subscription_types() -> list[SubscriptionType]:
     async with get_connection() as conn:
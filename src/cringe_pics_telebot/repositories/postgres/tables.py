@@ -180,6 +180,48 @@ category_media = sa.Table(
         "is_active",
         "id",
     ),
+    sa.Index(
+        "category_media_pending_idx",
+        "id",
+        postgresql_where=sa.text("is_active AND telegram_file_id IS NULL"),
+    ),
+)
+
+# снимки папок копируются сюда порциями, каждая своей короткой транзакцией, и сливаются с каталогом в конце;
+# строки одного прогона сверки помечены `sync_run_id`, журнал WAL для них не пишется
+category_media_staging = sa.Table(
+    "category_media_staging",
+    _metadata,
+    sa.Column("position", sa.BIGINT, sa.Identity(always=True), primary_key=True, nullable=False),
+    sa.Column("sync_run_id", sa.UUID, nullable=False),
+    sa.Column("source_path", sa.Text, nullable=False),
+    sa.Column("source_revision", sa.Text, nullable=False),
+    sa.Column("name", sa.Text, nullable=False),
+    sa.Column("mime_type", sa.Text, nullable=False),
+    sa.Column("telegram_media_type", sa.Text, nullable=False),
+    sa.Column("staged_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    sa.Index("category_media_staging_run_path_idx", "sync_run_id", "source_path"),
+    sa.Index("category_media_staging_staged_at_idx", "staged_at"),
+    prefixes=["UNLOGGED"],
+)
+
+category_media_sync_states = sa.Table(
+    "category_media_sync_states",
+    _metadata,
+    sa.Column(
+        "subscription_type_id",
+        sa.BIGINT,
+        sa.ForeignKey(subscription_types.c.id, ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    ),
+    sa.Column("directory_path", sa.Text, nullable=False),
+    sa.Column("folder_modified", sa.DateTime(timezone=True), nullable=True),
+    sa.Column("item_count", sa.INTEGER, nullable=False),
+    sa.Column("listing_hash", sa.Text, nullable=False),
+    sa.Column("reconciled_at", sa.DateTime(timezone=True), nullable=False),
+    sa.Column("checked_at", sa.DateTime(timezone=True), nullable=False),
+    sa.CheckConstraint("item_count >= 0", name="category_media_sync_states_item_count_nonnegative"),
 )
 
 subscriptions = sa.Table(
@@ -198,6 +240,15 @@ subscriptions = sa.Table(
         sa.ForeignKey(users.c.id),
         nullable=False,
     ),
+    sa.Column(
+        "due_utc_minute",
+        sa.SMALLINT,
+        nullable=False,
+        server_default=sa.FetchedValue(),
+        server_onupdate=sa.FetchedValue(),
+    ),
     _time_column("created_at"),
+    sa.CheckConstraint("due_utc_minute BETWEEN 0 AND 1439", name="subscriptions_due_utc_minute_range"),
     sa.Index("subscriptions_user_id_idx", _subscriptions_user_id),
+    sa.Index("subscriptions_due_utc_minute_idx", "due_utc_minute", "subscription_type_id", "user_id"),
 )
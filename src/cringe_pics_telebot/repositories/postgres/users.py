@@ -1,3 +1,4 @@
+from collections.abc import Collection
 from datetime import UTC, datetime
 
 from sqlalchemy import select, update
@@ -45,9 +46,11 @@ async def get_active_users() -> list[User]:
     ]
 
 
-async def deactivate_user(user_id: int) -> None:
+async def deactivate_users(user_ids: Collection[int]) -> None:
+    if not user_ids:
+        return
     async with get_connection() as conn:
-        await conn.execute(update(users).where(users.c.id == user_id).values(is_active=False))
+        await conn.execute(update(users).where(users.c.id.in_(set(user_ids))).values(is_active=False))
 
 
 async def get_user_timezone_offset(user_id: int) -> int | None:
@@ -1,14 +1,39 @@
 from .connection import RedisConnectionError, RedisError, connect, get_connection
-from .repo import cached, delete_if_value, get, refresh_if_value, set, set_if_absent
+from .repo import (
+    RateLimitBucket,
+    cached,
+    delete,
+    delete_if_value,
+    get,
+    get_many,
+    listen,
+    pause_rate_limit,
+    publish,
+    refresh_if_value,
+    set,
+    set_if_absent,
+    set_many,
+    set_many_if_absent,
+    take_rate_limit_token,
+)
 
 __all__ = [
     "connect",
     "get_connection",
     "set",
+    "set_many",
     "set_if_absent",
+    "set_many_if_absent",
     "refresh_if_value",
+    "delete",
     "delete_if_value",
+    "publish",
+    "listen",
+    "take_rate_limit_token",
+    "pause_rate_limit",
+    "RateLimitBucket",
     "get",
+    "get_many",
     "cached",
     "RedisError",
     "RedisConnectionError",
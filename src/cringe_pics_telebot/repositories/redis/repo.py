@@ -1,16 +1,72 @@
 import hashlib
 import json
 import logging
-from collections.abc import Callable, Coroutine
+import math
+from collections.abc import AsyncGenerator, AsyncIterator, Callable, Coroutine, Mapping, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import timedelta
 from typing import Any, Protocol, get_type_hints, overload, runtime_checkable
 
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
 from cringe_pics_telebot.helpers.serializers import get_serializer
 
 from .connection import get_connection
 
 logger = logging.getLogger(__name__)
 
+PIPELINE_CHUNK_SIZE = 1_000
+
+_TAKE_RATE_LIMIT_TOKEN_SCRIPT = """
+local paused_for = redis.call('pttl', KEYS[1])
+if paused_for > 0 then
+    return paused_for
+end
+
+local clock = redis.call('time')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local wait = 0
+local tokens = {}
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[(i - 2) * 3 + 1])
+    local capacity = tonumber(ARGV[(i - 2) * 3 + 2])
+    local reserve = tonumber(ARGV[(i - 2) * 3 + 3])
+    local state = redis.call('hmget', KEYS[i], 'tokens', 'updated_at')
+    local available = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - updated_at) * rate / 1000)
+    tokens[i] = available
+    if available < 1 + reserve then
+        wait = math.max(wait, math.ceil((1 + reserve - available) * 1000 / rate))
+    end
+end
+if wait > 0 then
+    return wait
+end
+
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[(i - 2) * 3 + 1])
+    local capacity = tonumber(ARGV[(i - 2) * 3 + 2])
+    redis.call('hset', KEYS[i], 'tokens', tokens[i] - 1, 'updated_at', now)
+    redis.call('pexpire', KEYS[i], math.ceil(capacity * 1000 / rate) + 1000)
+end
+return 0
+"""
+_PAUSE_RATE_LIMIT_SCRIPT = (
+    "if redis.call('pttl', KEYS[1]) < tonumber(ARGV[1]) then "
+    "return redis.call('set', KEYS[1], '1', 'PX', ARGV[1]) else return 0 end"
+)
+_REFRESH_IF_VALUE_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) else return 0 end"
+)
+_DELETE_IF_VALUE_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+)
+
+_scripts: dict[str, AsyncScript] = {}
+
 
 @runtime_checkable
 class _CallableWithName[**P, R](Protocol):
@@ -38,6 +94,24 @@ async def set[T](*, key: str, value: T, cls: type[T], ttl: timedelta | None = No
             raise
 
 
+async def set_many[T](*, values: Mapping[str, T], cls: type[T], ttl: timedelta | None = None) -> None:
+    if not values:
+        return
+
+    async with get_connection() as conn:
+        serializer = get_serializer(cls)
+        items = list(values.items())
+        for start in range(0, len(items), PIPELINE_CHUNK_SIZE):
+            async with conn.pipeline(transaction=False) as pipe:
+                for key, value in items[start : start + PIPELINE_CHUNK_SIZE]:
+                    try:
+                        pipe.set(name=key, value=json.dumps(serializer.dump(value)), ex=ttl)
+                    except Exception:
+                        logger.exception("Tried to serialize %s", value)
+                        raise
+                await pipe.execute()
+
+
 async def set_if_absent[T](*, key: str, value: T, cls: type[T], ttl: timedelta | None = None) -> bool:
     async with get_connection() as conn:
         serializer = get_serializer(cls)
@@ -51,34 +125,118 @@ async def set_if_absent[T](*, key: str, value: T, cls: type[T], ttl: timedelta |
         return bool(result)
 
 
+async def set_many_if_absent[T](
+    *,
+    keys: Sequence[str],
+    value: T,
+    cls: type[T],
+    ttl: timedelta | None = None,
+) -> list[bool]:
+    if not keys:
+        return []
+
+    async with get_connection() as conn:
+        serializer = get_serializer(cls)
+
+        try:
+            payload = json.dumps(serializer.dump(value))
+        except Exception:
+            logger.exception("Tried to serialize %s", value)
+            raise
+
+        results: list[bool] = []
+        for start in range(0, len(keys), PIPELINE_CHUNK_SIZE):
+            async with conn.pipeline(transaction=False) as pipe:
+                for key in keys[start : start + PIPELINE_CHUNK_SIZE]:
+                    pipe.set(name=key, value=payload, ex=ttl, nx=True)
+                results.extend(bool(result) for result in await pipe.execute())
+
+        return results
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitBucket:
+    key: str
+    """Ключ token bucket в Redis"""
+    rate: float
+    """Скорость пополнения, токенов в секунду"""
+    capacity: float
+    """Максимальное число накопленных токенов"""
+    reserve: float = 0
+    """Сколько токенов должно остаться в bucket после списания"""
+
+
+async def take_rate_limit_token(*, pause_key: str, buckets: Sequence[RateLimitBucket]) -> timedelta:
+    if any(bucket.rate <= 0 or bucket.capacity < 1 + bucket.reserve for bucket in buckets):
+        raise ValueError("Rate limit buckets must have a positive rate and room for one token above the reserve")
+
+    async with get_connection() as conn:
+        wait_ms = await _script(conn, _TAKE_RATE_LIMIT_TOKEN_SCRIPT)(
+            keys=[pause_key, *(bucket.key for bucket in buckets)],
+            args=[value for bucket in buckets for value in (bucket.rate, bucket.capacity, bucket.reserve)],
+            client=conn,
+        )
+        return timedelta(milliseconds=int(wait_ms))
+
+
+async def pause_rate_limit(*, pause_key: str, ttl: timedelta) -> None:
+    async with get_connection() as conn:
+        await _script(conn, _PAUSE_RATE_LIMIT_SCRIPT)(
+            keys=[pause_key],
+            args=[math.ceil(ttl.total_seconds() * 1000)],
+            client=conn,
+        )
+
+
 async def refresh_if_value[T](*, key: str, value: T, cls: type[T], ttl: timedelta) -> bool:
     async with get_connection() as conn:
         serializer = get_serializer(cls)
         expected = json.dumps(serializer.dump(value))
-        result = await conn.eval(
-            "if redis.call('get', KEYS[1]) == ARGV[1] then "
-            "return redis.call('expire', KEYS[1], ARGV[2]) else return 0 end",
-            1,
-            key,
-            expected,
-            int(ttl.total_seconds()),
+        result = await _script(conn, _REFRESH_IF_VALUE_SCRIPT)(
+            keys=[key],
+            args=[expected, int(ttl.total_seconds())],
+            client=conn,
         )
         return bool(result)
 
 
+async def delete(*, key: str) -> None:
+    async with get_connection() as conn:
+        await conn.delete(key)
+
+
 async def delete_if_value[T](*, key: str, value: T, cls: type[T]) -> bool:
     async with get_connection() as conn:
         serializer = get_serializer(cls)
         expected = json.dumps(serializer.dump(value))
-        result = await conn.eval(
-            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end",
-            1,
-            key,
-            expected,
-        )
+        result = await _script(conn, _DELETE_IF_VALUE_SCRIPT)(keys=[key], args=[expected], client=conn)
         return bool(result)
 
 
+async def publish(*, channel: str, message: str = "") -> None:
+    async with get_connection() as conn:
+        await conn.publish(channel, message)
+
+
+@asynccontextmanager
+async def listen(pattern: str) -> AsyncGenerator[AsyncIterator[str]]:
+    """Подписывается на каналы по шаблону и отдаёт имена каналов, в которые пришли сообщения"""
+    async with get_connection() as conn:
+        pubsub = conn.pubsub(ignore_subscribe_messages=True)
+
+        async def receive() -> AsyncIterator[str]:
+            async for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    channel = message["channel"]
+                    yield channel.decode() if isinstance(channel, bytes) else channel
+
+        try:
+            await pubsub.psubscribe(pattern)
+            yield receive()
+        finally:
+            await pubsub.aclose()
+
+
 async def get[T](*, key: str, cls: type[T]) -> T | None:
     async with get_connection() as conn:
         value = await conn.get(name=key)
@@ -89,6 +247,21 @@ async def get[T](*, key: str, cls: type[T]) -> T | None:
         return serializer.load(json.loads(value))
 
 
+async def get_many[T](*, keys: Sequence[str], cls: type[T]) -> list[T | None]:
+    if not keys:
+        return []
+
+    async with get_connection() as conn:
+        serializer = get_serializer(cls)
+        values: list[T | None] = []
+        for start in range(0, len(keys), PIPELINE_CHUNK_SIZE):
+            values.extend(
+                None if value is None else serializer.load(json.loads(value))
+                for value in await conn.mget(keys[start : start + PIPELINE_CHUNK_SIZE])
+            )
+        return values
+
+
 def _make_key[**P, R](func: _Wrappable[P, R], *args: P.args, **kwargs: P.kwargs) -> str:
     try:
         payload = json.dumps((args, kwargs), default=repr, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
@@ -99,6 +272,14 @@ def _make_key[**P, R](func: _Wrappable[P, R], *args: P.args, **kwargs: P.kwargs)
     return f"{func.__module__}.{func.__name__}:{digest}"
 
 
+def _script(conn: Redis, source: str) -> AsyncScript:
+    """Регистрирует Lua-скрипт один раз на процесс: дальше Redis получает только его SHA через `EVALSHA`"""
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = conn.register_script(source)
+    return script
+
+
 @overload
 def cached[**P, R](func: _Wrappable[P, R], *, ttl: None = None) -> _CachedWrapper[P, R]: ...
 
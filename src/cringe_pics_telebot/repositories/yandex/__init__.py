@@ -1,7 +1,15 @@
+from .connection import AlreadyConnectedError as AlreadyConnectedError
+from .connection import ConnectionStats as ConnectionStats
+from .connection import ConnectorSettings as ConnectorSettings
+from .connection import NotConnectedError as NotConnectedError
 from .connection import connect as connect
 from .connection import get_connection as get_connection
+from .connection import get_connection_stats as get_connection_stats
+from .repo import get_dir_info as get_dir_info
 from .repo import get_download_urls as get_download_urls
+from .repo import get_last_uploaded as get_last_uploaded
 from .repo import list_dir as list_dir
+from .yandex import DirectoryInfo as DirectoryInfo
 from .yandex import Image as Image
 from .yandex import YandexS3Client as YandexS3Client
 from .yandex import resource_revision as resource_revision
@@ -1,10 +1,18 @@
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+from types import SimpleNamespace
+
+import aiohttp
+
+from cringe_pics_telebot.helpers.aiohttp_rate_limit_middleware import aiohttp_rate_limit_middleware_factory
 
 from .yandex import YandexS3Client
 
-_TOKEN: str | None = None
-_API_BASE_URL: str | None = None
+_client: ContextVar[YandexS3Client] = ContextVar("_yandex_client")
+_stats: ContextVar[_ConnectionCounters] = ContextVar("_yandex_connection_stats")
 
 
 class S3ConnectionError(ConnectionError): ...
@@ -13,16 +21,118 @@ class S3ConnectionError(ConnectionError): ...
 class NotConnectedError(S3ConnectionError): ...
 
 
-def connect(token: str, *, api_base_url: str | None = None) -> None:
-    global _API_BASE_URL, _TOKEN
-    _TOKEN = token
-    _API_BASE_URL = api_base_url
+class AlreadyConnectedError(S3ConnectionError): ...
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class ConnectorSettings:
+    limit: int = 100
+    """Сколько соединений с Яндекс Диском можно держать одновременно"""
+    limit_per_host: int = 32
+    """Сколько соединений можно открыть к одному хосту"""
+    keepalive_timeout: timedelta = timedelta(seconds=30)
+    """Сколько держать открытым простаивающее соединение"""
+    dns_cache_ttl: timedelta = timedelta(minutes=5)
+    """Сколько помнить результат DNS-запроса"""
+    requests_per_second: float | None = 20
+    """Общий лимит запросов к API Яндекс Диска; `None` — без ограничения"""
+
+
+@dataclass(frozen=True, slots=True)
+class ConnectionStats:
+    requests: int
+    """Сколько запросов отправлено с момента подключения"""
+    created: int
+    """Сколько соединений было открыто"""
+    reused: int
+    """Сколько запросов ушло по уже открытому соединению"""
+    dns_cache_hits: int
+    """Сколько раз адрес хоста взят из кэша DNS"""
+
+
+@dataclass(slots=True)
+class _ConnectionCounters:
+    requests: int = 0
+    created: int = 0
+    reused: int = 0
+    dns_cache_hits: int = 0
+
+
+@asynccontextmanager
+async def connect(
+    token: str,
+    *,
+    api_base_url: str | None = None,
+    connector: ConnectorSettings | None = None,
+) -> AsyncGenerator[YandexS3Client]:
+    try:
+        _client.get()
+        raise AlreadyConnectedError
+    except LookupError:
+        pass
+
+    connector = connector or ConnectorSettings()
+    counters = _ConnectionCounters()
+    client = YandexS3Client(
+        token,
+        api_base_url=api_base_url,
+        connector=aiohttp.TCPConnector(
+            limit=connector.limit,
+            limit_per_host=connector.limit_per_host,
+            keepalive_timeout=connector.keepalive_timeout.total_seconds(),
+            ttl_dns_cache=int(connector.dns_cache_ttl.total_seconds()),
+        ),
+        trace_configs=[_trace_config(counters)],
+        middlewares=(
+            [aiohttp_rate_limit_middleware_factory(connector.requests_per_second)]
+            if connector.requests_per_second is not None
+            else []
+        ),
+    )
+    async with client:
+        with _client.set(client), _stats.set(counters):
+            yield client
 
 
 @asynccontextmanager
 async def get_connection() -> AsyncGenerator[YandexS3Client]:
-    if _TOKEN is None:
-        raise NotConnectedError
+    try:
+        yield _client.get()
+    except LookupError as e:
+        raise NotConnectedError from e
+
+
+def get_connection_stats() -> ConnectionStats:
+    try:
+        counters = _stats.get()
+    except LookupError as e:
+        raise NotConnectedError from e
+    return ConnectionStats(
+        requests=counters.requests,
+        created=counters.created,
+        reused=counters.reused,
+        dns_cache_hits=counters.dns_cache_hits,
+    )
+
+
+def _trace_config(counters: _ConnectionCounters) -> aiohttp.TraceConfig:
+    async def on_request_start(session: aiohttp.ClientSession, context: SimpleNamespace, params: object) -> None:
+        counters.requests += 1
+
+    async def on_connection_create_end(
+        session: aiohttp.ClientSession, context: SimpleNamespace, params: object
+    ) -> None:
+        counters.created += 1
+
+    async def on_connection_reuseconn(session: aiohttp.ClientSession, context: SimpleNamespace, params: object) -> None:
+        counters.reused += 1
+
+    async def on_dns_cache_hit(session: aiohttp.ClientSession, context: SimpleNamespace, params: object) -> None:
+        counters.dns_cache_hits += 1
 
-    async with YandexS3Client(_TOKEN, api_base_url=_API_BASE_URL) as client:
-        yield client
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    return trace_config
@@ -4,7 +4,7 @@ from collections.abc import AsyncGenerator, Iterable
 from typing import cast
 
 from cringe_pics_telebot.repositories.yandex.connection import get_connection
-from cringe_pics_telebot.repositories.yandex.yandex import Image
+from cringe_pics_telebot.repositories.yandex.yandex import DirectoryInfo, Image
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +15,16 @@ async def list_dir(dir: str) -> AsyncGenerator[Image]:
             yield image
 
 
+async def get_dir_info(dir: str) -> DirectoryInfo:
+    async with get_connection() as conn:
+        return await conn.get_dir_info(dir)
+
+
+async def get_last_uploaded(limit: int) -> list[Image]:
+    async with get_connection() as conn:
+        return await conn.last_uploaded(limit)
+
+
 async def get_download_urls(paths: Iterable[str]) -> list[str | None]:
     paths = list(paths)
     if not paths:
@@ -1,13 +1,15 @@
+import asyncio
 import hashlib
 import json
 import logging
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Sequence
 from dataclasses import dataclass
 from datetime import datetime
 from itertools import count
 from typing import Any
 
 import aiohttp
+from aiohttp import ClientMiddlewareType
 
 from cringe_pics_telebot.helpers.aiohttp_logger_middleware import (
     aiohttp_logging_middleware_factory,
@@ -33,6 +35,14 @@ class Image:
     """Время последнего изменения файла"""
 
 
+@dataclass(frozen=True, slots=True, kw_only=True)
+class DirectoryInfo:
+    modified: datetime | None
+    """Время последнего изменения папки"""
+    total: int
+    """Сколько элементов лежит в папке"""
+
+
 class YandexS3Client:
     """Клиент для загрузки файлов с Яндекс.Диска"""
 
@@ -41,23 +51,40 @@ class YandexS3Client:
     YANDEX_DISK_API_BASE_URL = "https://cloud-api.yandex.net/v1/disk/"
     YANDEX_DISK_DOWNLOAD_BASE_URL = "https://downloader.dst.yandex.ru/disk/"
 
-    def __init__(self, token: str, *, api_base_url: str | None = None, fetch_size: int = 1_000) -> None:
+    def __init__(
+        self,
+        token: str,
+        *,
+        api_base_url: str | None = None,
+        fetch_size: int = 1_000,
+        connector: aiohttp.BaseConnector | None = None,
+        trace_configs: list[aiohttp.TraceConfig] | None = None,
+        middlewares: Sequence[ClientMiddlewareType] = (),
+    ) -> None:
         """Создаёт клиент с заданным токеном приложения.
 
         Args:
             token (str): Токен приложения
+            connector (aiohttp.BaseConnector | None, optional): Пул соединений, который сессия закроет при выходе
+            trace_configs (list[aiohttp.TraceConfig] | None, optional): Обработчики событий сессии для метрик
+            middlewares (Sequence[ClientMiddlewareType], optional): Дополнительные middleware запросов
         """
 
         self._token = token
         self._api_base_url = api_base_url or self.YANDEX_DISK_API_BASE_URL
+        self._connector = connector
+        self._trace_configs = trace_configs
+        self._middlewares = tuple(middlewares)
 
         self.fetch_size = fetch_size
 
     async def __aenter__(self) -> YandexS3Client:
         self._session = aiohttp.ClientSession(
+            connector=self._connector,
             raise_for_status=True,
             headers={"Authorization": f"OAuth {self._token}"},
-            middlewares=[aiohttp_logging_middleware_factory(_logger)],
+            middlewares=[*self._middlewares, aiohttp_logging_middleware_factory(_logger)],
+            trace_configs=self._trace_configs,
         )
         await self._session.__aenter__()
         return self
@@ -102,45 +129,85 @@ class YandexS3Client:
             AsyncGenerator[Image]: Асинхронный генератор изображений в папке
         """
 
-        for i in count(0, self.fetch_size):
-            async with self._session.get(
-                self._create_url("/resources", base_url=self._api_base_url),
-                params={
-                    "path": self._get_path_with_app(path or ""),
-                    "limit": self.fetch_size,
-                    "offset": i,
-                },
-            ) as response:
-                items_count = 0
-                j = await response.json()
-                for item in j["_embedded"]["items"]:
-                    image_path: str = item["path"]
-
-                    # возвращаются пути вида
-                    # disk:/Приложения/Название приложения/путь
-                    # нас же интересует только путь, поэтому убираем префикс
-                    image_path = image_path.split("/", 3)[-1]
-
-                    try:
-                        mime_type: str | None = item["mime_type"]
-                    except KeyError:
-                        mime_type = None
-
-                    if mime_type is not None and mime_type.startswith("image"):
-                        modified_at = datetime.fromisoformat(item["modified"])
-                        yield Image(
-                            name=image_path.split("/", 4)[-1],
-                            mime_type=mime_type,
-                            path=image_path,
-                            source_revision=resource_revision(item),
-                            size=item["size"],
-                            modified_at=modified_at,
-                        )
-
-                    items_count += 1
-
-            if items_count < self.fetch_size:
-                break
+        # следующая страница запрашивается, пока вызывающий код обрабатывает текущую
+        next_page = asyncio.create_task(self._list_page(path, offset=0))
+        try:
+            for offset in count(self.fetch_size, self.fetch_size):
+                images, items_count = await next_page
+                has_more = items_count >= self.fetch_size
+                if has_more:
+                    next_page = asyncio.create_task(self._list_page(path, offset=offset))
+                for image in images:
+                    yield image
+                if not has_more:
+                    break
+        finally:
+            next_page.cancel()
+
+    async def _list_page(self, path: str, *, offset: int) -> tuple[list[Image], int]:
+        """Загружает одну страницу содержимого папки.
+
+        Returns:
+            tuple[list[Image], int]: Изображения страницы и число всех элементов на ней
+        """
+
+        async with self._session.get(
+            self._create_url("/resources", base_url=self._api_base_url),
+            params={
+                "path": self._get_path_with_app(path or ""),
+                "limit": self.fetch_size,
+                "offset": offset,
+            },
+        ) as response:
+            j = await response.json()
+
+        items = j["_embedded"]["items"]
+        images = [image for item in items if (image := _image_from_resource(item)) is not None]
+        return images, len(items)
+
+    async def get_dir_info(self, path: str) -> DirectoryInfo:
+        """Получает время изменения папки и число элементов в ней, не перечисляя содержимое.
+
+        Args:
+            path (str): Путь до папки
+
+        Returns:
+            DirectoryInfo: Отпечаток папки
+        """
+
+        async with self._session.get(
+            self._create_url("/resources", base_url=self._api_base_url),
+            params={
+                "path": self._get_path_with_app(path or ""),
+                "limit": 0,
+                "fields": "modified,_embedded.total",
+            },
+        ) as response:
+            j = await response.json()
+
+        modified = j.get("modified")
+        return DirectoryInfo(
+            modified=datetime.fromisoformat(modified) if modified is not None else None,
+            total=j["_embedded"]["total"],
+        )
+
+    async def last_uploaded(self, limit: int) -> list[Image]:
+        """Получает недавно загруженные изображения, новые первыми.
+
+        Args:
+            limit (int): Сколько файлов запросить
+
+        Returns:
+            list[Image]: Недавно загруженные изображения
+        """
+
+        async with self._session.get(
+            self._create_url("/resources/last-uploaded", base_url=self._api_base_url),
+            params={"limit": limit, "media_type": "image"},
+        ) as response:
+            j = await response.json()
+
+        return [image for item in j["items"] if (image := _image_from_resource(item)) is not None]
 
     async def get_download_url(self, path: str, dir: str | None = None) -> str:
         """Получает временную ссылку для скачивания файла.
@@ -163,6 +230,28 @@ class YandexS3Client:
             return (await response.json())["href"]
 
 
+def _image_from_resource(item: dict[str, Any]) -> Image | None:
+    image_path: str = item["path"]
+
+    # возвращаются пути вида
+    # disk:/Приложения/Название приложения/путь
+    # нас же интересует только путь, поэтому убираем префикс
+    image_path = image_path.split("/", 3)[-1]
+
+    mime_type: str | None = item.get("mime_type")
+    if mime_type is None or not mime_type.startswith("image"):
+        return None
+
+    return Image(
+        name=image_path.split("/", 4)[-1],
+        mime_type=mime_type,
+        path=image_path,
+        source_revision=resource_revision(item),
+        size=item["size"],
+        modified_at=datetime.fromisoformat(item["modified"]),
+    )
+
+
 def resource_revision(resource: dict[str, Any]) -> str:
     for algorithm in ("sha256", "md5"):
         if digest := resource.get(algorithm):
@@ -1,23 +1,29 @@
 import asyncio
 import logging
-from collections.abc import Awaitable, Callable
+import math
+from collections.abc import Awaitable, Callable, Sequence
+from contextlib import suppress
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta, timezone
+from typing import Self
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramForbiddenError
 
+from cringe_pics_telebot.bot.rate_limit import bulk_sends
 from cringe_pics_telebot.repositories.postgres import (
     complete_admin_broadcast,
-    deactivate_user,
-    finish_admin_broadcast_delivery,
-    get_admin_broadcast_users,
+    deactivate_users,
+    finish_admin_broadcast_deliveries,
     get_dispatchable_admin_broadcasts,
+    get_due_admin_broadcast_user_ids,
     reserve_admin_broadcast_deliveries,
     transaction,
 )
 from cringe_pics_telebot.repositories.postgres.entities import (
     AdminBroadcast,
     AdminBroadcastDelivery,
+    AdminBroadcastDeliveryOutcome,
     AdminBroadcastDeliveryStatus,
     User,
 )
@@ -30,6 +36,10 @@ from cringe_pics_telebot.services.timezones import (
 logger = logging.getLogger(__name__)
 
 DEFAULT_CHECK_INTERVAL = timedelta(seconds=30)
+DELIVERY_PAGE_SIZE = 500
+DELIVERY_WORKERS = 16
+OUTCOME_BATCH_SIZE = 500
+OUTCOME_FLUSH_INTERVAL = timedelta(seconds=2)
 _MAX_ERROR_LENGTH = 1000
 
 type TimeProvider = Callable[[], datetime]
@@ -61,9 +71,14 @@ async def run_due_admin_broadcasts(bot: Bot, *, now: datetime | None = None) ->
     if not broadcasts:
         return 0
 
-    sent_counts = await asyncio.gather(
-        *(_process_admin_broadcast(bot=bot, broadcast=broadcast, now=current_time) for broadcast in broadcasts)
-    )
+    with bulk_sends():
+        async with _DeliveryOutcomeBuffer() as outcomes:
+            sent_counts = await asyncio.gather(
+                *(
+                    _process_admin_broadcast(bot=bot, broadcast=broadcast, now=current_time, outcomes=outcomes)
+                    for broadcast in broadcasts
+                )
+            )
     return sum(sent_counts)
 
 
@@ -72,28 +87,28 @@ async def _process_admin_broadcast(
     bot: Bot,
     broadcast: AdminBroadcast,
     now: datetime,
+    outcomes: _DeliveryOutcomeBuffer,
 ) -> int:
     try:
-        users = await get_admin_broadcast_users(broadcast.id)
-        due_user_ids = [user.id for user in users if is_admin_broadcast_due(broadcast, user=user, now=now)]
-        async with transaction():
-            deliveries = await reserve_admin_broadcast_deliveries(
+        sent = 0
+        min_offset_minutes = min_due_timezone_offset(broadcast, now=now)
+        if min_offset_minutes <= MAX_TIMEZONE_OFFSET_MINUTES:
+            due_user_ids = await get_due_admin_broadcast_user_ids(
                 broadcast_id=broadcast.id,
-                user_ids=due_user_ids,
+                min_timezone_offset_minutes=min_offset_minutes,
             )
-
-        results = await asyncio.gather(
-            *(
-                _send_admin_broadcast_delivery(bot=bot, broadcast=broadcast, delivery=delivery)
-                for delivery in deliveries
+            sent = await _dispatch_admin_broadcast(
+                bot=bot,
+                broadcast=broadcast,
+                user_ids=due_user_ids,
+                outcomes=outcomes,
             )
-        )
 
         if is_admin_broadcast_complete(broadcast, now=now):
             async with transaction():
                 await complete_admin_broadcast(broadcast.id)
 
-        return sum(results)
+        return sent
     except asyncio.CancelledError:
         raise
     except Exception:
@@ -101,9 +116,50 @@ async def _process_admin_broadcast(
         return 0
 
 
+async def _dispatch_admin_broadcast(
+    *,
+    bot: Bot,
+    broadcast: AdminBroadcast,
+    user_ids: Sequence[int],
+    outcomes: _DeliveryOutcomeBuffer,
+) -> int:
+    queue: asyncio.Queue[AdminBroadcastDelivery | None] = asyncio.Queue(maxsize=DELIVERY_WORKERS * 2)
+    sent = 0
+
+    async def worker() -> None:
+        nonlocal sent
+        while (delivery := await queue.get()) is not None:
+            outcome = await _send_admin_broadcast_delivery(bot=bot, broadcast=broadcast, delivery=delivery)
+            sent += outcome.status is AdminBroadcastDeliveryStatus.sent
+            await outcomes.add(outcome)
+
+    reserve_error: Exception | None = None
+    async with asyncio.TaskGroup() as task_group:
+        for _ in range(DELIVERY_WORKERS):
+            task_group.create_task(worker())
+        try:
+            for page_start in range(0, len(user_ids), DELIVERY_PAGE_SIZE):
+                async with transaction():
+                    deliveries = await reserve_admin_broadcast_deliveries(
+                        broadcast_id=broadcast.id,
+                        user_ids=user_ids[page_start : page_start + DELIVERY_PAGE_SIZE],
+                    )
+                for delivery in deliveries:
+                    await queue.put(delivery)
+        except Exception as error:
+            # уже зарезервированные доставки нужно дослать и записать, иначе они навсегда останутся pending
+            reserve_error = error
+        for _ in range(DELIVERY_WORKERS):
+            await queue.put(None)
+
+    if reserve_error is not None:
+        raise reserve_error
+    return sent
+
+
 async def _send_admin_broadcast_delivery(
     *, bot: Bot, broadcast: AdminBroadcast, delivery: AdminBroadcastDelivery
-) -> int:
+) -> _DeliveryOutcome:
     try:
         await bot.copy_message(
             chat_id=delivery.user_id,
@@ -114,46 +170,48 @@ async def _send_admin_broadcast_delivery(
         raise
     except TelegramForbiddenError as error:
         logger.info("User %d is unavailable for admin broadcasts", delivery.user_id)
-        try:
-            async with transaction():
-                await deactivate_user(delivery.user_id)
-                await finish_admin_broadcast_delivery(
-                    delivery.id,
-                    status=AdminBroadcastDeliveryStatus.failed,
-                    error=_delivery_error(error),
-                )
-        except Exception:
-            logger.exception("Failed to record forbidden delivery %d", delivery.id)
-        return 0
+        return _DeliveryOutcome(
+            delivery=delivery,
+            status=AdminBroadcastDeliveryStatus.failed,
+            error=_delivery_error(error),
+            user_unavailable=True,
+        )
     except Exception as error:
         logger.exception(
             "Failed to copy admin broadcast %d to user %d",
             broadcast.id,
             delivery.user_id,
         )
-        try:
-            async with transaction():
-                await finish_admin_broadcast_delivery(
-                    delivery.id,
-                    status=AdminBroadcastDeliveryStatus.failed,
-                    error=_delivery_error(error),
-                )
-        except Exception:
-            logger.exception("Failed to record failed delivery %d", delivery.id)
-        return 0
+        return _DeliveryOutcome(
+            delivery=delivery,
+            status=AdminBroadcastDeliveryStatus.failed,
+            error=_delivery_error(error),
+        )
+    return _DeliveryOutcome(delivery=delivery, status=AdminBroadcastDeliveryStatus.sent)
 
+
+async def _record_delivery_outcomes(outcomes: Sequence[_DeliveryOutcome]) -> None:
     try:
         async with transaction():
-            await finish_admin_broadcast_delivery(
-                delivery.id,
-                status=AdminBroadcastDeliveryStatus.sent,
+            await deactivate_users([outcome.delivery.user_id for outcome in outcomes if outcome.user_unavailable])
+            await finish_admin_broadcast_deliveries(
+                [
+                    AdminBroadcastDeliveryOutcome(
+                        delivery_id=outcome.delivery.id,
+                        status=outcome.status,
+                        error=outcome.error,
+                    )
+                    for outcome in outcomes
+                ]
             )
     except asyncio.CancelledError:
         raise
     except Exception:
-        logger.exception("Failed to record successful delivery %d", delivery.id)
-
-    return 1
+        logger.exception(
+            "Failed to record %d admin broadcast deliveries: %s",
+            len(outcomes),
+            [outcome.delivery.id for outcome in outcomes],
+        )
 
 
 def is_admin_broadcast_due(broadcast: AdminBroadcast, *, user: User, now: datetime) -> bool:
@@ -163,6 +221,18 @@ def is_admin_broadcast_due(broadcast: AdminBroadcast, *, user: User, now: dateti
     return _local_naive_datetime(now, offset_minutes=offset_minutes) >= broadcast.scheduled_local_at
 
 
+def min_due_timezone_offset(broadcast: AdminBroadcast, *, now: datetime) -> int:
+    """Минимальное смещение часового пояса пользователя, при котором рассылка уже наступила"""
+    if broadcast.timezone_offset_minutes is not None:
+        if _local_naive_datetime(now, offset_minutes=broadcast.timezone_offset_minutes) >= broadcast.scheduled_local_at:
+            return MIN_TIMEZONE_OFFSET_MINUTES
+        return MAX_TIMEZONE_OFFSET_MINUTES + 1
+
+    utc_now = _local_naive_datetime(now, offset_minutes=0)
+    offset_minutes = math.ceil((broadcast.scheduled_local_at - utc_now) / timedelta(minutes=1))
+    return max(offset_minutes, MIN_TIMEZONE_OFFSET_MINUTES)
+
+
 def is_admin_broadcast_complete(broadcast: AdminBroadcast, *, now: datetime) -> bool:
     offset_minutes = broadcast.timezone_offset_minutes
     if offset_minutes is None:
@@ -182,3 +252,55 @@ def _delivery_error(error: Exception) -> str:
 
 def _now() -> datetime:
     return datetime.now(UTC)
+
+
+@dataclass(frozen=True, slots=True)
+class _DeliveryOutcome:
+    delivery: AdminBroadcastDelivery
+    status: AdminBroadcastDeliveryStatus
+    error: str | None = None
+    user_unavailable: bool = False
+    """Telegram запретил отправку, и пользователя нужно деактивировать"""
+
+
+class _DeliveryOutcomeBuffer:
+    """Копит результаты доставок и записывает их пачками: по размеру, по таймеру и при выходе"""
+
+    def __init__(
+        self,
+        *,
+        batch_size: int | None = None,
+        flush_interval: timedelta | None = None,
+    ) -> None:
+        self._batch_size = batch_size or OUTCOME_BATCH_SIZE
+        self._flush_interval = flush_interval or OUTCOME_FLUSH_INTERVAL
+        self._outcomes: list[_DeliveryOutcome] = []
+        self._closed = asyncio.Event()
+        self._flusher: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> Self:
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        # при остановке бота результаты уже отправленных сообщений всё равно должны попасть в БД
+        self._closed.set()
+        if self._flusher is not None:
+            await self._flusher
+        await self.flush()
+
+    async def add(self, outcome: _DeliveryOutcome) -> None:
+        self._outcomes.append(outcome)
+        if len(self._outcomes) >= self._batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._outcomes = self._outcomes, []
+        if batch:
+            await _record_delivery_outcomes(batch)
+
+    async def _flush_periodically(self) -> None:
+        while not self._closed.is_set():
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._closed.wait(), timeout=self._flush_interval.total_seconds())
+            await self.flush()
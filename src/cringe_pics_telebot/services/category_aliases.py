@@ -1,10 +1,61 @@
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+_NGRAM_SIZE = 3
+
+
 class InvalidCategoryAliasesError(ValueError): ...
 
 
+@dataclass(frozen=True, slots=True)
+class CategorySearchIndex:
+    terms: tuple[tuple[str, tuple[int, ...]], ...]
+    """Нормализованные термины поиска и ID категорий, к которым они относятся"""
+    ngrams: dict[str, frozenset[int]]
+    """Триграмма → позиции терминов в `terms`, которые её содержат"""
+
+    @classmethod
+    def build(cls, categories: Iterable[tuple[int, str, Sequence[str]]]) -> CategorySearchIndex:
+        category_ids_by_term: dict[str, list[int]] = {}
+        for category_id, name, search_aliases in categories:
+            for term in category_search_terms(name, search_aliases):
+                category_ids_by_term.setdefault(term, []).append(category_id)
+
+        terms = tuple((term, tuple(category_ids)) for term, category_ids in category_ids_by_term.items())
+        ngrams: dict[str, set[int]] = {}
+        for position, (term, _) in enumerate(terms):
+            for ngram in _ngrams(term):
+                ngrams.setdefault(ngram, set()).add(position)
+        return cls(terms=terms, ngrams={ngram: frozenset(positions) for ngram, positions in ngrams.items()})
+
+    def find(self, query: str) -> set[int]:
+        normalized_query = normalize_category_search_term(query)
+        if not normalized_query:
+            return set()
+
+        positions: Iterable[int] = range(len(self.terms))
+        if len(normalized_query) >= _NGRAM_SIZE:
+            postings = [self.ngrams.get(ngram, frozenset()) for ngram in _ngrams(normalized_query)]
+            positions = frozenset.intersection(*postings)
+
+        return {
+            category_id
+            for position in positions
+            if normalized_query in self.terms[position][0]
+            for category_id in self.terms[position][1]
+        }
+
+
 def normalize_category_search_term(term: str) -> str:
     return term.strip().removeprefix("/").casefold()
 
 
+def category_search_terms(name: str, search_aliases: Sequence[str] = ()) -> set[str]:
+    return {
+        normalized_term for term in (name, *search_aliases) if (normalized_term := normalize_category_search_term(term))
+    }
+
+
 def parse_category_search_aliases(value: str) -> tuple[str, ...]:
     aliases: list[str] = []
     normalized_aliases: set[str] = set()
@@ -22,3 +73,7 @@ def parse_category_search_aliases(value: str) -> tuple[str, ...]:
         raise InvalidCategoryAliasesError
 
     return tuple(aliases)
+
+
+def _ngrams(term: str) -> set[str]:
+    return {term[index : index + _NGRAM_SIZE] for index in range(len(term) - _NGRAM_SIZE + 1)}
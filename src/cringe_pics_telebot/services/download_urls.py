@@ -0,0 +1,130 @@
+import logging
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import timedelta
+from time import monotonic
+
+from cringe_pics_telebot.repositories import redis as cache
+from cringe_pics_telebot.repositories.postgres import CategoryMedia
+from cringe_pics_telebot.repositories.yandex import get_download_urls as get_yandex_download_urls
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_URL_TTL = timedelta(minutes=30)
+"""Меньше времени жизни ссылок Яндекс Диска, чтобы Telegram не получил протухшую ссылку"""
+LOCAL_DOWNLOAD_URL_TTL = timedelta(minutes=5)
+"""Сколько ссылка живёт в памяти процесса; запись из Redis могла быть сделана почти `DOWNLOAD_URL_TTL` назад"""
+LOCAL_DOWNLOAD_URL_CACHE_SIZE = 1_024
+DOWNLOAD_URL_KEY_PREFIX = "download-url"
+
+type _UrlKey = tuple[str, str]
+
+_local_urls: OrderedDict[_UrlKey, tuple[str, float]] = OrderedDict()
+_local_cache_size = LOCAL_DOWNLOAD_URL_CACHE_SIZE
+
+
+async def get_download_urls(media: Sequence[CategoryMedia]) -> list[str | None]:
+    """Возвращает ссылки на скачивание из кэша, за недостающими обращается к Яндекс Диску"""
+    urls = await get_cached_download_urls(media)
+    missing_media = [item for item, url in zip(media, urls, strict=True) if url is None]
+    fetched_urls = dict(
+        zip((_url_key(item) for item in missing_media), await fetch_download_urls(missing_media), strict=True)
+    )
+    return [url if url is not None else fetched_urls[_url_key(item)] for item, url in zip(media, urls, strict=True)]
+
+
+async def get_cached_download_urls(media: Sequence[CategoryMedia]) -> list[str | None]:
+    """Возвращает ссылки, которые уже есть в памяти процесса или в Redis, не обращаясь к Яндекс Диску"""
+    urls = [_get_local_url(_url_key(item)) for item in media]
+    missing_keys = list(dict.fromkeys(_url_key(item) for item, url in zip(media, urls, strict=True) if url is None))
+    if not missing_keys:
+        return urls
+
+    try:
+        shared_urls = await cache.get_many(keys=[_redis_key(key) for key in missing_keys], cls=str)
+    except Exception:
+        logger.exception("Failed to read %d cached download URLs", len(missing_keys))
+        return urls
+
+    shared_urls_by_key = {key: url for key, url in zip(missing_keys, shared_urls, strict=True) if url is not None}
+    for key, url in shared_urls_by_key.items():
+        _set_local_url(key, url)
+    return [url or shared_urls_by_key.get(_url_key(item)) for item, url in zip(media, urls, strict=True)]
+
+
+async def fetch_download_urls(media: Sequence[CategoryMedia]) -> list[str | None]:
+    """Запрашивает новые ссылки у Яндекс Диска и сохраняет полученные в кэш"""
+    keys = list(dict.fromkeys(_url_key(item) for item in media))
+    if not keys:
+        return []
+
+    urls_by_key = dict(zip(keys, await get_yandex_download_urls(path for path, _ in keys), strict=True))
+    resolved_urls = {key: url for key, url in urls_by_key.items() if url is not None}
+    for key, url in resolved_urls.items():
+        _set_local_url(key, url)
+    try:
+        await cache.set_many(
+            values={_redis_key(key): url for key, url in resolved_urls.items()},
+            cls=str,
+            ttl=DOWNLOAD_URL_TTL,
+        )
+    except Exception:
+        logger.exception("Failed to cache %d download URLs", len(resolved_urls))
+    return [urls_by_key[_url_key(item)] for item in media]
+
+
+async def forget_download_url(media: CategoryMedia) -> None:
+    """Убирает ссылку из кэша, если Telegram не смог по ней скачать файл"""
+    key = _url_key(media)
+    _local_urls.pop(key, None)
+    try:
+        await cache.delete(key=_redis_key(key))
+    except Exception:
+        logger.exception("Failed to forget cached download URL for %s", media.source_path)
+
+
+def configure_local_download_urls(*, max_size: int) -> None:
+    """Задаёт размер кэша ссылок в памяти процесса; `0` оставляет только общий кэш в Redis"""
+    global _local_cache_size
+    if max_size < 0:
+        raise ValueError("Local download URL cache size must not be negative")
+    _local_cache_size = max_size
+    _evict_local_urls()
+
+
+def clear_local_download_urls() -> None:
+    _local_urls.clear()
+
+
+def _get_local_url(key: _UrlKey) -> str | None:
+    cached = _local_urls.get(key)
+    if cached is None:
+        return None
+
+    url, expires_at = cached
+    if expires_at <= monotonic():
+        del _local_urls[key]
+        return None
+    _local_urls.move_to_end(key)
+    return url
+
+
+def _set_local_url(key: _UrlKey, url: str) -> None:
+    _local_urls[key] = (url, monotonic() + LOCAL_DOWNLOAD_URL_TTL.total_seconds())
+    _local_urls.move_to_end(key)
+    _evict_local_urls()
+
+
+def _evict_local_urls() -> None:
+    while len(_local_urls) > _local_cache_size:
+        _local_urls.popitem(last=False)
+
+
+def _url_key(media: CategoryMedia) -> _UrlKey:
+    return media.source_path, media.source_revision
+
+
+def _redis_key(key: _UrlKey) -> str:
+    path, revision = key
+    # ссылка привязана к ревизии: после замены файла на диске старая ссылка из кэша не используется
+    return f"{DOWNLOAD_URL_KEY_PREFIX}:{revision}:{path}"
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import timedelta
+from time import monotonic
+
+from cringe_pics_telebot.repositories import redis as cache
+from cringe_pics_telebot.repositories.postgres import CategoryMedia
+
+logger = logging.getLogger(__name__)
+
+HOT_MEDIA_CACHE_SIZE = 4_096
+HOT_MEDIA_TTL = timedelta(minutes=5)
+"""Сколько запись живёт в памяти процесса, даже если уведомление об инвалидации через Redis потерялось"""
+HOT_MEDIA_CHANNEL_PREFIX = "hot-media"
+LISTENER_RETRY_INTERVAL = timedelta(seconds=5)
+
+type Sleep = Callable[[float], Awaitable[None]]
+
+_hot_media: OrderedDict[int, tuple[CategoryMedia, float]] = OrderedDict()
+"""Активные медиа с `file_id` и моментом `monotonic()`, после которого строку нужно перечитать"""
+_cache_size = HOT_MEDIA_CACHE_SIZE
+
+
+def get_hot_media(media_ids: Iterable[int]) -> dict[int, CategoryMedia]:
+    found = {}
+    now = monotonic()
+    for media_id in media_ids:
+        cached = _hot_media.get(media_id)
+        if cached is None:
+            continue
+
+        media, expires_at = cached
+        if expires_at <= now:
+            del _hot_media[media_id]
+            continue
+        _hot_media.move_to_end(media_id)
+        found[media_id] = media
+    return found
+
+
+def remember_hot_media(media: Iterable[CategoryMedia]) -> None:
+    expires_at = monotonic() + HOT_MEDIA_TTL.total_seconds()
+    for item in media:
+        if item.is_active and item.telegram_file_id is not None:
+            _hot_media[item.id] = item, expires_at
+            _hot_media.move_to_end(item.id)
+        else:
+            _hot_media.pop(item.id, None)
+    _evict_hot_media()
+
+
+async def invalidate_hot_media(media_id: int) -> None:
+    """Убирает медиа из кэша во всех экземплярах бота, например после отказа Telegram принять `file_id`"""
+    forget_hot_media(media_id)
+    await _publish_invalidation(f"{HOT_MEDIA_CHANNEL_PREFIX}:media:{media_id}")
+
+
+async def invalidate_hot_category_media(subscription_type_id: int) -> None:
+    """Убирает медиа категории из кэша во всех экземплярах бота после синхронизации каталога"""
+    forget_hot_category_media(subscription_type_id)
+    await _publish_invalidation(f"{HOT_MEDIA_CHANNEL_PREFIX}:category:{subscription_type_id}")
+
+
+async def run_hot_media_invalidation(
+    *,
+    retry_interval: timedelta = LISTENER_RETRY_INTERVAL,
+    sleep: Sleep = asyncio.sleep,
+) -> None:
+    while True:
+        try:
+            async with cache.listen(f"{HOT_MEDIA_CHANNEL_PREFIX}:*") as channels:
+                # инвалидации, пропущенные до подписки, не должны жить в кэше
+                clear_hot_media()
+                async for channel in channels:
+                    _apply_invalidation(channel)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Hot media invalidation listener failed")
+        clear_hot_media()
+        await sleep(retry_interval.total_seconds())
+
+
+def forget_hot_media(media_id: int) -> None:
+    _hot_media.pop(media_id, None)
+
+
+def forget_hot_category_media(subscription_type_id: int) -> None:
+    for media_id in [
+        media.id for media, _ in _hot_media.values() if media.subscription_type_id == subscription_type_id
+    ]:
+        del _hot_media[media_id]
+
+
+def configure_hot_media(*, max_size: int) -> None:
+    """Задаёт размер кэша; `0` отключает его, и каждая отправка читает строку из PostgreSQL"""
+    global _cache_size
+    if max_size < 0:
+        raise ValueError("Hot media cache size must not be negative")
+    _cache_size = max_size
+    _evict_hot_media()
+
+
+def clear_hot_media() -> None:
+    _hot_media.clear()
+
+
+def _evict_hot_media() -> None:
+    while len(_hot_media) > _cache_size:
+        _hot_media.popitem(last=False)
+
+
+async def _publish_invalidation(channel: str) -> None:
+    try:
+        await cache.publish(channel=channel)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Failed to broadcast hot media invalidation %s", channel)
+
+
+def _apply_invalidation(channel: str) -> None:
+    kind, _, key = channel.removeprefix(f"{HOT_MEDIA_CHANNEL_PREFIX}:").partition(":")
+    if not key.isdigit():
+        logger.warning("Ignored malformed hot media invalidation %s", channel)
+        return
+    if kind == "media":
+        forget_hot_media(int(key))
+    elif kind == "category":
+        forget_hot_category_media(int(key))
+    else:
+        logger.warning("Ignored unknown hot media invalidation %s", channel)
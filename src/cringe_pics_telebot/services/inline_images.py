@@ -1,44 +1,117 @@
+import asyncio
+import logging
+import random
 from collections.abc import Sequence
+from datetime import timedelta
+from typing import Any
 
+from cringe_pics_telebot.repositories import redis as cache
 from cringe_pics_telebot.repositories.postgres import (
     CategoryMedia,
+    CategoryMediaSummary,
     SubscriptionType,
-    get_category_media_by_subscription_types,
+    get_category_media_by_ids,
+    get_category_media_summaries,
+)
+from cringe_pics_telebot.services.download_urls import (
+    fetch_download_urls,
+    get_cached_download_urls,
+    get_download_urls,
 )
-from cringe_pics_telebot.repositories.yandex import get_download_urls
 from cringe_pics_telebot.services.random_image import CachedMedia, LinkedMedia
 
+logger = logging.getLogger(__name__)
+
 MAX_INLINE_QUERY_RESULTS = 50
+INLINE_SNAPSHOT_TTL = timedelta(minutes=10)
+INLINE_SNAPSHOT_KEY_PREFIX = "inline-results"
+MAX_INLINE_PENDING_RESOLVES = 10
+"""Сколько ссылок на ещё не загруженные в Telegram медиа можно запросить у Яндекса за один inline-запрос"""
+INLINE_RESOLVE_TIMEOUT = timedelta(seconds=3)
+INLINE_PREFETCH_CONCURRENCY = 4
+
+_prefetch_semaphore = asyncio.Semaphore(INLINE_PREFETCH_CONCURRENCY)
+_prefetching_paths: set[str] = set()
+_background_tasks: set[asyncio.Task[Any]] = set()
+
+
+async def get_inline_snapshot(subscription_types: Sequence[SubscriptionType], *, seed: str) -> list[int]:
+    """Возвращает порядок выдачи медиа для inline-запроса; один seed всегда даёт один порядок"""
+    key = f"{INLINE_SNAPSHOT_KEY_PREFIX}:{seed}"
+    try:
+        snapshot = await cache.get(key=key, cls=list[int])
+    except Exception:
+        logger.exception("Failed to read inline results snapshot %s", key)
+        snapshot = None
+    if snapshot is not None:
+        return snapshot
+
+    # для порядка выдачи хватает узкой выборки; полные строки читаются только для отдаваемой страницы
+    media = await get_category_media_summaries([item.id for item in subscription_types])
+    media_by_category: dict[int, list[CategoryMediaSummary]] = {}
+    for item in media:
+        media_by_category.setdefault(item.subscription_type_id, []).append(item)
+    unique_media = _unique_media(subscription_types, media_by_category=media_by_category)
+    ready_ids = [item.id for item in unique_media if item.is_ready]
+    pending_ids = [item.id for item in unique_media if not item.is_ready]
+    # порядок зависит только от seed, поэтому истёкший снимок восстанавливается тем же, пока каталог не изменился
+    shuffler = random.Random(seed)
+    shuffler.shuffle(ready_ids)
+    shuffler.shuffle(pending_ids)
+    # уже загруженные в Telegram медиа идут первыми: для них не нужны ссылки Яндекса
+    snapshot = ready_ids + pending_ids
+
+    try:
+        await cache.set(key=key, value=snapshot, cls=list[int], ttl=INLINE_SNAPSHOT_TTL)
+    except Exception:
+        logger.exception("Failed to store inline results snapshot %s", key)
+    return snapshot
 
 
-async def get_inline_images(
+async def get_inline_page(
     subscription_types: Sequence[SubscriptionType],
+    media_ids: Sequence[int],
     *,
-    limit_per_category: int | None = MAX_INLINE_QUERY_RESULTS,
+    prefetch_ids: Sequence[int] = (),
 ) -> list[tuple[SubscriptionType, CachedMedia | LinkedMedia]]:
-    media = await get_category_media_by_subscription_types([item.id for item in subscription_types])
-    media_by_category: dict[int, list[CategoryMedia]] = {}
-    for item in media:
-        category_media = media_by_category.setdefault(item.subscription_type_id, [])
-        if limit_per_category is None or len(category_media) < limit_per_category:
-            category_media.append(item)
+    """Возвращает страницу выдачи и заранее запрашивает ссылки для `prefetch_ids` — следующей страницы"""
+    category_ids = {item.id for item in subscription_types}
+    media_by_id = {
+        item.id: item
+        for item in await get_category_media_by_ids([*media_ids, *prefetch_ids])
+        if item.subscription_type_id in category_ids
+    }
+    page_ids = set(media_ids)
+    _prefetch_download_urls(
+        [media_by_id[media_id] for media_id in prefetch_ids if media_id in media_by_id and media_id not in page_ids]
+    )
+    return await _resolve_inline_media(
+        [media_by_id[media_id] for media_id in media_ids if media_id in media_by_id],
+        subscription_types=subscription_types,
+    )
+
 
-    selected_media: list[CategoryMedia] = []
+def _unique_media(
+    subscription_types: Sequence[SubscriptionType],
+    *,
+    media_by_category: dict[int, list[CategoryMediaSummary]],
+) -> list[CategoryMediaSummary]:
+    selected_media: list[CategoryMediaSummary] = []
     seen_paths: set[str] = set()
     for subscription_type in subscription_types:
         for item in media_by_category.get(subscription_type.id, []):
             if item.source_path not in seen_paths:
                 seen_paths.add(item.source_path)
                 selected_media.append(item)
+    return selected_media
 
-    pending_paths = list(dict.fromkeys(item.source_path for item in selected_media if item.telegram_file_id is None))
-    download_urls_by_path = dict(
-        zip(
-            pending_paths,
-            await get_download_urls(pending_paths) if pending_paths else [],
-            strict=True,
-        )
-    )
+
+async def _resolve_inline_media(
+    selected_media: Sequence[CategoryMedia],
+    *,
+    subscription_types: Sequence[SubscriptionType],
+) -> list[tuple[SubscriptionType, CachedMedia | LinkedMedia]]:
+    download_urls_by_path = await _get_download_urls([item for item in selected_media if item.telegram_file_id is None])
 
     subscription_types_by_id = {item.id: item for item in subscription_types}
     results: list[tuple[SubscriptionType, CachedMedia | LinkedMedia]] = []
@@ -46,11 +119,84 @@ async def get_inline_images(
         subscription_type = subscription_types_by_id[item.subscription_type_id]
         if item.telegram_file_id is not None:
             results.append((subscription_type, _cached_media(item)))
-        elif (url := download_urls_by_path[item.source_path]) is not None:
+        elif (url := download_urls_by_path.get(item.source_path)) is not None:
             results.append((subscription_type, _linked_media(item, url)))
     return results
 
 
+async def _get_download_urls(pending_media: Sequence[CategoryMedia]) -> dict[str, str]:
+    pending_media = _unique_paths(pending_media)
+    if not pending_media:
+        return {}
+
+    download_urls = _urls_by_path(pending_media, await get_cached_download_urls(pending_media))
+    missing_media = [item for item in pending_media if item.source_path not in download_urls]
+    # остальные ссылки догружаются в фоне и попадут в ответ Telegram на следующий такой же запрос
+    resolving_media = missing_media[:MAX_INLINE_PENDING_RESOLVES]
+    _prefetch_download_urls(missing_media[MAX_INLINE_PENDING_RESOLVES:])
+    if not resolving_media:
+        return download_urls
+
+    # запрос к Яндексу не отменяется по таймауту: полученные ссылки сохранятся в кэш для следующего ответа
+    resolving = asyncio.create_task(fetch_download_urls(resolving_media))
+    _keep_until_done(resolving)
+    done, _ = await asyncio.wait({resolving}, timeout=INLINE_RESOLVE_TIMEOUT.total_seconds())
+    if not done:
+        logger.warning("Download URLs for %d inline results are not ready in time", len(resolving_media))
+        resolving.add_done_callback(_log_late_failure)
+        return download_urls
+
+    download_urls.update(_urls_by_path(resolving_media, resolving.result()))
+    return download_urls
+
+
+def _prefetch_download_urls(media: Sequence[CategoryMedia]) -> None:
+    media = [
+        item
+        for item in _unique_paths(media)
+        if item.telegram_file_id is None and item.source_path not in _prefetching_paths
+    ]
+    if not media:
+        return
+
+    _prefetching_paths.update(item.source_path for item in media)
+    _keep_until_done(asyncio.create_task(_prefetch(media)))
+
+
+async def _prefetch(media: Sequence[CategoryMedia]) -> None:
+    try:
+        async with _prefetch_semaphore:
+            await get_download_urls(media)
+    except Exception:
+        logger.exception("Failed to prefetch download URLs for %d inline results", len(media))
+    finally:
+        _prefetching_paths.difference_update(item.source_path for item in media)
+
+
+def _urls_by_path(media: Sequence[CategoryMedia], urls: Sequence[str | None]) -> dict[str, str]:
+    return {item.source_path: url for item, url in zip(media, urls, strict=True) if url is not None}
+
+
+def _unique_paths(media: Sequence[CategoryMedia]) -> list[CategoryMedia]:
+    unique_media: list[CategoryMedia] = []
+    seen_paths: set[str] = set()
+    for item in media:
+        if item.source_path not in seen_paths:
+            seen_paths.add(item.source_path)
+            unique_media.append(item)
+    return unique_media
+
+
+def _keep_until_done(task: asyncio.Task[Any]) -> None:
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _log_late_failure(task: asyncio.Task[Any]) -> None:
+    if not task.cancelled() and (error := task.exception()) is not None:
+        logger.error("Failed to resolve download URLs for inline results", exc_info=error)
+
+
 def _cached_media(media: CategoryMedia) -> CachedMedia:
     assert media.telegram_file_id is not None
     return CachedMedia(
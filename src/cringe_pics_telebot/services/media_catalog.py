@@ -1,79 +1,116 @@
-from collections.abc import Sequence
-from datetime import UTC, datetime
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Sequence
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
 
 from ..repositories.postgres.category_media import (
-    deactivate_category_media_missing_from_snapshot,
-    get_category_media_by_subscription_types,
+    delete_staged_category_media,
+    get_active_category_media_revisions,
+    merge_staged_category_media,
+    stage_category_media_sources,
     upsert_category_media_snapshot,
 )
 from ..repositories.postgres.connection import transaction
 from ..repositories.postgres.entities.category_media import (
-    CategoryMedia,
     CategoryMediaReconcileResult,
     CategoryMediaSource,
 )
 
+STAGING_CHUNK_SIZE = 1_000
+"""Сколько файлов снимка отправляется в базу одним запросом"""
+STALE_STAGING_AGE = timedelta(days=1)
+"""Через сколько снимок, брошенный упавшим процессом, удаляется из таблицы подготовки"""
+
 
 async def reconcile_category_media_snapshot(
     *,
     subscription_type_id: int,
-    sources: Sequence[CategoryMediaSource],
+    sources: Iterable[CategoryMediaSource] | AsyncIterable[CategoryMediaSource],
     seen_at: datetime | None = None,
+    chunk_size: int = STAGING_CHUNK_SIZE,
+    on_merged: Callable[[], Awaitable[None]] | None = None,
 ) -> CategoryMediaReconcileResult:
-    sources_by_path = {source.source_path: source for source in sources}
-    unique_sources = tuple(sources_by_path.values())
-    source_paths = set(sources_by_path)
+    """Сверяет каталог категории со снимком папки.
+
+    Снимок читается потоком: каждая порция копируется в таблицу подготовки своей короткой транзакцией,
+    поэтому в памяти лежит не больше `chunk_size` файлов, а соединение не занято, пока идёт листинг
+    Яндекс Диска. Слияние с каталогом и `on_merged` выполняются одной транзакцией в конце. Если чтение
+    снимка прервётся исключением, каталог не изменится.
+    """
+    if chunk_size <= 0:
+        raise ValueError("Staging chunk size must be positive")
+
+    sync_run_id = uuid4()
     now = seen_at or datetime.now(UTC)
+    try:
+        async for chunk in _chunks(sources, chunk_size):
+            async with transaction():
+                await stage_category_media_sources(sync_run_id=sync_run_id, sources=chunk)
+        async with transaction():
+            result = await merge_staged_category_media(
+                sync_run_id=sync_run_id,
+                subscription_type_id=subscription_type_id,
+                seen_at=now,
+            )
+            if on_merged is not None:
+                await on_merged()
+    finally:
+        async with transaction():
+            await delete_staged_category_media(
+                sync_run_id=sync_run_id,
+                stale_before=datetime.now(UTC) - STALE_STAGING_AGE,
+            )
+    return result
+
+
+async def add_category_media_sources(
+    *,
+    subscription_type_id: int,
+    sources: Sequence[CategoryMediaSource],
+    seen_at: datetime | None = None,
+) -> int:
+    """Добавляет новые и изменившиеся файлы в каталог категории, не трогая остальные записи.
 
+    Returns:
+        int: Сколько файлов добавлено или обновлено
+    """
+    sources_by_path = {source.source_path: source for source in sources}
     async with transaction():
-        existing = await get_category_media_by_subscription_types(
-            [subscription_type_id],
-            active_only=False,
-            with_for_update=True,
-        )
-        await upsert_category_media_snapshot(
+        revisions = await get_active_category_media_revisions(
             subscription_type_id=subscription_type_id,
-            sources=unique_sources,
-            seen_at=now,
+            source_paths=sources_by_path.keys(),
         )
-        deactivated = await deactivate_category_media_missing_from_snapshot(
+        # уже известные файлы не переписываются, чтобы частый проход по новым загрузкам не нагружал базу
+        new_sources = [
+            source for path, source in sources_by_path.items() if revisions.get(path) != source.source_revision
+        ]
+        await upsert_category_media_snapshot(
             subscription_type_id=subscription_type_id,
-            source_paths=source_paths,
-            seen_at=now,
+            sources=new_sources,
+            seen_at=seen_at,
         )
+    return len(new_sources)
+
 
-    existing_by_path = {media.source_path: media for media in existing}
-    created = sum(source.source_path not in existing_by_path for source in unique_sources)
-    changed = sum(
-        _source_changed(existing_by_path[source.source_path], source)
-        for source in unique_sources
-        if source.source_path in existing_by_path
-    )
-    reactivated = sum(
-        not existing_by_path[source.source_path].is_active
-        for source in unique_sources
-        if source.source_path in existing_by_path
-    )
-    unchanged = sum(
-        existing_by_path[source.source_path].is_active
-        and not _source_changed(existing_by_path[source.source_path], source)
-        for source in unique_sources
-        if source.source_path in existing_by_path
-    )
-    return CategoryMediaReconcileResult(
-        discovered=len(unique_sources),
-        created=created,
-        changed=changed,
-        reactivated=reactivated,
-        deactivated=deactivated,
-        unchanged=unchanged,
-    )
+async def _chunks(
+    sources: Iterable[CategoryMediaSource] | AsyncIterable[CategoryMediaSource],
+    size: int,
+) -> AsyncIterator[list[CategoryMediaSource]]:
+    chunk: list[CategoryMediaSource] = []
+    async for source in _iterate(sources):
+        chunk.append(source)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
-def _source_changed(media: CategoryMedia, source: CategoryMediaSource) -> bool:
-    return (
-        media.source_revision != source.source_revision
-        or media.name != source.name
-        or media.mime_type != source.mime_type
-        or media.telegram_media_type != source.telegram_media_type
-    )
+async def _iterate(
+    sources: Iterable[CategoryMediaSource] | AsyncIterable[CategoryMediaSource],
+) -> AsyncIterator[CategoryMediaSource]:
+    if isinstance(sources, AsyncIterable):
+        async for source in sources:
+            yield source
+    else:
+        for source in sources:
+            yield source
@@ -1,7 +1,9 @@
 import asyncio
 import logging
 import secrets
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
 from datetime import timedelta
 from time import monotonic
 
@@ -17,70 +19,186 @@ from cringe_pics_telebot.repositories.postgres import (
     materialize_category_media,
     transaction,
 )
-from cringe_pics_telebot.repositories.yandex import get_download_urls
+from cringe_pics_telebot.services.download_urls import forget_download_url, get_download_urls
+from cringe_pics_telebot.services.hot_media import invalidate_hot_media, remember_hot_media
 from cringe_pics_telebot.services.random_image import CachedMedia, LinkedMedia
 
 logger = logging.getLogger(__name__)
 
 MATERIALIZATION_LEASE_TTL = timedelta(seconds=30)
 MATERIALIZATION_WAIT_TIMEOUT = timedelta(seconds=30)
-MATERIALIZATION_POLL_INTERVAL = 0.1
+MATERIALIZATION_RECHECK_INTERVAL = timedelta(seconds=1)
+"""Когда перечитать строку без уведомления: владелец аренды мог упасть, а слушатель Redis — отключиться"""
+MATERIALIZATION_KEY_PREFIX = "media-materialization"
+LISTENER_RETRY_INTERVAL = timedelta(seconds=5)
 
 type MediaSender = Callable[[LinkedMedia | CachedMedia], Awaitable[Message]]
 type Sleep = Callable[[float], Awaitable[None]]
 type Clock = Callable[[], float]
 
 
+@dataclass(slots=True)
+class _MaterializationWaiters:
+    notified: asyncio.Future[None]
+    count: int = 0
+
+
+type _FlightKey = tuple[int, str]
+
+_waiters: dict[str, _MaterializationWaiters] = {}
+_in_flight: dict[_FlightKey, asyncio.Future[CategoryMedia | None]] = {}
+"""Загрузки, которые уже ведёт одна из корутин процесса; остальные ждут её результат, не обращаясь к Redis"""
+
+
 async def deliver_category_media(
     media: CategoryMedia,
     *,
     send: MediaSender,
     lease_ttl: timedelta = MATERIALIZATION_LEASE_TTL,
     wait_timeout: timedelta = MATERIALIZATION_WAIT_TIMEOUT,
-    poll_interval: float = MATERIALIZATION_POLL_INTERVAL,
-    sleep: Sleep = asyncio.sleep,
+    recheck_interval: timedelta = MATERIALIZATION_RECHECK_INTERVAL,
     clock: Clock = monotonic,
 ) -> Message:
-    if lease_ttl.total_seconds() <= 0 or wait_timeout.total_seconds() <= 0 or poll_interval <= 0:
+    if min(lease_ttl, wait_timeout, recheck_interval).total_seconds() <= 0:
         raise ValueError("Media materialization timings must be positive")
 
     current = media
     recovered_invalid_file_id = False
     deadline = clock() + wait_timeout.total_seconds()
-    while True:
-        _ensure_same_active_revision(current, expected=media)
-        if current.telegram_file_id is not None:
-            try:
-                return await send(_cached_media(current))
-            except asyncio.CancelledError:
-                raise
-            except Exception as error:
-                if recovered_invalid_file_id or not _is_invalid_file_id_error(error):
+    flight_key = (media.id, media.source_revision)
+    flight: asyncio.Future[CategoryMedia | None] | None = None
+    try:
+        while True:
+            _ensure_same_active_revision(current, expected=media)
+            if current.telegram_file_id is not None:
+                _land_flight(flight_key, flight, current)
+                flight = None
+                try:
+                    return await send(_cached_media(current))
+                except asyncio.CancelledError:
                     raise
-                async with transaction():
-                    invalidated = await invalidate_category_media_file_id(
-                        media_id=current.id,
-                        telegram_file_id=current.telegram_file_id,
-                    )
-                current = invalidated or await _get_current_media(current.id)
-                recovered_invalid_file_id = True
-                continue
-
-        lease_token = secrets.token_urlsafe(24)
-        acquired = await cache.set_if_absent(
-            key=_materialization_lease_key(current),
-            value=lease_token,
-            cls=str,
-            ttl=lease_ttl,
-        )
-        if acquired:
-            return await _materialize_as_lease_owner(current, send=send, lease_token=lease_token)
-
-        remaining = deadline - clock()
-        if remaining <= 0:
-            raise MediaMaterializationTimeout(current.id)
-        await sleep(min(poll_interval, remaining))
-        current = await _get_current_media(current.id)
+                except Exception as error:
+                    if recovered_invalid_file_id or not _is_invalid_file_id_error(error):
+                        raise
+                    async with transaction():
+                        invalidated = await invalidate_category_media_file_id(
+                            media_id=current.id,
+                            telegram_file_id=current.telegram_file_id,
+                        )
+                    await invalidate_hot_media(current.id)
+                    current = invalidated or await _get_current_media(current.id)
+                    recovered_invalid_file_id = True
+                    continue
+
+            if flight is None:
+                shared_flight = _in_flight.get(flight_key)
+                if shared_flight is not None:
+                    current = await _follow_flight(shared_flight, media_id=current.id, timeout=deadline - clock())
+                    continue
+                flight = _in_flight[flight_key] = asyncio.get_running_loop().create_future()
+
+            lease_key = _materialization_lease_key(current)
+            lease_token = secrets.token_urlsafe(24)
+            # ожидание регистрируется до попытки взять аренду, чтобы не пропустить уведомление владельца
+            with _wait_for_materialization(lease_key) as notified:
+                acquired = await cache.set_if_absent(key=lease_key, value=lease_token, cls=str, ttl=lease_ttl)
+                if not acquired:
+                    remaining = deadline - clock()
+                    if remaining <= 0:
+                        raise MediaMaterializationTimeout(current.id)
+                    with suppress(TimeoutError):
+                        await asyncio.wait_for(
+                            asyncio.shield(notified),
+                            min(recheck_interval.total_seconds(), remaining),
+                        )
+            if acquired:
+                message, materialized = await _materialize_as_lease_owner(
+                    current,
+                    send=send,
+                    lease_token=lease_token,
+                )
+                _land_flight(flight_key, flight, materialized)
+                flight = None
+                return message
+            current = await _get_current_media(current.id)
+    finally:
+        # ошибка отправки в чат ведущего не должна доставаться остальным: они перечитают строку сами
+        _land_flight(flight_key, flight, None)
+
+
+async def _follow_flight(
+    flight: asyncio.Future[CategoryMedia | None],
+    *,
+    media_id: int,
+    timeout: float,
+) -> CategoryMedia:
+    if timeout <= 0:
+        raise MediaMaterializationTimeout(media_id)
+    try:
+        materialized = await asyncio.wait_for(asyncio.shield(flight), timeout)
+    except TimeoutError as e:
+        raise MediaMaterializationTimeout(media_id) from e
+    return materialized or await _get_current_media(media_id)
+
+
+def _land_flight(
+    key: _FlightKey,
+    flight: asyncio.Future[CategoryMedia | None] | None,
+    materialized: CategoryMedia | None,
+) -> None:
+    if flight is None:
+        return
+    if _in_flight.get(key) is flight:
+        del _in_flight[key]
+    if not flight.done():
+        flight.set_result(materialized)
+
+
+async def run_materialization_notifications(
+    *,
+    retry_interval: timedelta = LISTENER_RETRY_INTERVAL,
+    sleep: Sleep = asyncio.sleep,
+) -> None:
+    """Будит локальных ожидающих, когда владелец аренды в любом процессе закончил загрузку"""
+    while True:
+        try:
+            async with cache.listen(f"{MATERIALIZATION_KEY_PREFIX}:*") as channels:
+                # уведомления, пришедшие до подписки, потеряны: ожидающие перечитают строку сами
+                notify_all_materialization_waiters()
+                async for channel in channels:
+                    notify_materialization_waiters(channel)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Media materialization listener failed")
+        notify_all_materialization_waiters()
+        await sleep(retry_interval.total_seconds())
+
+
+def notify_materialization_waiters(lease_key: str) -> None:
+    waiters = _waiters.pop(lease_key, None)
+    if waiters is not None and not waiters.notified.done():
+        waiters.notified.set_result(None)
+
+
+def notify_all_materialization_waiters() -> None:
+    for lease_key in list(_waiters):
+        notify_materialization_waiters(lease_key)
+
+
+@contextmanager
+def _wait_for_materialization(lease_key: str) -> Iterator[asyncio.Future[None]]:
+    """Одно ожидание на ключ аренды для всех корутин процесса"""
+    waiters = _waiters.get(lease_key)
+    if waiters is None:
+        waiters = _waiters[lease_key] = _MaterializationWaiters(asyncio.get_running_loop().create_future())
+    waiters.count += 1
+    try:
+        yield waiters.notified
+    finally:
+        waiters.count -= 1
+        if waiters.count == 0 and _waiters.get(lease_key) is waiters:
+            del _waiters[lease_key]
 
 
 async def _materialize_as_lease_owner(
@@ -88,22 +206,29 @@ async def _materialize_as_lease_owner(
     *,
     send: MediaSender,
     lease_token: str,
-) -> Message:
+) -> tuple[Message, CategoryMedia | None]:
     lease_key = _materialization_lease_key(media)
     try:
-        download_url, *_ = await get_download_urls([media.source_path])
+        download_url, *_ = await get_download_urls([media])
         if download_url is None:
             raise MediaDownloadUrlError(media.source_path)
-        message = await send(_linked_media(media, download_url))
+        try:
+            message = await send(_linked_media(media, download_url))
+        except TelegramBadRequest:
+            # ссылка могла протухнуть в кэше раньше срока: следующая попытка запросит у Яндекса новую
+            await forget_download_url(media)
+            raise
         telegram_file_id, telegram_file_unique_id = get_message_media_file_ids(message)
         async with transaction():
-            await materialize_category_media(
+            materialized = await materialize_category_media(
                 media_id=media.id,
                 source_revision=media.source_revision,
                 telegram_file_id=telegram_file_id,
                 telegram_file_unique_id=telegram_file_unique_id,
             )
-        return message
+        if materialized is not None:
+            remember_hot_media([materialized])
+        return message, materialized
     finally:
         try:
             await cache.delete_if_value(key=lease_key, value=lease_token, cls=str)
@@ -111,6 +236,13 @@ async def _materialize_as_lease_owner(
             raise
         except Exception:
             logger.exception("Failed to release media materialization lease for media %d", media.id)
+        try:
+            # и после успеха, и после ошибки: ожидающие перечитают строку или сами возьмут аренду
+            await cache.publish(channel=lease_key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to notify media materialization waiters for media %d", media.id)
 
 
 async def _get_current_media(media_id: int) -> CategoryMedia:
@@ -126,7 +258,7 @@ def _ensure_same_active_revision(current: CategoryMedia, *, expected: CategoryMe
 
 
 def _materialization_lease_key(media: CategoryMedia) -> str:
-    return f"media-materialization:{media.id}:{media.source_revision}"
+    return f"{MATERIALIZATION_KEY_PREFIX}:{media.id}:{media.source_revision}"
 
 
 def _cached_media(media: CategoryMedia) -> CachedMedia:
@@ -1,20 +1,29 @@
 import asyncio
+import hashlib
 import logging
 import secrets
-from collections.abc import Awaitable, Callable
+from collections import defaultdict
+from collections.abc import AsyncGenerator, AsyncIterable, AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from datetime import timedelta
+from datetime import UTC, datetime, timedelta
 from time import monotonic
 
 from cringe_pics_telebot.repositories import redis as cache
 from cringe_pics_telebot.repositories.postgres import (
     CategoryMediaReconcileResult,
     CategoryMediaSource,
+    CategoryMediaSyncState,
     SubscriptionType,
     TelegramMediaType,
+    get_category_media_sync_states,
+    save_category_media_sync_state,
+    transaction,
 )
-from cringe_pics_telebot.repositories.yandex import Image, list_dir
-from cringe_pics_telebot.services.media_catalog import reconcile_category_media_snapshot
+from cringe_pics_telebot.repositories.yandex import Image, get_dir_info, get_last_uploaded, list_dir
+from cringe_pics_telebot.services.hot_media import invalidate_hot_category_media
+from cringe_pics_telebot.services.media_catalog import add_category_media_sources, reconcile_category_media_snapshot
+from cringe_pics_telebot.services.random_image import invalidate_random_image_index
 from cringe_pics_telebot.services.subscriptions import get_subscription_types
 
 logger = logging.getLogger(__name__)
@@ -22,8 +31,12 @@ logger = logging.getLogger(__name__)
 DEFAULT_SYNC_INTERVAL = timedelta(hours=12)
 DEFAULT_LEASE_TTL = timedelta(minutes=30)
 MEDIA_SYNC_LEASE_KEY = "media-sync:full-catalog"
+LEASE_HEARTBEATS_PER_TTL = 3
+SYNC_WORKERS = 4
+DEFAULT_RECENT_UPLOADS_LIMIT = 100
 
 type Sleep = Callable[[float], Awaitable[None]]
+type Clock = Callable[[], float]
 
 
 @dataclass(slots=True, frozen=True)
@@ -36,55 +49,179 @@ class MediaSyncSummary:
     changed: int = 0
     reactivated: int = 0
     deactivated: int = 0
+    skipped: int = 0
+    """Сколько категорий пропущено, потому что папка не изменилась"""
 
 
 async def run_media_sync(
     *,
     interval: timedelta = DEFAULT_SYNC_INTERVAL,
+    full_reconcile_interval: timedelta | None = None,
+    recent_uploads_interval: timedelta | None = None,
+    recent_uploads_limit: int = DEFAULT_RECENT_UPLOADS_LIMIT,
+    after_sync: Callable[[], Awaitable[object]] | None = None,
     sleep: Sleep = asyncio.sleep,
+    clock: Clock = monotonic,
 ) -> None:
+    """Периодически синхронизирует каталог, а между проходами по папкам забирает недавние загрузки.
+
+    Args:
+        after_sync (Callable[[], Awaitable[object]] | None, optional): Вызывается после каждого прохода,
+            который выполнил этот экземпляр, например для прогрева новых файлов
+    """
     _validate_interval(interval)
+    if full_reconcile_interval is not None:
+        _validate_interval(full_reconcile_interval)
+    step = interval
+    if recent_uploads_interval is not None:
+        _validate_interval(recent_uploads_interval)
+        _validate_recent_uploads_limit(recent_uploads_limit)
+        step = min(interval, recent_uploads_interval)
+
+    next_catalog_sync_at = clock()
     while True:
         try:
-            await synchronize_media_catalog()
+            if clock() >= next_catalog_sync_at:
+                next_catalog_sync_at = clock() + interval.total_seconds()
+                summary = await synchronize_media_catalog(full_reconcile_interval=full_reconcile_interval)
+            else:
+                summary = await synchronize_recent_uploads(limit=recent_uploads_limit)
+            if after_sync is not None and summary.acquired:
+                await after_sync()
         except asyncio.CancelledError:
             raise
         except Exception:
             logger.exception("Failed to synchronize media catalog")
-        await sleep(interval.total_seconds())
+        await sleep(step.total_seconds())
 
 
-async def synchronize_media_catalog(*, lease_ttl: timedelta = DEFAULT_LEASE_TTL) -> MediaSyncSummary:
+async def synchronize_media_catalog(
+    *,
+    lease_ttl: timedelta = DEFAULT_LEASE_TTL,
+    workers: int = SYNC_WORKERS,
+    full_reconcile_interval: timedelta | None = None,
+) -> MediaSyncSummary:
+    """Сверяет каталог со всеми папками категорий.
+
+    Args:
+        full_reconcile_interval (timedelta | None, optional): Включает инкрементальный режим: неизменившиеся
+            папки пропускаются, но не реже этого интервала категория сверяется полностью.
+            `None` — сверять все категории на каждом проходе
+    """
     _validate_interval(lease_ttl)
-    lease_token = secrets.token_urlsafe(24)
-    acquired = await cache.set_if_absent(
-        key=MEDIA_SYNC_LEASE_KEY,
-        value=lease_token,
-        cls=str,
-        ttl=lease_ttl,
-    )
-    if not acquired:
-        logger.info("Skipped media catalog sync because another instance owns the lease")
-        return MediaSyncSummary(acquired=False)
+    if full_reconcile_interval is not None:
+        _validate_interval(full_reconcile_interval)
+    if workers <= 0:
+        raise ValueError("Media sync needs at least one worker")
+
+    async with _media_sync_lease(lease_ttl) as lease:
+        if lease is None:
+            logger.info("Skipped media catalog sync because another instance owns the lease")
+            return MediaSyncSummary(acquired=False)
+        return await _synchronize_media_catalog(
+            lease=lease,
+            workers=workers,
+            full_reconcile_interval=full_reconcile_interval,
+        )
+
+
+async def synchronize_recent_uploads(
+    *,
+    limit: int = DEFAULT_RECENT_UPLOADS_LIMIT,
+    lease_ttl: timedelta = DEFAULT_LEASE_TTL,
+) -> MediaSyncSummary:
+    """Добавляет в каталог недавно загруженные на Яндекс Диск файлы без обхода папок.
+
+    Удалённые файлы так не обнаружить, поэтому это дополнение к `synchronize_media_catalog`, а не замена.
+    """
+    _validate_interval(lease_ttl)
+    _validate_recent_uploads_limit(limit)
+
+    async with _media_sync_lease(lease_ttl) as lease:
+        if lease is None:
+            logger.info("Skipped recent uploads sync because another instance owns the lease")
+            return MediaSyncSummary(acquired=False)
+
+        images = await get_last_uploaded(limit)
+        subscription_types_by_directory: defaultdict[str, list[SubscriptionType]] = defaultdict(list)
+        for subscription_type in await get_subscription_types():
+            subscription_types_by_directory[_directory_key(subscription_type.s3_directory_path)].append(
+                subscription_type
+            )
+
+        sources: defaultdict[SubscriptionType, list[CategoryMediaSource]] = defaultdict(list)
+        for image in images:
+            directory, _, _ = image.path.rpartition("/")
+            for subscription_type in subscription_types_by_directory.get(_directory_key(directory), ()):
+                sources[subscription_type].append(_category_media_source(image))
+
+        created = 0
+        for subscription_type, category_sources in sources.items():
+            if not lease.held:
+                raise MediaSyncLeaseLost
+            added = await add_category_media_sources(
+                subscription_type_id=subscription_type.id,
+                sources=category_sources,
+            )
+            if added:
+                invalidate_random_image_index(subscription_type.id)
+                await invalidate_hot_category_media(subscription_type.id)
+            created += added
+
+        logger.info(
+            "Finished recent uploads sync uploads=%d categories=%d created=%d",
+            len(images),
+            len(sources),
+            created,
+        )
+        return MediaSyncSummary(
+            acquired=True,
+            categories=len(sources),
+            discovered=sum(len(category_sources) for category_sources in sources.values()),
+            created=created,
+        )
+
 
+async def _synchronize_media_catalog(
+    *,
+    lease: _MediaSyncLease,
+    workers: int,
+    full_reconcile_interval: timedelta | None,
+) -> MediaSyncSummary:
     started_at = monotonic()
-    try:
-        subscription_types = await get_subscription_types()
-        summaries: list[CategoryMediaReconcileResult] = []
-        failed = 0
-        for subscription_type in subscription_types:
+    subscription_types = await get_subscription_types()
+    states = (
+        {state.subscription_type_id: state for state in await get_category_media_sync_states()}
+        if full_reconcile_interval is not None
+        else {}
+    )
+    summaries: list[CategoryMediaReconcileResult] = []
+    failed = 0
+    skipped = 0
+    pending = iter(subscription_types)
+
+    async def worker() -> None:
+        nonlocal failed, skipped
+        for subscription_type in pending:
+            if not lease.held:
+                return
+            summary: CategoryMediaReconcileResult | None
             try:
-                summary = await _synchronize_subscription_type(
-                    subscription_type,
-                    lease_token=lease_token,
-                    lease_ttl=lease_ttl,
-                )
+                if full_reconcile_interval is None:
+                    summary = await _synchronize_subscription_type(subscription_type, lease=lease)
+                else:
+                    summary = await _synchronize_subscription_type_incrementally(
+                        subscription_type,
+                        lease=lease,
+                        state=states.get(subscription_type.id),
+                        full_reconcile_interval=full_reconcile_interval,
+                    )
             except asyncio.CancelledError:
                 raise
             except MediaSyncLeaseLost:
                 logger.warning("Stopped media catalog sync after losing the lease")
                 failed += 1
-                break
+                return
             except Exception:
                 logger.exception(
                     "Failed to synchronize media category id=%d name=%s",
@@ -93,7 +230,18 @@ async def synchronize_media_catalog(*, lease_ttl: timedelta = DEFAULT_LEASE_TTL)
                 )
                 failed += 1
             else:
+                if summary is None:
+                    skipped += 1
+                    logger.debug(
+                        "Skipped unchanged media category id=%d name=%s",
+                        subscription_type.id,
+                        subscription_type.name,
+                    )
+                    continue
                 summaries.append(summary)
+                invalidate_random_image_index(subscription_type.id)
+                if summary.changed or summary.deactivated:
+                    await invalidate_hot_category_media(subscription_type.id)
                 logger.info(
                     "Synchronized media category id=%d name=%s discovered=%d created=%d changed=%d "
                     "reactivated=%d deactivated=%d",
@@ -106,56 +254,188 @@ async def synchronize_media_catalog(*, lease_ttl: timedelta = DEFAULT_LEASE_TTL)
                     summary.deactivated,
                 )
 
-        result = MediaSyncSummary(
-            acquired=True,
-            categories=len(summaries),
-            failed=failed,
-            discovered=sum(summary.discovered for summary in summaries),
-            created=sum(summary.created for summary in summaries),
-            changed=sum(summary.changed for summary in summaries),
-            reactivated=sum(summary.reactivated for summary in summaries),
-            deactivated=sum(summary.deactivated for summary in summaries),
+    async with asyncio.TaskGroup() as task_group:
+        heartbeat = task_group.create_task(lease.keep_alive())
+        async with asyncio.TaskGroup() as workers_group:
+            for _ in range(min(workers, len(subscription_types))):
+                workers_group.create_task(worker())
+        heartbeat.cancel()
+
+    result = MediaSyncSummary(
+        acquired=True,
+        categories=len(summaries),
+        failed=failed,
+        discovered=sum(summary.discovered for summary in summaries),
+        created=sum(summary.created for summary in summaries),
+        changed=sum(summary.changed for summary in summaries),
+        reactivated=sum(summary.reactivated for summary in summaries),
+        deactivated=sum(summary.deactivated for summary in summaries),
+        skipped=skipped,
+    )
+    logger.info(
+        "Finished media catalog sync duration_seconds=%.3f categories=%d failed=%d skipped=%d discovered=%d "
+        "created=%d changed=%d reactivated=%d deactivated=%d",
+        monotonic() - started_at,
+        result.categories,
+        result.failed,
+        result.skipped,
+        result.discovered,
+        result.created,
+        result.changed,
+        result.reactivated,
+        result.deactivated,
+    )
+    return result
+
+
+async def _synchronize_subscription_type(
+    subscription_type: SubscriptionType,
+    *,
+    lease: _MediaSyncLease,
+) -> CategoryMediaReconcileResult:
+    return await reconcile_category_media_snapshot(
+        subscription_type_id=subscription_type.id,
+        sources=_category_media_sources(list_dir(subscription_type.s3_directory_path), lease=lease),
+    )
+
+
+async def _synchronize_subscription_type_incrementally(
+    subscription_type: SubscriptionType,
+    *,
+    lease: _MediaSyncLease,
+    state: CategoryMediaSyncState | None,
+    full_reconcile_interval: timedelta,
+) -> CategoryMediaReconcileResult | None:
+    """Сверяет категорию, только если отпечаток её папки изменился или подошло время полной сверки.
+
+    Returns:
+        CategoryMediaReconcileResult | None: Итог сверки или `None`, если папка не изменилась
+    """
+    directory = subscription_type.s3_directory_path
+    now = datetime.now(UTC)
+    previous = (
+        state
+        if state is not None
+        and state.directory_path == directory
+        and now - state.reconciled_at < full_reconcile_interval
+        else None
+    )
+
+    # отпечаток снимается до листинга: если папка изменится во время листинга, следующий проход её перечитает
+    folder = await get_dir_info(directory)
+    if previous is not None and (folder.modified, folder.total) == (previous.folder_modified, previous.item_count):
+        return None
+
+    digest = _ListingDigest()
+
+    def sync_state(*, reconciled_at: datetime) -> CategoryMediaSyncState:
+        return CategoryMediaSyncState(
+            subscription_type_id=subscription_type.id,
+            directory_path=directory,
+            folder_modified=folder.modified,
+            item_count=folder.total,
+            listing_hash=digest.hexdigest(),
+            reconciled_at=reconciled_at,
+            checked_at=now,
         )
-        logger.info(
-            "Finished media catalog sync duration_seconds=%.3f categories=%d failed=%d discovered=%d "
-            "created=%d changed=%d reactivated=%d deactivated=%d",
-            monotonic() - started_at,
-            result.categories,
-            result.failed,
-            result.discovered,
-            result.created,
-            result.changed,
-            result.reactivated,
-            result.deactivated,
+
+    try:
+        return await reconcile_category_media_snapshot(
+            subscription_type_id=subscription_type.id,
+            sources=_category_media_sources(
+                list_dir(directory),
+                lease=lease,
+                digest=digest,
+                previous_hash=previous.listing_hash if previous is not None else None,
+            ),
+            seen_at=now,
+            on_merged=lambda: save_category_media_sync_state(sync_state(reconciled_at=now)),
         )
-        return result
+    except _ListingUnchanged:
+        async with transaction():
+            await save_category_media_sync_state(
+                sync_state(reconciled_at=previous.reconciled_at if previous is not None else now)
+            )
+        return None
+
+
+async def _category_media_sources(
+    images: AsyncIterable[Image],
+    *,
+    lease: _MediaSyncLease,
+    digest: _ListingDigest | None = None,
+    previous_hash: str | None = None,
+) -> AsyncIterator[CategoryMediaSource]:
+    """Переводит листинг в снимок каталога; исключение в конце листинга отменяет сверку"""
+    async for image in images:
+        if digest is not None:
+            digest.add(image)
+        yield _category_media_source(image)
+
+    if not lease.held:
+        raise MediaSyncLeaseLost
+    if digest is not None and digest.hexdigest() == previous_hash:
+        raise _ListingUnchanged
+
+
+@asynccontextmanager
+async def _media_sync_lease(ttl: timedelta) -> AsyncGenerator[_MediaSyncLease | None]:
+    token = secrets.token_urlsafe(24)
+    acquired = await cache.set_if_absent(key=MEDIA_SYNC_LEASE_KEY, value=token, cls=str, ttl=ttl)
+    if not acquired:
+        yield None
+        return
+
+    try:
+        yield _MediaSyncLease(token=token, ttl=ttl)
     finally:
         try:
-            await cache.delete_if_value(key=MEDIA_SYNC_LEASE_KEY, value=lease_token, cls=str)
+            await cache.delete_if_value(key=MEDIA_SYNC_LEASE_KEY, value=token, cls=str)
         except asyncio.CancelledError:
             raise
         except Exception:
             logger.exception("Failed to release media catalog sync lease")
 
 
-async def _synchronize_subscription_type(
-    subscription_type: SubscriptionType,
-    *,
-    lease_token: str,
-    lease_ttl: timedelta,
-) -> CategoryMediaReconcileResult:
-    images = [image async for image in list_dir(subscription_type.s3_directory_path)]
-    if not await cache.refresh_if_value(
-        key=MEDIA_SYNC_LEASE_KEY,
-        value=lease_token,
-        cls=str,
-        ttl=lease_ttl,
-    ):
-        raise MediaSyncLeaseLost
-    return await reconcile_category_media_snapshot(
-        subscription_type_id=subscription_type.id,
-        sources=[_category_media_source(image) for image in images],
-    )
+class _MediaSyncLease:
+    """Аренда синхронизации, которую продлевает фоновая задача, пока категории обрабатываются параллельно"""
+
+    def __init__(self, *, token: str, ttl: timedelta, clock: Clock = monotonic) -> None:
+        self._token = token
+        self._ttl = ttl
+        self._clock = clock
+        self._lost = False
+        self._expires_at = clock() + ttl.total_seconds()
+
+    @property
+    def held(self) -> bool:
+        # если Redis недоступен и продлить аренду не удаётся, после истечения TTL её мог забрать другой экземпляр
+        return not self._lost and self._clock() < self._expires_at
+
+    async def keep_alive(self, *, sleep: Sleep = asyncio.sleep) -> None:
+        while self.held:
+            await sleep(self._ttl.total_seconds() / LEASE_HEARTBEATS_PER_TTL)
+            await self.refresh()
+
+    async def refresh(self) -> None:
+        refreshed_at = self._clock()
+        try:
+            refreshed = await cache.refresh_if_value(
+                key=MEDIA_SYNC_LEASE_KEY,
+                value=self._token,
+                cls=str,
+                ttl=self._ttl,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to refresh media catalog sync lease")
+            return
+
+        if refreshed:
+            self._expires_at = refreshed_at + self._ttl.total_seconds()
+        else:
+            self._lost = True
 
 
 def _category_media_source(image: Image) -> CategoryMediaSource:
@@ -169,9 +449,38 @@ def _category_media_source(image: Image) -> CategoryMediaSource:
     )
 
 
+def _directory_key(directory: str) -> str:
+    return directory.strip("/")
+
+
 def _validate_interval(interval: timedelta) -> None:
     if interval.total_seconds() <= 0:
         raise ValueError("Media sync interval must be positive")
 
 
+def _validate_recent_uploads_limit(limit: int) -> None:
+    if limit <= 0:
+        raise ValueError("Recent uploads limit must be positive")
+
+
+class _ListingDigest:
+    """Хэш путей и ревизий листинга, не зависящий от порядка файлов, поэтому его можно считать потоком"""
+
+    _MODULUS = 2**256
+
+    def __init__(self) -> None:
+        self._sum = 0
+
+    def add(self, image: Image) -> None:
+        item = hashlib.sha256(f"{image.path}\0{image.source_revision}".encode()).digest()
+        self._sum = (self._sum + int.from_bytes(item)) % self._MODULUS
+
+    def hexdigest(self) -> str:
+        return f"{self._sum:064x}"
+
+
 class MediaSyncLeaseLost(RuntimeError): ...
+
+
+class _ListingUnchanged(Exception):
+    """Листинг совпал с сохранённым отпечатком, и сверять каталог не нужно"""
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+
+from aiogram import Bot
+
+from cringe_pics_telebot.bot.media import send_image_to_chat
+from cringe_pics_telebot.bot.rate_limit import bulk_sends
+from cringe_pics_telebot.repositories.postgres import get_pending_category_media
+from cringe_pics_telebot.services.media_delivery import deliver_category_media
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP_BATCH_SIZE = 100
+DEFAULT_WARMUP_INTERVAL = timedelta(seconds=1)
+
+type Sleep = Callable[[float], Awaitable[None]]
+
+_next_after_id = 0
+"""Курсор по ожидающим файлам между проходами: файлы, которые не удаётся загрузить, не занимают каждую пачку"""
+
+
+async def warm_up_pending_media(
+    bot: Bot,
+    *,
+    chat_id: int,
+    batch_size: int = DEFAULT_WARMUP_BATCH_SIZE,
+    interval: timedelta = DEFAULT_WARMUP_INTERVAL,
+    sleep: Sleep = asyncio.sleep,
+) -> int:
+    """Заранее загружает ожидающие файлы в служебный чат, чтобы пользователи получали их по `file_id`.
+
+    Args:
+        chat_id (int): Чат, куда бот отправляет файлы для получения `file_id`
+        batch_size (int, optional): Сколько файлов загрузить за один вызов
+        interval (timedelta, optional): Пауза между загрузками
+
+    Returns:
+        int: Сколько файлов загружено
+    """
+    if batch_size <= 0:
+        raise ValueError("Warm-up batch size must be positive")
+    if interval.total_seconds() < 0:
+        raise ValueError("Warm-up interval must not be negative")
+
+    global _next_after_id
+    pending = await get_pending_category_media(limit=batch_size, after_id=_next_after_id)
+    # неполная пачка — конец очереди: следующий проход начнёт сначала и повторит неудачные файлы
+    _next_after_id = pending[-1].id if len(pending) == batch_size else 0
+    warmed = 0
+    with bulk_sends():
+        for index, media in enumerate(pending):
+            if index:
+                await sleep(interval.total_seconds())
+            try:
+                await deliver_category_media(
+                    media,
+                    send=lambda image: send_image_to_chat(bot=bot, chat_id=chat_id, image=image),
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to warm up media %d from %s", media.id, media.source_path)
+            else:
+                warmed += 1
+
+    if pending:
+        logger.info("Warmed up media uploaded=%d pending=%d", warmed, len(pending))
+    return warmed
+
+
+def reset_warm_up_cursor() -> None:
+    global _next_after_id
+    _next_after_id = 0
@@ -1,8 +1,15 @@
 import random
+from array import array
+from collections.abc import Sequence
 from dataclasses import dataclass
+from datetime import timedelta
+from time import monotonic
 
-from cringe_pics_telebot.repositories.postgres import CategoryMedia, get_category_media_by_subscription_types
+from cringe_pics_telebot.repositories.postgres import CategoryMedia, get_category_media_by_ids, get_category_media_ids
 from cringe_pics_telebot.repositories.yandex import Image
+from cringe_pics_telebot.services.hot_media import get_hot_media, remember_hot_media
+
+RANDOM_IMAGE_INDEX_TTL = timedelta(minutes=5)
 
 
 @dataclass(slots=True)
@@ -17,6 +24,76 @@ class CachedMedia(Image):
     """Идентификатор картинки на серверах Telegram"""
 
 
+@dataclass(frozen=True, slots=True)
+class _MediaIdIndex:
+    ids: array[int]
+    """Идентификаторы активных медиа категории"""
+    expires_at: float
+    """Момент `monotonic()`, после которого индекс перечитывается из PostgreSQL"""
+
+
+_indexes: dict[int | None, _MediaIdIndex] = {}
+
+
 async def get_random_image(category_id: int | None = None) -> CategoryMedia:
-    category_ids = None if category_id is None else [category_id]
-    return random.choice(await get_category_media_by_subscription_types(category_ids))
+    media, *_ = await get_random_images(category_id, 1)
+    return media
+
+
+async def get_random_images(category_id: int | None, count: int) -> list[CategoryMedia]:
+    if count <= 0:
+        return []
+
+    for attempt in range(2):
+        if attempt:
+            # индекс устарел: медиа деактивировано синхронизацией другого экземпляра
+            invalidate_random_image_index(category_id)
+        index = await _get_media_id_index(category_id)
+        picked_ids = random.choices(index.ids, k=count)
+        media_by_id = await _get_indexed_media(picked_ids, category_id=category_id)
+        if all(media_id in media_by_id for media_id in picked_ids):
+            return [media_by_id[media_id] for media_id in picked_ids]
+
+    raise RandomImageUnavailableError(category_id)
+
+
+def invalidate_random_image_index(category_id: int | None = None) -> None:
+    _indexes.pop(category_id, None)
+    _indexes.pop(None, None)
+
+
+def clear_random_image_index() -> None:
+    _indexes.clear()
+
+
+async def _get_media_id_index(category_id: int | None) -> _MediaIdIndex:
+    index = _indexes.get(category_id)
+    if index is not None and index.expires_at > monotonic():
+        return index
+
+    ids = await get_category_media_ids(None if category_id is None else [category_id])
+    index = _MediaIdIndex(
+        ids=array("q", ids),
+        expires_at=monotonic() + RANDOM_IMAGE_INDEX_TTL.total_seconds(),
+    )
+    if ids:
+        # пустой индекс не кэшируется, чтобы новая категория стала доступна сразу после синхронизации
+        _indexes[category_id] = index
+    return index
+
+
+async def _get_indexed_media(media_ids: Sequence[int], *, category_id: int | None) -> dict[int, CategoryMedia]:
+    media_by_id = get_hot_media(media_ids)
+    missing_ids = [media_id for media_id in dict.fromkeys(media_ids) if media_id not in media_by_id]
+    if missing_ids:
+        fetched = await get_category_media_by_ids(missing_ids)
+        remember_hot_media(fetched)
+        media_by_id.update((media.id, media) for media in fetched)
+    return {
+        media_id: media
+        for media_id, media in media_by_id.items()
+        if category_id is None or media.subscription_type_id == category_id
+    }
+
+
+class RandomImageUnavailableError(LookupError): ...
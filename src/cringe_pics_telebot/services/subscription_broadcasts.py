@@ -1,22 +1,28 @@
 import asyncio
 import logging
 from collections.abc import Awaitable, Callable
-from datetime import UTC, datetime, time, timedelta, timezone
+from datetime import UTC, datetime, timedelta
 
 from aiogram import Bot
 
-from cringe_pics_telebot.bot.media import send_image_to_chat
+from cringe_pics_telebot.bot.media import ImageSendPlan
+from cringe_pics_telebot.bot.rate_limit import bulk_sends
 from cringe_pics_telebot.repositories import redis as cache
-from cringe_pics_telebot.repositories.postgres import SubscriptionType
+from cringe_pics_telebot.repositories.postgres import CategoryMedia, SubscriptionType
 from cringe_pics_telebot.services.media_delivery import deliver_category_media
-from cringe_pics_telebot.services.random_image import get_random_image
+from cringe_pics_telebot.services.random_image import get_random_images
 from cringe_pics_telebot.services.scheduler import aware_datetime, seconds_until_next_tick, validate_interval
-from cringe_pics_telebot.services.subscriptions import get_subscription_types, get_subscription_users
+from cringe_pics_telebot.services.subscriptions import get_due_subscription_user_ids, get_subscription_types
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CHECK_INTERVAL = timedelta(seconds=30)
-_DEDUPE_TTL = timedelta(minutes=2)
+DEFAULT_SEND_WORKERS = 32
+"""Сколько отправок рассылки идёт одновременно; больше не нужно, общий лимит Telegram — 30 сообщений в секунду"""
+MAX_CATCH_UP = timedelta(minutes=10)
+"""Насколько поздно после своей минуты проход ещё может зарезервировать отправки; более старые минуты не досылаются"""
+_DEDUPE_TTL = timedelta(minutes=1) + MAX_CATCH_UP
+"""Резерв ставится не раньше начала минуты и должен пережить последний допустимый проход за неё"""
 
 type TimeProvider = Callable[[], datetime]
 type Sleep = Callable[[float], Awaitable[None]]
@@ -28,74 +34,162 @@ async def run_subscription_broadcasts(
     interval: timedelta = DEFAULT_CHECK_INTERVAL,
     now: TimeProvider | None = None,
     sleep: Sleep = asyncio.sleep,
+    send_workers: int = DEFAULT_SEND_WORKERS,
 ) -> None:
     now = now or _now
     validate_interval(interval)
-    while True:
-        await run_due_subscription_broadcasts(bot, now=now())
-        await sleep(seconds_until_next_tick(current_time=now(), interval=interval))
+    if send_workers <= 0:
+        raise ValueError("Subscription broadcast needs at least one send worker")
+    # проходы идут фоном, чтобы долгая рассылка не задерживала следующие минуты;
+    # семафор общий, поэтому и у пересекающихся проходов не больше `send_workers` отправок
+    sends = asyncio.Semaphore(send_workers)
+    previous_minute: datetime | None = None
+    async with asyncio.TaskGroup() as passes:
+        while True:
+            current_time = now()
+            current_minute = _minute_start(current_time)
+            missed_minutes, dropped = _missed_minutes(previous_minute, current_minute)
+            if dropped:
+                logger.warning("Dropped %d missed subscription broadcast minutes older than %s", dropped, MAX_CATCH_UP)
+            if missed_minutes:
+                logger.warning("Catching up %d missed subscription broadcast minutes", len(missed_minutes))
+            for pass_time in [*missed_minutes, current_time]:
+                passes.create_task(_run_scheduled_pass(bot, current_time=pass_time, sends=sends, workers=send_workers))
+            previous_minute = current_minute
+            await sleep(seconds_until_next_tick(current_time=now(), interval=interval))
 
 
-async def run_due_subscription_broadcasts(bot: Bot, *, now: datetime | None = None) -> int:
-    current_time = now or _now()
-    subscription_types = await get_subscription_types()
-    if not subscription_types:
+async def run_due_subscription_broadcasts(
+    bot: Bot,
+    *,
+    now: datetime | None = None,
+    send_workers: int = DEFAULT_SEND_WORKERS,
+    reserve_before: datetime | None = None,
+) -> int:
+    """Рассылает картинки подписчикам, у которых наступила минута `now`.
+
+    Если `reserve_before` задан и уже прошёл, отправки не резервируются: их мог зарезервировать
+    другой проход за ту же минуту, а резерв к этому времени уже истёк.
+    """
+    if send_workers <= 0:
+        raise ValueError("Subscription broadcast needs at least one send worker")
+    return await _run_due_subscription_broadcasts(
+        bot,
+        current_time=now or _now(),
+        sends=asyncio.Semaphore(send_workers),
+        workers=send_workers,
+        reserve_before=reserve_before,
+    )
+
+
+async def _run_scheduled_pass(bot: Bot, *, current_time: datetime, sends: asyncio.Semaphore, workers: int) -> None:
+    try:
+        await _run_due_subscription_broadcasts(
+            bot,
+            current_time=current_time,
+            sends=sends,
+            workers=workers,
+            reserve_before=_minute_start(current_time) + _DEDUPE_TTL,
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Failed to send subscription broadcasts for %s", current_time.isoformat())
+
+
+async def _run_due_subscription_broadcasts(
+    bot: Bot,
+    *,
+    current_time: datetime,
+    sends: asyncio.Semaphore,
+    workers: int,
+    reserve_before: datetime | None,
+) -> int:
+    due_user_ids = await get_due_subscription_user_ids(_utc_minute_of_day(current_time))
+    if not due_user_ids:
         return 0
 
-    sent_counts = await asyncio.gather(
-        *(
-            _broadcast_subscription_type(
-                bot=bot,
-                subscription_type=subscription_type,
-                current_time=current_time,
+    subscription_types = [
+        subscription_type
+        for subscription_type in await get_subscription_types()
+        if subscription_type.id in due_user_ids
+    ]
+    with bulk_sends():
+        sent_counts = await asyncio.gather(
+            *(
+                _broadcast_subscription_type(
+                    bot=bot,
+                    subscription_type=subscription_type,
+                    user_ids=due_user_ids[subscription_type.id],
+                    current_time=current_time,
+                    sends=sends,
+                    workers=workers,
+                    reserve_before=reserve_before,
+                )
+                for subscription_type in subscription_types
             )
-            for subscription_type in subscription_types
         )
-    )
 
     return sum(sent_counts)
 
 
-async def _broadcast_subscription_type(*, bot: Bot, subscription_type: SubscriptionType, current_time: datetime) -> int:
-    users = [
-        user
-        for user in await get_subscription_users(subscription_type.id)
-        if _same_local_minute(
-            subscription_type.time,
-            current_time,
-            timezone_offset_minutes=user.timezone_offset_minutes,
+async def _broadcast_subscription_type(
+    *,
+    bot: Bot,
+    subscription_type: SubscriptionType,
+    user_ids: list[int],
+    current_time: datetime,
+    sends: asyncio.Semaphore,
+    workers: int,
+    reserve_before: datetime | None,
+) -> int:
+    if reserve_before is not None and _now() >= reserve_before:
+        logger.warning(
+            "Dropped subscription broadcast for %d users of subscription type %d at %s: the pass started too late",
+            len(user_ids),
+            subscription_type.id,
+            current_time.isoformat(),
         )
-    ]
-    if not users:
         return 0
 
-    reservations = await asyncio.gather(
-        *(
-            _reserve_scheduled_send(
-                subscription_type_id=subscription_type.id,
-                user_id=user.id,
-                current_time=current_time,
-            )
-            for user in users
-        )
+    reserved_user_ids = await _reserve_scheduled_sends(
+        subscription_type_id=subscription_type.id,
+        user_ids=user_ids,
+        current_time=current_time,
     )
-    reserved_user_ids = [user.id for user, reserved in zip(users, reservations, strict=True) if reserved]
 
     if not reserved_user_ids:
         return 0
 
-    sent_results = await asyncio.gather(
-        *(
-            _send_scheduled_image_to_user(
-                bot=bot,
-                user_id=user_id,
-                subscription_type=subscription_type,
-            )
-            for user_id in reserved_user_ids
-        )
-    )
+    try:
+        media = await get_random_images(subscription_type.id, len(reserved_user_ids))
+    except Exception:
+        logger.exception("Failed to choose scheduled images for subscription type %d", subscription_type.id)
+        return 0
 
-    return sum(sent_results)
+    send_plan = ImageSendPlan()
+    pending = iter(zip(reserved_user_ids, media, strict=True))
+    sent = 0
+
+    async def worker() -> None:
+        nonlocal sent
+        for user_id, user_media in pending:
+            # семафор общий для всех категорий прохода: одновременно идёт не больше `workers` отправок
+            async with sends:
+                result = await _send_scheduled_image_to_user(
+                    bot=bot,
+                    user_id=user_id,
+                    subscription_type=subscription_type,
+                    media=user_media,
+                    send_plan=send_plan,
+                )
+            sent += result
+
+    async with asyncio.TaskGroup() as task_group:
+        for _ in range(min(workers, len(reserved_user_ids))):
+            task_group.create_task(worker())
+
+    return sent
 
 
 async def _send_scheduled_image_to_user(
@@ -103,12 +197,13 @@ async def _send_scheduled_image_to_user(
     bot: Bot,
     user_id: int,
     subscription_type: SubscriptionType,
+    media: CategoryMedia,
+    send_plan: ImageSendPlan,
 ) -> int:
     try:
-        media = await get_random_image(subscription_type.id)
         await deliver_category_media(
             media,
-            send=lambda image: send_image_to_chat(bot=bot, chat_id=user_id, image=image),
+            send=lambda image: send_plan.send(bot=bot, chat_id=user_id, image=image),
         )
     except Exception:
         logger.exception(
@@ -121,13 +216,41 @@ async def _send_scheduled_image_to_user(
     return 1
 
 
-async def _reserve_scheduled_send(*, subscription_type_id: int, user_id: int, current_time: datetime) -> bool:
-    return await cache.set_if_absent(
-        key=_dedupe_key(subscription_type_id=subscription_type_id, user_id=user_id, current_time=current_time),
+async def _reserve_scheduled_sends(
+    *,
+    subscription_type_id: int,
+    user_ids: list[int],
+    current_time: datetime,
+) -> list[int]:
+    reservations = await cache.set_many_if_absent(
+        keys=[
+            _dedupe_key(subscription_type_id=subscription_type_id, user_id=user_id, current_time=current_time)
+            for user_id in user_ids
+        ],
         value=True,
         cls=bool,
         ttl=_DEDUPE_TTL,
     )
+    return [user_id for user_id, reserved in zip(user_ids, reservations, strict=True) if reserved]
+
+
+def _missed_minutes(previous_minute: datetime | None, current_minute: datetime) -> tuple[list[datetime], int]:
+    """Минуты строго между двумя проходами, которые ещё можно досылать, и число отброшенных более старых"""
+    if previous_minute is None:
+        return [], 0
+    first_minute = previous_minute + timedelta(minutes=1)
+    oldest_minute = current_minute - MAX_CATCH_UP
+    dropped = max(0, (oldest_minute - first_minute) // timedelta(minutes=1))
+    minute = max(first_minute, oldest_minute)
+    minutes = []
+    while minute < current_minute:
+        minutes.append(minute)
+        minute += timedelta(minutes=1)
+    return minutes, dropped
+
+
+def _minute_start(current_time: datetime) -> datetime:
+    return aware_datetime(current_time).astimezone(UTC).replace(second=0, microsecond=0)
 
 
 def _dedupe_key(*, subscription_type_id: int, user_id: int, current_time: datetime) -> str:
@@ -135,14 +258,9 @@ def _dedupe_key(*, subscription_type_id: int, user_id: int, current_time: dateti
     return f"subscription-broadcast:{subscription_type_id}:{user_id}:{minute}"
 
 
-def _same_local_minute(
-    scheduled_time: time,
-    current_time: datetime,
-    *,
-    timezone_offset_minutes: int,
-) -> bool:
-    local_time = aware_datetime(current_time).astimezone(timezone(timedelta(minutes=timezone_offset_minutes)))
-    return scheduled_time.hour == local_time.hour and scheduled_time.minute == local_time.minute
+def _utc_minute_of_day(current_time: datetime) -> int:
+    utc_time = aware_datetime(current_time).astimezone(UTC)
+    return utc_time.hour * 60 + utc_time.minute
 
 
 def _now() -> datetime:
@@ -1,23 +1,130 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from datetime import timedelta
+from time import monotonic
+
 from cringe_pics_telebot.entities.subscriptions import SubscriptionInfo
-from cringe_pics_telebot.repositories.postgres import create_subscription, delete_subscription, transaction
+from cringe_pics_telebot.repositories.postgres import (
+    SUBSCRIPTION_TYPES_CHANNEL,
+    ListenUnavailableError,
+    create_subscription,
+    delete_subscription,
+    listen,
+    transaction,
+)
+from cringe_pics_telebot.repositories.postgres import (
+    get_due_subscription_user_ids as get_due_subscription_user_ids_from_pg,
+)
 from cringe_pics_telebot.repositories.postgres import get_subscription_types as get_subscription_types_pg
-from cringe_pics_telebot.repositories.postgres import get_subscription_users as get_subscription_users_from_pg
 from cringe_pics_telebot.repositories.postgres import get_user_subscriptions as get_user_subscriptions_from_pg
-from cringe_pics_telebot.repositories.postgres.entities import CreateSubscription, User
+from cringe_pics_telebot.repositories.postgres.entities import CreateSubscription
 from cringe_pics_telebot.repositories.postgres.entities.subscription_type import SubscriptionType
 from cringe_pics_telebot.repositories.postgres.users import create_user
+from cringe_pics_telebot.services.category_aliases import CategorySearchIndex
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_TYPES_CACHE_TTL = timedelta(minutes=1)
+LISTENER_RETRY_INTERVAL = timedelta(seconds=5)
+
+type Sleep = Callable[[float], Awaitable[None]]
+
+
+@dataclass(frozen=True, slots=True)
+class _CachedSubscriptionTypes:
+    subscription_types: tuple[SubscriptionType, ...]
+    search_index: CategorySearchIndex
+    """Индекс inline-поиска; перестраивается, только если изменились названия или алиасы"""
+    expires_at: float
+    """Момент `monotonic()`, после которого список перечитывается из PostgreSQL"""
+
+
+_cache: _CachedSubscriptionTypes | None = None
+_cache_generation = 0
+_search_index: tuple[tuple[tuple[int, str, tuple[str, ...]], ...], CategorySearchIndex] | None = None
 
 
 async def get_subscription_types() -> list[SubscriptionType]:
-    return await get_subscription_types_pg()
+    return list((await _get_cached_subscription_types()).subscription_types)
+
+
+async def get_subscription_type_search_index() -> tuple[list[SubscriptionType], CategorySearchIndex]:
+    cached = await _get_cached_subscription_types()
+    return list(cached.subscription_types), cached.search_index
+
+
+async def _get_cached_subscription_types() -> _CachedSubscriptionTypes:
+    global _cache
+
+    cached = _cache
+    if cached is not None and cached.expires_at > monotonic():
+        return cached
+
+    generation = _cache_generation
+    subscription_types = tuple(await get_subscription_types_pg())
+    cached = _CachedSubscriptionTypes(
+        subscription_types=subscription_types,
+        search_index=_build_search_index(subscription_types),
+        expires_at=monotonic() + SUBSCRIPTION_TYPES_CACHE_TTL.total_seconds(),
+    )
+    if generation == _cache_generation:
+        # пока шёл запрос, кэш мог быть сброшен уведомлением — тогда прочитанный список уже устарел
+        _cache = cached
+    return cached
+
+
+def _build_search_index(subscription_types: Sequence[SubscriptionType]) -> CategorySearchIndex:
+    global _search_index
+
+    search_terms = tuple(
+        (subscription_type.id, subscription_type.name, subscription_type.search_aliases)
+        for subscription_type in subscription_types
+    )
+    if _search_index is None or _search_index[0] != search_terms:
+        _search_index = search_terms, CategorySearchIndex.build(search_terms)
+    return _search_index[1]
+
+
+def invalidate_subscription_types_cache() -> None:
+    global _cache, _cache_generation
+    _cache = None
+    _cache_generation += 1
+
+
+async def run_subscription_types_invalidation(
+    *,
+    retry_interval: timedelta = LISTENER_RETRY_INTERVAL,
+    sleep: Sleep = asyncio.sleep,
+) -> None:
+    while True:
+        try:
+            async with listen(SUBSCRIPTION_TYPES_CHANNEL) as notifications:
+                # изменения, пропущенные до подписки, не должны жить в кэше до истечения TTL
+                invalidate_subscription_types_cache()
+                async for _ in notifications:
+                    invalidate_subscription_types_cache()
+        except asyncio.CancelledError:
+            raise
+        except ListenUnavailableError:
+            logger.warning(
+                "Subscription types change notifications are unavailable, the cache is refreshed every %s",
+                SUBSCRIPTION_TYPES_CACHE_TTL,
+            )
+            return
+        except Exception:
+            logger.exception("Subscription types listener failed")
+        invalidate_subscription_types_cache()
+        await sleep(retry_interval.total_seconds())
 
 
 async def get_user_subscriptions(user_id: int) -> list[SubscriptionInfo]:
     return await get_user_subscriptions_from_pg(user_id)
 
 
-async def get_subscription_users(subscription_type_id: int) -> list[User]:
-    return await get_subscription_users_from_pg(subscription_type_id)
+async def get_due_subscription_user_ids(due_utc_minute: int) -> dict[int, list[int]]:
+    return await get_due_subscription_user_ids_from_pg(due_utc_minute)
 
 
 async def subscribe(*, user_id: int, subscription_type_id: int) -> None:
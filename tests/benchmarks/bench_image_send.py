@@ -0,0 +1,39 @@
+"""Сравнивает сборку запроса отправки картинки на каждый чат с копированием заготовки из `ImageSendPlan`.
+
+Запуск: `python tests/benchmarks/bench_image_send.py`
+"""
+
+from timeit import repeat
+
+from cringe_pics_telebot.bot.media import ImageSendPlan, prepare_image_send
+from cringe_pics_telebot.services.random_image import CachedMedia
+
+CHATS = 1_000
+REPEATS = 5
+
+
+def main() -> None:
+    image = CachedMedia(
+        name="image.png",
+        mime_type="image/png",
+        path="day/image.png",
+        source_revision="sha256:image",
+        id="AgACAgIAAxkBAAIBZ2Zm",
+    )
+    prepared = ImageSendPlan().prepare(image)
+
+    def build_per_chat() -> None:
+        for chat_id in range(CHATS):
+            prepare_image_send(image).for_chat(chat_id)
+
+    def reuse_prepared() -> None:
+        for chat_id in range(CHATS):
+            prepared.for_chat(chat_id)
+
+    for name, benchmark in (("build per chat", build_per_chat), ("reuse prepared", reuse_prepared)):
+        seconds = min(repeat(benchmark, number=1, repeat=REPEATS))
+        print(f"{name}: {seconds / CHATS * 1_000_000:.2f} µs per send")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,8 +22,11 @@ from cringe_pics_telebot.repositories.postgres import connect as connect_postgre
 from cringe_pics_telebot.repositories.redis import connect as connect_redis
 from cringe_pics_telebot.repositories.yandex import connect as connect_yandex
 from cringe_pics_telebot.services.admin_broadcasts import run_due_admin_broadcasts
+from cringe_pics_telebot.services.hot_media import clear_hot_media
 from cringe_pics_telebot.services.media_sync import MediaSyncSummary, synchronize_media_catalog
+from cringe_pics_telebot.services.random_image import clear_random_image_index
 from cringe_pics_telebot.services.subscription_broadcasts import run_due_subscription_broadcasts
+from cringe_pics_telebot.services.subscriptions import invalidate_subscription_types_cache
 
 ROOT_DIR = Path(__file__).parents[2]
 FUNCTIONAL_DIR = ROOT_DIR / "tests" / "functional"
@@ -50,6 +53,8 @@ BOT_ENV = {
     "YANDEX_DISK_TOKEN": "functional-test-yandex-token",
     "SUBSCRIPTION_BROADCAST_INTERVAL_SECONDS": "0.5",
     "ADMIN_BROADCAST_INTERVAL_SECONDS": "0.5",
+    # бот живёт всю сессию, а Redis очищается перед каждым тестом: ссылки не должны переживать тест в памяти процесса
+    "DOWNLOAD_URL_LOCAL_CACHE_SIZE": "0",
 }
 
 logger = logging.getLogger(__name__)
@@ -506,6 +511,9 @@ async def reset_dependency_state(
         await fake_yandex_server.reset()
         await _reset_database(docker_compose)
         await _flush_redis(docker_compose)
+        clear_random_image_index()
+        clear_hot_media()
+        invalidate_subscription_types_cache()
         await _insert_subscription_types(docker_compose, subscription_types)
 
     return reset
@@ -800,11 +808,11 @@ def run_subscription_broadcasts_at(
     fake_yandex_server: FakeYandexServer,
 ) -> Callable[[datetime], Awaitable[int]]:
     async def run(now: datetime) -> int:
-        connect_yandex(
-            BOT_ENV["YANDEX_DISK_TOKEN"],
-            api_base_url=f"{fake_yandex_server.base_url}/v1/disk/",
-        )
         async with (
+            connect_yandex(
+                BOT_ENV["YANDEX_DISK_TOKEN"],
+                api_base_url=f"{fake_yandex_server.base_url}/v1/disk/",
+            ),
             connect_postgres(
                 username=POSTGRES_ENV["POSTGRES_USER"],
                 password=POSTGRES_ENV["POSTGRES_PASSWORD"],
@@ -837,11 +845,11 @@ def synchronize_functional_media_catalog(
     fake_yandex_server: FakeYandexServer,
 ) -> Callable[[], Awaitable[MediaSyncSummary]]:
     async def run() -> MediaSyncSummary:
-        connect_yandex(
-            BOT_ENV["YANDEX_DISK_TOKEN"],
-            api_base_url=f"{fake_yandex_server.base_url}/v1/disk/",
-        )
         async with (
+            connect_yandex(
+                BOT_ENV["YANDEX_DISK_TOKEN"],
+                api_base_url=f"{fake_yandex_server.base_url}/v1/disk/",
+            ),
             connect_postgres(
                 username=POSTGRES_ENV["POSTGRES_USER"],
                 password=POSTGRES_ENV["POSTGRES_PASSWORD"],
@@ -901,6 +909,8 @@ async def _reset_database(dependency_ports: DependencyPorts) -> None:
         await connection.execute(
             """
             TRUNCATE
+                category_media_staging,
+                category_media_sync_states,
                 category_media,
                 admin_broadcast_deliveries,
                 admin_broadcast_recipients,
@@ -995,8 +1005,23 @@ async def _assert_schema_migrated(dependency_ports: DependencyPorts) -> None:
             await connection.fetchval("SELECT to_regclass('admin_broadcast_deliveries')")
             == "admin_broadcast_deliveries"
         )
+        assert (
+            await connection.fetchval(
+                """
+                SELECT count(*)
+                FROM pg_trigger
+                WHERE tgrelid = 'subscription_types'::regclass
+                  AND tgname IN ('subscription_types_notify_changed', 'subscription_types_notify_truncated')
+                """
+            )
+            == 2
+        )
         assert int(await connection.fetchval("SHOW server_version_num")) >= 180000
         assert await connection.fetchval("SELECT to_regclass('category_media')") == "category_media"
+        assert (
+            await connection.fetchval("SELECT to_regclass('subscriptions_due_utc_minute_idx')")
+            == "subscriptions_due_utc_minute_idx"
+        )
         assert (
             await connection.fetchval(
                 """
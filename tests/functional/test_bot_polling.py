@@ -271,8 +271,9 @@ async def test_bot_returns_day_images_for_partial_inline_query(
 
     payload = request["payload"]
     assert payload["inline_query_id"] == "inline-100"
-    assert payload["cache_time"] == 0
-    assert payload["is_personal"] is True
+    assert payload["cache_time"] == 30
+    assert payload["is_personal"] is False
+    assert payload.get("next_offset", "") == ""
     assert len(payload["results"]) == 2
     random_result, ordinary_result = payload["results"]
     assert random_result["type"] == ordinary_result["type"] == "photo"
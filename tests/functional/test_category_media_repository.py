@@ -1,7 +1,8 @@
-from collections.abc import Awaitable, Callable
+from collections.abc import AsyncIterator, Awaitable, Callable
 from datetime import UTC, datetime, time
 
 import pytest
+from sqlalchemy import func, select
 
 from cringe_pics_telebot.repositories.postgres import (
     CategoryMediaSource,
@@ -10,10 +11,13 @@ from cringe_pics_telebot.repositories.postgres import (
     connect,
     get_category_media,
     get_category_media_by_subscription_types,
+    get_category_media_summaries,
+    get_connection,
     invalidate_category_media_file_id,
     materialize_category_media,
     transaction,
 )
+from cringe_pics_telebot.repositories.postgres.tables import category_media_staging
 from cringe_pics_telebot.services.media_catalog import reconcile_category_media_snapshot
 from tests.functional.conftest import (
     POSTGRES_ENV,
@@ -116,6 +120,35 @@ async def test_deactivate_and_reactivate_same_revision_preserves_file_id(
         assert ready.telegram_file_id == "telegram-file-id"
 
 
+async def test_summaries_return_only_active_media_with_readiness(docker_compose: DependencyPorts) -> None:
+    ready_source = _source("day/ready.png", revision="sha256:ready")
+    pending_source = _source("day/pending.png", revision="sha256:pending")
+
+    async with _connect(docker_compose):
+        await reconcile_category_media_snapshot(
+            subscription_type_id=1,
+            sources=[ready_source, pending_source, _source("day/removed.png", revision="sha256:removed")],
+        )
+        await reconcile_category_media_snapshot(subscription_type_id=1, sources=[ready_source, pending_source])
+        media_by_path = {media.source_path: media for media in await get_category_media_by_subscription_types([1])}
+        async with transaction():
+            assert await materialize_category_media(
+                media_id=media_by_path["day/ready.png"].id,
+                source_revision=ready_source.source_revision,
+                telegram_file_id="telegram-file-id",
+                telegram_file_unique_id="telegram-unique-id",
+            )
+
+        summaries = await get_category_media_summaries([1])
+
+    assert {summary.source_path: summary.is_ready for summary in summaries} == {
+        "day/ready.png": True,
+        "day/pending.png": False,
+    }
+    assert [summary.id for summary in summaries] == sorted(media.id for media in media_by_path.values())
+    assert {summary.subscription_type_id for summary in summaries} == {1}
+
+
 async def test_materialize_and_invalidate_are_conditional(docker_compose: DependencyPorts) -> None:
     source = _source("day/image.png", revision="sha256:first")
 
@@ -171,6 +204,58 @@ async def test_reconcile_deduplicates_source_paths(docker_compose: DependencyPor
         assert media.source_revision == second.source_revision
 
 
+async def test_reconcile_streams_snapshot_in_chunks(docker_compose: DependencyPorts) -> None:
+    async def snapshot(paths: list[str], *, revision: str) -> AsyncIterator[CategoryMediaSource]:
+        for path in paths:
+            yield _source(path, revision=revision)
+
+    async with _connect(docker_compose):
+        await reconcile_category_media_snapshot(
+            subscription_type_id=1,
+            sources=snapshot([f"day/{index}.png" for index in range(5)], revision="sha256:first"),
+            chunk_size=2,
+        )
+
+        # повтор пути в другой порции заменяет ранее переданный вариант
+        result = await reconcile_category_media_snapshot(
+            subscription_type_id=1,
+            sources=snapshot(["day/1.png", "day/2.png", "day/5.png", "day/1.png"], revision="sha256:second"),
+            chunk_size=2,
+        )
+        assert result.discovered == 3
+        assert result.created == 1
+        assert result.changed == 2
+        assert result.deactivated == 3
+        assert result.unchanged == result.reactivated == 0
+
+        media = await get_category_media_by_subscription_types([1])
+        assert [(item.source_path, item.source_revision) for item in media] == [
+            ("day/1.png", "sha256:second"),
+            ("day/2.png", "sha256:second"),
+            ("day/5.png", "sha256:second"),
+        ]
+
+
+async def test_reconcile_discards_staged_snapshot_after_failed_listing(docker_compose: DependencyPorts) -> None:
+    async def broken_snapshot() -> AsyncIterator[CategoryMediaSource]:
+        for index in range(3):
+            yield _source(f"day/{index}.png", revision="sha256:first")
+        raise ConnectionError("Yandex Disk listing failed")
+
+    async with _connect(docker_compose):
+        await reconcile_category_media_snapshot(
+            subscription_type_id=1,
+            sources=[_source("day/kept.png", revision="sha256:first")],
+        )
+        with pytest.raises(ConnectionError):
+            await reconcile_category_media_snapshot(subscription_type_id=1, sources=broken_snapshot(), chunk_size=2)
+
+        media = await get_category_media_by_subscription_types([1])
+        assert [item.source_path for item in media] == ["day/kept.png"]
+        async with get_connection() as conn:
+            assert await conn.scalar(select(func.count()).select_from(category_media_staging)) == 0
+
+
 def _source(path: str, *, revision: str) -> CategoryMediaSource:
     return CategoryMediaSource(
         source_path=path,
@@ -40,11 +40,11 @@ async def test_sync_reconciles_changes_isolates_failures_and_honors_lease(
     docker_compose: DependencyPorts,
     fake_yandex_server: FakeYandexServer,
 ) -> None:
-    connect_yandex(
-        BOT_ENV["YANDEX_DISK_TOKEN"],
-        api_base_url=f"{fake_yandex_server.base_url}/v1/disk/",
-    )
     async with (
+        connect_yandex(
+            BOT_ENV["YANDEX_DISK_TOKEN"],
+            api_base_url=f"{fake_yandex_server.base_url}/v1/disk/",
+        ),
         connect_postgres(
             username=POSTGRES_ENV["POSTGRES_USER"],
             password=POSTGRES_ENV["POSTGRES_PASSWORD"],
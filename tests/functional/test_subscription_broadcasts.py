@@ -109,5 +109,29 @@ async def test_concurrent_scheduled_recipients_materialize_one_pending_revision_
     assert sum(request["method"] == "resources/download" for request in await fake_yandex_server.requests()) == 1
 
 
+async def test_subscription_broadcasts_follow_timezone_change(
+    fake_telegram_server: FakeTelegramServer,
+    fake_yandex_server: FakeYandexServer,
+    seed_functional_subscription_types: Callable[[tuple[FunctionalSubscriptionType, ...]], Awaitable[None]],
+    create_user_subscription: Callable[..., Awaitable[None]],
+    create_functional_user: Callable[..., Awaitable[None]],
+    run_subscription_broadcasts_at: Callable[[datetime], Awaitable[int]],
+    synchronize_functional_media_catalog: Callable[[], Awaitable[MediaSyncSummary]],
+) -> None:
+    await seed_functional_subscription_types((FunctionalSubscriptionType(1, "/morning", time(10, 0), "morning"),))
+    await create_user_subscription(
+        user_id=700,
+        subscription_type_id=1,
+        timezone_offset_minutes=7 * 60,
+    )
+    await create_functional_user(user_id=700, timezone_offset_minutes=-5 * 60)
+    await synchronize_functional_media_catalog()
+    await fake_yandex_server.reset()
+
+    assert await run_subscription_broadcasts_at(datetime(2026, 8, 16, 3, 0, tzinfo=UTC)) == 0
+    assert await run_subscription_broadcasts_at(datetime(2026, 8, 16, 15, 0, tzinfo=UTC)) == 1
+    assert _sent_chat_ids(await fake_telegram_server.requests(method="sendPhoto")) == [700]
+
+
 def _sent_chat_ids(requests: list[dict[str, Any]]) -> list[int]:
     return [int(request["payload"]["chat_id"]) for request in requests]
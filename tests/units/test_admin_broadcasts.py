@@ -1,13 +1,26 @@
-from datetime import UTC, datetime
+import asyncio
+from collections.abc import AsyncGenerator, Collection, Iterable, Sequence
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import CopyMessage
+from pytest import MonkeyPatch
 
 from cringe_pics_telebot.repositories.postgres.entities import (
     AdminBroadcast,
+    AdminBroadcastDelivery,
+    AdminBroadcastDeliveryOutcome,
+    AdminBroadcastDeliveryStatus,
     AdminBroadcastStatus,
     User,
 )
+from cringe_pics_telebot.services import admin_broadcasts
 from cringe_pics_telebot.services.admin_broadcasts import (
     is_admin_broadcast_complete,
     is_admin_broadcast_due,
+    min_due_timezone_offset,
 )
 
 
@@ -44,6 +57,147 @@ def test_local_broadcast_completes_only_after_latest_supported_timezone() -> Non
     )
 
 
+@pytest.mark.parametrize("timezone_offset_minutes", [None, -300, 420])
+@pytest.mark.parametrize(
+    "current_time",
+    [
+        datetime(2026, 8, 16, 19, 0, tzinfo=UTC),
+        datetime(2026, 8, 17, 2, 59, 30, tzinfo=UTC),
+        datetime(2026, 8, 17, 3, 0, tzinfo=UTC),
+        datetime(2026, 8, 17, 14, 30, 15, tzinfo=UTC),
+        datetime(2026, 8, 17, 22, 0, tzinfo=UTC),
+    ],
+)
+def test_min_due_timezone_offset_matches_per_user_due_check(
+    current_time: datetime, timezone_offset_minutes: int | None
+) -> None:
+    broadcast = _broadcast(
+        scheduled_local_at=datetime(2026, 8, 17, 10, 0),
+        timezone_offset_minutes=timezone_offset_minutes,
+    )
+    min_offset = min_due_timezone_offset(broadcast, now=current_time)
+
+    for user_offset in range(-720, 841, 15):
+        user = _user(1, user_offset)
+        assert (user_offset >= min_offset) == is_admin_broadcast_due(broadcast, user=user, now=current_time)
+
+
+async def test_dispatch_reserves_pages_and_bounds_concurrent_sends(monkeypatch: MonkeyPatch) -> None:
+    reserved_pages: list[list[int]] = []
+    finished: dict[int, AdminBroadcastDeliveryStatus] = {}
+    deactivated: list[int] = []
+    in_flight = 0
+    max_in_flight = 0
+
+    @asynccontextmanager
+    async def transaction() -> AsyncGenerator[None]:
+        yield
+
+    async def reserve_admin_broadcast_deliveries(
+        *, broadcast_id: int, user_ids: Iterable[int]
+    ) -> list[AdminBroadcastDelivery]:
+        page = list(user_ids)
+        reserved_pages.append(page)
+        return [_delivery(user_id) for user_id in page]
+
+    async def finish_admin_broadcast_deliveries(outcomes: Sequence[AdminBroadcastDeliveryOutcome]) -> int:
+        finished.update((outcome.delivery_id, outcome.status) for outcome in outcomes)
+        return len(outcomes)
+
+    async def deactivate_users(user_ids: Collection[int]) -> None:
+        deactivated.extend(user_ids)
+
+    class Bot:
+        async def copy_message(self, *, chat_id: int, from_chat_id: int, message_id: int) -> None:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            if chat_id == 13:
+                raise TelegramForbiddenError(
+                    method=CopyMessage(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id),
+                    message="Forbidden: bot was blocked by the user",
+                )
+
+    monkeypatch.setattr(admin_broadcasts, "transaction", transaction)
+    monkeypatch.setattr(admin_broadcasts, "reserve_admin_broadcast_deliveries", reserve_admin_broadcast_deliveries)
+    monkeypatch.setattr(admin_broadcasts, "finish_admin_broadcast_deliveries", finish_admin_broadcast_deliveries)
+    monkeypatch.setattr(admin_broadcasts, "deactivate_users", deactivate_users)
+    monkeypatch.setattr(admin_broadcasts, "DELIVERY_PAGE_SIZE", 4)
+    monkeypatch.setattr(admin_broadcasts, "DELIVERY_WORKERS", 3)
+
+    async with admin_broadcasts._DeliveryOutcomeBuffer(batch_size=4) as outcomes:
+        sent = await admin_broadcasts._dispatch_admin_broadcast(
+            bot=Bot(),  # type: ignore[arg-type]
+            broadcast=_broadcast(scheduled_local_at=datetime(2026, 8, 17, 10, 0)),
+            user_ids=list(range(10, 20)),
+            outcomes=outcomes,
+        )
+
+    assert sent == 9
+    assert reserved_pages == [[10, 11, 12, 13], [14, 15, 16, 17], [18, 19]]
+    assert max_in_flight == 3
+    assert deactivated == [13]
+    assert finished == {
+        user_id: AdminBroadcastDeliveryStatus.failed if user_id == 13 else AdminBroadcastDeliveryStatus.sent
+        for user_id in range(10, 20)
+    }
+
+
+async def test_outcome_buffer_flushes_by_size_by_interval_and_on_exit(monkeypatch: MonkeyPatch) -> None:
+    batches: list[list[int]] = []
+
+    @asynccontextmanager
+    async def transaction() -> AsyncGenerator[None]:
+        yield
+
+    async def finish_admin_broadcast_deliveries(outcomes: Sequence[AdminBroadcastDeliveryOutcome]) -> int:
+        batches.append([outcome.delivery_id for outcome in outcomes])
+        return len(outcomes)
+
+    async def deactivate_users(user_ids: Collection[int]) -> None:
+        pass
+
+    monkeypatch.setattr(admin_broadcasts, "transaction", transaction)
+    monkeypatch.setattr(admin_broadcasts, "finish_admin_broadcast_deliveries", finish_admin_broadcast_deliveries)
+    monkeypatch.setattr(admin_broadcasts, "deactivate_users", deactivate_users)
+
+    async with admin_broadcasts._DeliveryOutcomeBuffer(
+        batch_size=2,
+        flush_interval=timedelta(milliseconds=10),
+    ) as outcomes:
+        for user_id in (1, 2, 3):
+            await outcomes.add(_outcome(user_id))
+        assert batches == [[1, 2]]
+
+        await asyncio.sleep(0.05)
+        assert batches == [[1, 2], [3]]
+
+        await outcomes.add(_outcome(4))
+
+    assert batches == [[1, 2], [3], [4]]
+
+
+def _outcome(user_id: int) -> admin_broadcasts._DeliveryOutcome:
+    return admin_broadcasts._DeliveryOutcome(
+        delivery=_delivery(user_id),
+        status=AdminBroadcastDeliveryStatus.sent,
+    )
+
+
+def _delivery(user_id: int) -> AdminBroadcastDelivery:
+    return AdminBroadcastDelivery(
+        id=user_id,
+        broadcast_id=1,
+        user_id=user_id,
+        status=AdminBroadcastDeliveryStatus.pending,
+        attempted_at=datetime(2026, 8, 17, tzinfo=UTC),
+        finished_at=None,
+        error=None,
+    )
+
+
 def _broadcast(*, scheduled_local_at: datetime, timezone_offset_minutes: int | None = None) -> AdminBroadcast:
     created_at = datetime(2026, 8, 17, tzinfo=UTC)
     return AdminBroadcast(
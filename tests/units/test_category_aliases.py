@@ -1,6 +1,7 @@
 import pytest
 
 from cringe_pics_telebot.services.category_aliases import (
+    CategorySearchIndex,
     InvalidCategoryAliasesError,
     parse_category_search_aliases,
 )
@@ -18,3 +19,27 @@ def test_parse_category_search_aliases_preserves_first_unique_spelling() -> None
 def test_parse_category_search_aliases_rejects_no_searchable_aliases(value: str) -> None:
     with pytest.raises(InvalidCategoryAliasesError):
         parse_category_search_aliases(value)
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("/ДН", {2}),
+        ("  УТР  ", {1}),
+        ("ing", {1, 3}),
+        ("общее", {1, 3}),
+        ("днев", {2}),
+        ("ночь", set()),
+        (" / ", set()),
+    ],
+)
+def test_category_search_index_finds_substrings_of_names_and_aliases(query: str, expected: set[int]) -> None:
+    search_index = CategorySearchIndex.build(
+        [
+            (1, "/morning", ("утро", " Общее ")),
+            (2, "/day", ("день", "дневная")),
+            (3, "/evening", ("вечер", "/ОБЩЕЕ")),
+        ]
+    )
+
+    assert search_index.find(query) == expected
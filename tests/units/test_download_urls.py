@@ -0,0 +1,154 @@
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from pytest import MonkeyPatch
+
+from cringe_pics_telebot.repositories.postgres import CategoryMedia, CategoryMediaStatus, TelegramMediaType
+from cringe_pics_telebot.services import download_urls
+
+
+@pytest.fixture(autouse=True)
+def clear_local_download_urls() -> Iterator[None]:
+    download_urls.clear_local_download_urls()
+    yield
+    download_urls.configure_local_download_urls(max_size=download_urls.LOCAL_DOWNLOAD_URL_CACHE_SIZE)
+
+
+async def test_get_download_urls_uses_shared_cache_and_fetches_only_missing(monkeypatch: MonkeyPatch) -> None:
+    shared = _patch_shared_cache(monkeypatch, {"download-url:sha256:1:day/1.png": "https://cache.example/1.png"})
+    requested_paths = _patch_yandex(monkeypatch)
+
+    urls = await download_urls.get_download_urls([_media(1), _media(2), _media(1)])
+
+    assert urls == ["https://cache.example/1.png", "https://storage.example/day/2.png", "https://cache.example/1.png"]
+    assert requested_paths == [["day/2.png"]]
+    assert shared["download-url:sha256:2:day/2.png"] == "https://storage.example/day/2.png"
+
+
+async def test_get_download_urls_serves_repeated_lookups_from_process_cache(monkeypatch: MonkeyPatch) -> None:
+    shared = _patch_shared_cache(monkeypatch)
+    requested_paths = _patch_yandex(monkeypatch)
+
+    await download_urls.get_download_urls([_media(1)])
+    shared.clear()
+
+    assert await download_urls.get_download_urls([_media(1)]) == ["https://storage.example/day/1.png"]
+    assert requested_paths == [["day/1.png"]]
+
+
+async def test_get_download_urls_keys_cache_by_revision(monkeypatch: MonkeyPatch) -> None:
+    _patch_shared_cache(monkeypatch)
+    requested_paths = _patch_yandex(monkeypatch)
+
+    await download_urls.get_download_urls([_media(1)])
+    await download_urls.get_download_urls([_media(1, revision="sha256:changed")])
+
+    assert requested_paths == [["day/1.png"], ["day/1.png"]]
+
+
+async def test_process_cache_evicts_least_recently_used_and_expired_urls(monkeypatch: MonkeyPatch) -> None:
+    now = 0.0
+    monkeypatch.setattr(download_urls, "monotonic", lambda: now)
+    download_urls.configure_local_download_urls(max_size=2)
+    shared = _patch_shared_cache(monkeypatch)
+    requested_paths = _patch_yandex(monkeypatch)
+
+    await download_urls.get_download_urls([_media(1), _media(2)])
+    await download_urls.get_download_urls([_media(1)])
+    await download_urls.get_download_urls([_media(3)])
+    shared.clear()
+    await download_urls.get_download_urls([_media(1), _media(2)])
+    now = download_urls.LOCAL_DOWNLOAD_URL_TTL.total_seconds()
+    shared.clear()
+    await download_urls.get_download_urls([_media(1)])
+
+    assert requested_paths == [["day/1.png", "day/2.png"], ["day/3.png"], ["day/2.png"], ["day/1.png"]]
+
+
+async def test_get_download_urls_falls_back_to_yandex_when_redis_fails(monkeypatch: MonkeyPatch) -> None:
+    async def broken(**kwargs: object) -> None:
+        raise ConnectionError("Redis is unavailable")
+
+    monkeypatch.setattr(download_urls.cache, "get_many", broken)
+    monkeypatch.setattr(download_urls.cache, "set_many", broken)
+    requested_paths = _patch_yandex(monkeypatch)
+
+    assert await download_urls.get_download_urls([_media(1)]) == ["https://storage.example/day/1.png"]
+    assert requested_paths == [["day/1.png"]]
+
+
+async def test_disabled_process_cache_reads_shared_cache_every_time(monkeypatch: MonkeyPatch) -> None:
+    download_urls.configure_local_download_urls(max_size=0)
+    shared = _patch_shared_cache(monkeypatch)
+    requested_paths = _patch_yandex(monkeypatch)
+
+    await download_urls.get_download_urls([_media(1)])
+    shared.clear()
+    await download_urls.get_download_urls([_media(1)])
+
+    assert requested_paths == [["day/1.png"], ["day/1.png"]]
+
+
+async def test_forget_download_url_drops_both_cache_layers(monkeypatch: MonkeyPatch) -> None:
+    shared = _patch_shared_cache(monkeypatch)
+    requested_paths = _patch_yandex(monkeypatch)
+
+    await download_urls.get_download_urls([_media(1)])
+    await download_urls.forget_download_url(_media(1))
+    await download_urls.get_download_urls([_media(1)])
+
+    assert requested_paths == [["day/1.png"], ["day/1.png"]]
+    assert list(shared) == ["download-url:sha256:1:day/1.png"]
+
+
+def _patch_shared_cache(monkeypatch: MonkeyPatch, values: dict[str, str] | None = None) -> dict[str, str]:
+    shared = {} if values is None else values
+
+    async def get_many(*, keys: list[str], cls: type[str]) -> list[str | None]:
+        return [shared.get(key) for key in keys]
+
+    async def set_many(*, values: dict[str, str], cls: type[str], ttl: timedelta) -> None:
+        assert ttl == download_urls.DOWNLOAD_URL_TTL
+        shared.update(values)
+
+    async def delete(*, key: str) -> None:
+        shared.pop(key, None)
+
+    monkeypatch.setattr(download_urls.cache, "get_many", get_many)
+    monkeypatch.setattr(download_urls.cache, "set_many", set_many)
+    monkeypatch.setattr(download_urls.cache, "delete", delete)
+    return shared
+
+
+def _patch_yandex(monkeypatch: MonkeyPatch) -> list[list[str]]:
+    requested_paths: list[list[str]] = []
+
+    async def get_urls(paths: Iterable[str]) -> list[str | None]:
+        paths = list(paths)
+        requested_paths.append(paths)
+        return [f"https://storage.example/{path}" for path in paths]
+
+    monkeypatch.setattr(download_urls, "get_yandex_download_urls", get_urls)
+    return requested_paths
+
+
+def _media(media_id: int, *, revision: str | None = None) -> CategoryMedia:
+    now = datetime(2026, 8, 19, tzinfo=UTC)
+    return CategoryMedia(
+        id=media_id,
+        subscription_type_id=2,
+        source_path=f"day/{media_id}.png",
+        source_revision=revision or f"sha256:{media_id}",
+        name=f"{media_id}.png",
+        mime_type="image/png",
+        telegram_media_type=TelegramMediaType.photo,
+        telegram_file_id=None,
+        telegram_file_unique_id=None,
+        is_active=True,
+        status=CategoryMediaStatus.pending,
+        last_seen_at=now,
+        materialized_at=None,
+        created_at=now,
+        updated_at=now,
+    )
@@ -0,0 +1,136 @@
+import asyncio
+from collections.abc import Iterator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from cringe_pics_telebot.repositories.postgres import CategoryMedia, CategoryMediaStatus, TelegramMediaType
+from cringe_pics_telebot.services import hot_media
+
+
+@pytest.fixture(autouse=True)
+def empty_hot_media() -> Iterator[None]:
+    hot_media.clear_hot_media()
+    yield
+    hot_media.configure_hot_media(max_size=hot_media.HOT_MEDIA_CACHE_SIZE)
+
+
+def test_only_active_materialized_media_is_remembered() -> None:
+    hot_media.remember_hot_media([_media(1), _media(2, file_id=None), _media(3, is_active=False)])
+
+    assert list(hot_media.get_hot_media([1, 2, 3])) == [1]
+
+
+def test_pending_row_replaces_remembered_media() -> None:
+    hot_media.remember_hot_media([_media(1)])
+    hot_media.remember_hot_media([_media(1, file_id=None)])
+
+    assert hot_media.get_hot_media([1]) == {}
+
+
+def test_cache_evicts_least_recently_used_media() -> None:
+    hot_media.configure_hot_media(max_size=2)
+    hot_media.remember_hot_media([_media(1), _media(2)])
+    hot_media.get_hot_media([1])
+    hot_media.remember_hot_media([_media(3)])
+
+    assert set(hot_media.get_hot_media([1, 2, 3])) == {1, 3}
+
+
+def test_expired_media_is_a_miss(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 0.0
+    monkeypatch.setattr(hot_media, "monotonic", lambda: now)
+    hot_media.remember_hot_media([_media(1)])
+
+    now = hot_media.HOT_MEDIA_TTL.total_seconds() - 1
+    assert list(hot_media.get_hot_media([1])) == [1]
+    now = hot_media.HOT_MEDIA_TTL.total_seconds()
+    assert hot_media.get_hot_media([1]) == {}
+    # просроченная запись удаляется, а не только пропускается
+    now = 0.0
+    assert hot_media.get_hot_media([1]) == {}
+
+
+async def test_invalidation_is_applied_locally_and_broadcast(monkeypatch: pytest.MonkeyPatch) -> None:
+    publish = AsyncMock()
+    monkeypatch.setattr(hot_media.cache, "publish", publish)
+    hot_media.remember_hot_media([_media(1), _media(2), _media(3, subscription_type_id=5)])
+
+    await hot_media.invalidate_hot_media(1)
+    await hot_media.invalidate_hot_category_media(2)
+
+    assert list(hot_media.get_hot_media([1, 2, 3])) == [3]
+    assert [call.kwargs["channel"] for call in publish.await_args_list] == ["hot-media:media:1", "hot-media:category:2"]
+
+
+async def test_failed_broadcast_still_invalidates_local_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(hot_media.cache, "publish", AsyncMock(side_effect=ConnectionError))
+    hot_media.remember_hot_media([_media(1)])
+
+    await hot_media.invalidate_hot_media(1)
+
+    assert hot_media.get_hot_media([1]) == {}
+
+
+async def test_listener_applies_invalidations_from_other_instances(monkeypatch: pytest.MonkeyPatch) -> None:
+    channels: asyncio.Queue[str] = asyncio.Queue()
+    subscribed = asyncio.Event()
+
+    @asynccontextmanager
+    async def listen(pattern: str):
+        assert pattern == "hot-media:*"
+
+        async def receive():
+            while True:
+                yield await channels.get()
+
+        subscribed.set()
+        yield receive()
+
+    monkeypatch.setattr(hot_media.cache, "listen", listen)
+    hot_media.remember_hot_media([_media(1)])
+    listener = asyncio.create_task(hot_media.run_hot_media_invalidation())
+    await subscribed.wait()
+    # пропущенные до подписки инвалидации сбрасывают весь кэш
+    assert hot_media.get_hot_media([1]) == {}
+
+    hot_media.remember_hot_media([_media(2), _media(3), _media(4, subscription_type_id=5)])
+    for channel in ("hot-media:media:2", "hot-media:category:5", "hot-media:unknown"):
+        await channels.put(channel)
+    while not channels.empty():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    listener.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await listener
+
+    assert list(hot_media.get_hot_media([2, 3, 4])) == [3]
+
+
+def _media(
+    media_id: int,
+    *,
+    subscription_type_id: int = 2,
+    file_id: str | None = "file-id",
+    is_active: bool = True,
+) -> CategoryMedia:
+    now = datetime(2026, 10, 18, tzinfo=UTC)
+    return CategoryMedia(
+        id=media_id,
+        subscription_type_id=subscription_type_id,
+        source_path=f"day/{media_id}.png",
+        source_revision=f"sha256:{media_id}",
+        name=f"{media_id}.png",
+        mime_type="image/png",
+        telegram_media_type=TelegramMediaType.photo,
+        telegram_file_id=file_id,
+        telegram_file_unique_id=file_id,
+        is_active=is_active,
+        status=CategoryMediaStatus.ready if file_id is not None else CategoryMediaStatus.pending,
+        last_seen_at=now,
+        materialized_at=now if file_id is not None else None,
+        created_at=now,
+        updated_at=now,
+    )
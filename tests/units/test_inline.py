@@ -1,5 +1,4 @@
-from collections.abc import Sequence
-from datetime import UTC, datetime, time
+from datetime import UTC, datetime, time, timedelta
 from typing import cast
 
 import pytest
@@ -15,6 +14,7 @@ from pytest import MonkeyPatch
 
 from cringe_pics_telebot.bot import inline
 from cringe_pics_telebot.repositories.postgres import SubscriptionType
+from cringe_pics_telebot.services.category_aliases import CategorySearchIndex
 from cringe_pics_telebot.services.random_image import CachedMedia, LinkedMedia
 
 
@@ -50,131 +50,74 @@ async def test_find_subscription_types_returns_every_matching_category(monkeypat
         _subscription_type(4, "/night", "night"),
     ]
 
-    async def get_subscription_types() -> list[SubscriptionType]:
-        return subscription_types
+    search_index = CategorySearchIndex.build((st.id, st.name, st.search_aliases) for st in subscription_types)
 
-    monkeypatch.setattr(inline, "get_subscription_types", get_subscription_types)
+    async def get_subscription_type_search_index() -> tuple[list[SubscriptionType], CategorySearchIndex]:
+        return subscription_types, search_index
+
+    monkeypatch.setattr(inline, "get_subscription_type_search_index", get_subscription_type_search_index)
 
     assert await inline._find_subscription_types(" /ОБЩ ") == [subscription_types[0], subscription_types[2]]
 
 
-async def test_get_inline_results_combines_categories_without_duplicate_paths(monkeypatch: MonkeyPatch) -> None:
+def test_inline_results_marks_only_first_page_result_as_random() -> None:
     morning = _subscription_type(1, "/morning", "morning")
     evening = _subscription_type(3, "/evening", "evening")
-
-    async def get_inline_images(
-        subscription_types: list[SubscriptionType],
-        *,
-        limit_per_category: int | None,
-    ) -> list[tuple[SubscriptionType, CachedMedia | LinkedMedia]]:
-        assert subscription_types == [morning, evening]
-        assert limit_per_category is None
-        return [
-            (
-                morning,
-                CachedMedia(
-                    name="shared.png",
-                    mime_type="image/png",
-                    path="shared/image.png",
-                    source_revision="sha256:shared",
-                    id="telegram-shared",
-                ),
-            ),
-            (
-                morning,
-                LinkedMedia(
-                    name="morning.png",
-                    mime_type="image/png",
-                    path="morning/image.png",
-                    source_revision="sha256:morning",
-                    url="https://storage.example/morning.png",
-                ),
+    images: list[tuple[SubscriptionType, CachedMedia | LinkedMedia]] = [
+        (
+            morning,
+            CachedMedia(
+                name="shared.png",
+                mime_type="image/png",
+                path="shared/image.png",
+                source_revision="sha256:shared",
+                id="telegram-shared",
             ),
-            (
-                evening,
-                LinkedMedia(
-                    name="duplicate.png",
-                    mime_type="image/png",
-                    path="shared/image.png",
-                    source_revision="sha256:shared",
-                    url="https://storage.example/duplicate.png",
-                ),
-            ),
-            (
-                evening,
-                LinkedMedia(
-                    name="evening.png",
-                    mime_type="image/png",
-                    path="evening/image.png",
-                    source_revision="sha256:evening",
-                    url="https://storage.example/evening.png",
-                ),
+        ),
+        (
+            evening,
+            LinkedMedia(
+                name="evening.png",
+                mime_type="image/png",
+                path="evening/image.png",
+                source_revision="sha256:evening",
+                url="https://storage.example/evening.png",
             ),
-        ]
-
-    monkeypatch.setattr(inline, "get_inline_images", get_inline_images)
-
-    results = await inline._get_inline_results([morning, evening])
-    payloads = [result.model_dump(exclude_none=True) for result in results]
-
-    assert [payload["title"] for payload in payloads] == ["shared.png", "morning.png", "evening.png"]
-    assert payloads[0]["description"] == "Категория /morning"
-    assert payloads[2]["description"] == "Категория /evening"
-    assert len({payload["id"] for payload in payloads}) == 3
-
-
-def test_shuffle_inline_results_uses_injected_shuffler_on_a_copy() -> None:
-    results = _inline_results(3)
-    shuffled_inputs: list[list[str]] = []
-
-    def reverse(items: list[inline.InlineMediaResult]) -> None:
-        shuffled_inputs.append([item.id for item in items])
-        items.reverse()
-
-    shuffled_results = inline._shuffle_inline_results(results, shuffler=reverse)
-
-    assert shuffled_inputs == [["result-0", "result-1", "result-2"]]
-    assert [result.id for result in shuffled_results] == ["result-2", "result-1", "result-0"]
-    assert [result.id for result in results] == ["result-0", "result-1", "result-2"]
-
+        ),
+    ]
 
-def test_prepare_inline_results_chooses_before_limit_and_deduplicates_selected_media() -> None:
-    results = _inline_results(inline.MAX_INLINE_QUERY_RESULTS + 2)
-    chooser_inputs: list[list[str]] = []
-    shuffler_inputs: list[list[str]] = []
+    first_page = [
+        result.model_dump(exclude_none=True) for result in inline._inline_results(images, with_random_result=True)
+    ]
+    next_page = [
+        result.model_dump(exclude_none=True) for result in inline._inline_results(images, with_random_result=False)
+    ]
 
-    def choose_last(items: Sequence[inline.InlineMediaResult]) -> inline.InlineMediaResult:
-        chooser_inputs.append([item.id for item in items])
-        return items[-1]
+    assert [payload["title"] for payload in first_page] == [inline.RANDOM_INLINE_RESULT_TITLE, "evening.png"]
+    assert [payload["title"] for payload in next_page] == ["shared.png", "evening.png"]
+    assert first_page[0]["description"] == "Категория /morning"
+    assert next_page[1]["description"] == "Категория /evening"
+    assert first_page[0]["id"] != next_page[0]["id"]
+    assert first_page[1]["id"] == next_page[1]["id"]
 
-    def reverse(items: list[inline.InlineMediaResult]) -> None:
-        shuffler_inputs.append([item.id for item in items])
-        items.reverse()
 
-    prepared_results = inline._prepare_inline_results(
-        results,
-        chooser=choose_last,
-        shuffler=reverse,
-    )
-    random_result = cast(InlineQueryResultPhoto, prepared_results[0])
-
-    assert chooser_inputs == [[f"result-{index}" for index in range(inline.MAX_INLINE_QUERY_RESULTS + 2)]]
-    assert shuffler_inputs == [[f"result-{index}" for index in range(inline.MAX_INLINE_QUERY_RESULTS + 1)]]
-    assert len(prepared_results) == inline.MAX_INLINE_QUERY_RESULTS
-    assert random_result.title == inline.RANDOM_INLINE_RESULT_TITLE
-    assert len(random_result.id) == 64
-    assert random_result.id not in {result.id for result in results}
-    assert random_result.photo_url == "https://storage.example/51.png"
-    assert [result.id for result in prepared_results[1:]] == [
-        f"result-{index}" for index in range(inline.MAX_INLINE_QUERY_RESULTS, 1, -1)
-    ]
-    assert [result.id for result in results] == [
-        f"result-{index}" for index in range(inline.MAX_INLINE_QUERY_RESULTS + 2)
-    ]
+def test_inline_results_returns_empty_results() -> None:
+    assert inline._inline_results([], with_random_result=True) == []
 
 
-def test_prepare_inline_results_returns_empty_results() -> None:
-    assert inline._prepare_inline_results([]) == []
+@pytest.mark.parametrize(
+    ("offset", "parsed"),
+    [
+        ("0123456789abcdef:50", ("0123456789abcdef", 50)),
+        ("", None),
+        ("0123456789abcdef", None),
+        ("short:50", None),
+        ("0123456789abcdef:-1", None),
+        ("0123456789abcdef:next", None),
+    ],
+)
+def test_parse_offset(offset: str, parsed: tuple[str, int] | None) -> None:
+    assert inline._parse_offset(offset) == parsed
 
 
 @pytest.mark.parametrize(
@@ -194,8 +137,8 @@ def test_prepare_inline_results_returns_empty_results() -> None:
         ),
     ],
 )
-def test_prepare_inline_results_preserves_selected_media_type_and_source(result: inline.InlineMediaResult) -> None:
-    prepared_result = inline._prepare_inline_results([result])[0]
+def test_random_result_preserves_selected_media_type_and_source(result: inline.InlineMediaResult) -> None:
+    prepared_result = inline._random_result(result)
 
     assert type(prepared_result) is type(result)
     assert prepared_result.model_dump(exclude={"id", "title"}, exclude_none=True) == result.model_dump(
@@ -206,55 +149,84 @@ def test_prepare_inline_results_preserves_selected_media_type_and_source(result:
     assert prepared_result.id != result.id
 
 
-async def test_answer_inline_query_prepares_results_and_disables_telegram_cache(monkeypatch: MonkeyPatch) -> None:
+async def test_answer_inline_query_pages_snapshot_with_shared_telegram_cache(monkeypatch: MonkeyPatch) -> None:
     subscription_type = _subscription_type(2, "/day", "day")
-    results = _inline_results(inline.MAX_INLINE_QUERY_RESULTS + 1)
-    query = _FakeInlineQuery(query="day")
+    snapshot = list(range(inline.MAX_INLINE_QUERY_RESULTS + 1))
+    seeds: list[str] = []
+    pages: list[list[int]] = []
+    prefetched: list[list[int]] = []
 
     async def find_subscription_types(query: str) -> list[SubscriptionType]:
-        assert query == "day"
         return [subscription_type]
 
-    async def get_inline_results(subscription_types: list[SubscriptionType]) -> list[inline.InlineMediaResult]:
+    async def get_inline_snapshot(subscription_types: list[SubscriptionType], *, seed: str) -> list[int]:
         assert subscription_types == [subscription_type]
-        return results
+        seeds.append(seed)
+        return snapshot
+
+    async def get_inline_page(
+        subscription_types: list[SubscriptionType],
+        media_ids: list[int],
+        *,
+        prefetch_ids: list[int],
+    ) -> list[tuple[SubscriptionType, CachedMedia | LinkedMedia]]:
+        pages.append(media_ids)
+        prefetched.append(prefetch_ids)
+        return [(subscription_type, _linked_media(media_id)) for media_id in media_ids]
+
+    monkeypatch.setattr(inline, "_find_subscription_types", find_subscription_types)
+    monkeypatch.setattr(inline, "get_inline_snapshot", get_inline_snapshot)
+    monkeypatch.setattr(inline, "get_inline_page", get_inline_page)
+
+    first_query = _FakeInlineQuery(query="day")
+    await inline.answer_inline_query(cast(InlineQuery, first_query))
+    assert first_query.next_offset is not None
+    next_query = _FakeInlineQuery(query="day", offset=first_query.next_offset)
+    await inline.answer_inline_query(cast(InlineQuery, next_query), inline_cache_time=timedelta(minutes=1))
+
+    seed = seeds[0]
+    assert seeds == [seed, seed]
+    assert pages == [snapshot[: inline.MAX_INLINE_QUERY_RESULTS], snapshot[inline.MAX_INLINE_QUERY_RESULTS :]]
+    assert prefetched == [snapshot[inline.MAX_INLINE_QUERY_RESULTS :], []]
+    assert first_query.next_offset == f"{seed}:{inline.MAX_INLINE_QUERY_RESULTS}"
+    assert len(first_query.results) == inline.MAX_INLINE_QUERY_RESULTS
+    assert cast(inline.InlineMediaResult, first_query.results[0]).title == inline.RANDOM_INLINE_RESULT_TITLE
+    assert first_query.cache_time == 30
+    assert first_query.is_personal is False
+    assert next_query.next_offset == ""
+    assert [cast(inline.InlineMediaResult, result).title for result in next_query.results] == [
+        f"{inline.MAX_INLINE_QUERY_RESULTS}.png"
+    ]
+    assert next_query.cache_time == 60
+    assert next_query.is_personal is False
 
-    def reverse(items: list[inline.InlineMediaResult]) -> None:
-        items.reverse()
 
-    def choose_last(items: Sequence[inline.InlineMediaResult]) -> inline.InlineMediaResult:
-        return items[-1]
+async def test_answer_inline_query_does_not_cache_failed_answer(monkeypatch: MonkeyPatch) -> None:
+    async def find_subscription_types(query: str) -> list[SubscriptionType]:
+        return [_subscription_type(2, "/day", "day")]
+
+    async def get_inline_snapshot(subscription_types: list[SubscriptionType], *, seed: str) -> list[int]:
+        raise RuntimeError("catalog is unavailable")
 
     monkeypatch.setattr(inline, "_find_subscription_types", find_subscription_types)
-    monkeypatch.setattr(inline, "_get_inline_results", get_inline_results)
-    monkeypatch.setattr(inline.random, "shuffle", reverse)
-    monkeypatch.setattr(inline.random, "choice", choose_last)
+    monkeypatch.setattr(inline, "get_inline_snapshot", get_inline_snapshot)
 
+    query = _FakeInlineQuery(query="day")
     await inline.answer_inline_query(cast(InlineQuery, query))
 
-    assert len(query.results) == inline.MAX_INLINE_QUERY_RESULTS
-    assert len(query.results[0].id) == 64
-    assert query.results[0].id not in {result.id for result in results}
-    assert cast(inline.InlineMediaResult, query.results[0]).title == inline.RANDOM_INLINE_RESULT_TITLE
-    assert [result.id for result in query.results[1:]] == [
-        f"result-{index}" for index in range(inline.MAX_INLINE_QUERY_RESULTS - 1, 0, -1)
-    ]
+    assert query.results == []
     assert query.cache_time == 0
-    assert query.is_personal is True
-    assert [result.id for result in results] == [
-        f"result-{index}" for index in range(inline.MAX_INLINE_QUERY_RESULTS + 1)
-    ]
+    assert not query.next_offset
 
 
-def _inline_results(count: int) -> list[inline.InlineMediaResult]:
-    return [
-        InlineQueryResultPhoto(
-            id=f"result-{index}",
-            photo_url=f"https://storage.example/{index}.png",
-            thumbnail_url=f"https://storage.example/{index}.png",
-        )
-        for index in range(count)
-    ]
+def _linked_media(media_id: int) -> LinkedMedia:
+    return LinkedMedia(
+        name=f"{media_id}.png",
+        mime_type="image/png",
+        path=f"day/{media_id}.png",
+        source_revision=f"sha256:{media_id}",
+        url=f"https://storage.example/{media_id}.png",
+    )
 
 
 def _subscription_type(
@@ -277,12 +249,14 @@ def _subscription_type(
 
 
 class _FakeInlineQuery:
-    def __init__(self, *, query: str) -> None:
+    def __init__(self, *, query: str, offset: str = "") -> None:
         self.query = query
+        self.offset = offset
         self.from_user = _FakeUser()
         self.results: list[InlineQueryResultUnion] = []
         self.cache_time: int | None = None
         self.is_personal: bool | None = None
+        self.next_offset: str | None = None
 
     async def answer(
         self,
@@ -290,10 +264,12 @@ class _FakeInlineQuery:
         *,
         cache_time: int,
         is_personal: bool,
+        next_offset: str | None = None,
     ) -> None:
         self.results = results
         self.cache_time = cache_time
         self.is_personal = is_personal
+        self.next_offset = next_offset
 
 
 class _FakeUser:
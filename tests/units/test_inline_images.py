@@ -1,47 +1,95 @@
+import asyncio
 from collections.abc import Iterable
-from datetime import UTC, datetime, time
+from datetime import UTC, datetime, time, timedelta
+from typing import cast
 
+import pytest
 from pytest import MonkeyPatch
 
 from cringe_pics_telebot.repositories.postgres import (
     CategoryMedia,
     CategoryMediaStatus,
+    CategoryMediaSummary,
     SubscriptionType,
     TelegramMediaType,
 )
-from cringe_pics_telebot.services import inline_images
+from cringe_pics_telebot.services import download_urls, inline_images
 from cringe_pics_telebot.services.random_image import CachedMedia, LinkedMedia
 
 
-async def test_get_inline_images_uses_catalog_ids_and_resolves_only_pending_urls(
+@pytest.fixture(autouse=True)
+def clear_local_download_urls() -> None:
+    download_urls.clear_local_download_urls()
+
+
+async def test_get_inline_snapshot_deduplicates_paths_and_orders_by_seed(monkeypatch: MonkeyPatch) -> None:
+    morning = _subscription_type(1, "/morning")
+    day = _subscription_type()
+    media = [
+        _summary(1, subscription_type_id=1, source_path="shared.png"),
+        _summary(2, subscription_type_id=1),
+        _summary(3, source_path="shared.png"),
+        *(_summary(media_id) for media_id in range(4, 10)),
+        _summary(10, is_ready=True),
+        _summary(11, is_ready=True),
+    ]
+    stored: dict[str, list[int]] = {}
+
+    async def get_media(category_ids: list[int]) -> list[CategoryMediaSummary]:
+        assert category_ids == [1, 2]
+        return media
+
+    async def get_cached(*, key: str, cls: type[list[int]]) -> list[int] | None:
+        return stored.get(key)
+
+    async def set_cached(*, key: str, value: list[int], cls: type[list[int]], ttl: timedelta) -> None:
+        assert ttl == inline_images.INLINE_SNAPSHOT_TTL
+        stored[key] = value
+
+    monkeypatch.setattr(inline_images, "get_category_media_summaries", get_media)
+    monkeypatch.setattr(inline_images.cache, "get", get_cached)
+    monkeypatch.setattr(inline_images.cache, "set", set_cached)
+
+    snapshot = await inline_images.get_inline_snapshot([morning, day], seed="seed")
+    stored.clear()
+    rebuilt_snapshot = await inline_images.get_inline_snapshot([morning, day], seed="seed")
+
+    assert sorted(snapshot[:2]) == [10, 11]
+    assert sorted(snapshot[2:]) == [1, 2, *range(4, 10)]
+    assert rebuilt_snapshot == snapshot
+    assert stored == {"inline-results:seed": snapshot}
+
+
+async def test_get_inline_snapshot_reuses_cached_order(monkeypatch: MonkeyPatch) -> None:
+    async def get_media(category_ids: list[int]) -> list[CategoryMediaSummary]:
+        raise AssertionError("cached snapshot must not read the catalog")
+
+    monkeypatch.setattr(inline_images, "get_category_media_summaries", get_media)
+    monkeypatch.setattr(inline_images.cache, "get", lambda *, key, cls: _async_result([3, 1, 2]))
+
+    assert await inline_images.get_inline_snapshot([_subscription_type()], seed="seed") == [3, 1, 2]
+
+
+async def test_get_inline_page_keeps_snapshot_order_and_resolves_only_pending_urls(
     monkeypatch: MonkeyPatch,
 ) -> None:
-    media = [_media(1, file_id="telegram-file-id"), _media(2)]
+    media = [_media(1, file_id="telegram-file-id"), _media(2), _media(3, subscription_type_id=1)]
     requested_paths: list[str] = []
 
-    async def get_media(category_ids: list[int]) -> list[CategoryMedia]:
-        assert category_ids == [2]
+    async def get_media(media_ids: list[int]) -> list[CategoryMedia]:
+        assert media_ids == [2, 3, 4, 1]
         return media
 
     async def get_urls(paths: Iterable[str]) -> list[str | None]:
         requested_paths.extend(paths)
         return [f"https://storage.example/{path}" for path in requested_paths]
 
-    monkeypatch.setattr(inline_images, "get_category_media_by_subscription_types", get_media)
-    monkeypatch.setattr(inline_images, "get_download_urls", get_urls)
+    monkeypatch.setattr(inline_images, "get_category_media_by_ids", get_media)
+    monkeypatch.setattr(download_urls, "get_yandex_download_urls", get_urls)
+    cached_urls = _patch_download_url_cache(monkeypatch)
 
     subscription_type = _subscription_type()
-    assert await inline_images.get_inline_images([subscription_type]) == [
-        (
-            subscription_type,
-            CachedMedia(
-                name="1.png",
-                mime_type="image/png",
-                path="day/1.png",
-                source_revision="sha256:1",
-                id="telegram-file-id",
-            ),
-        ),
+    assert await inline_images.get_inline_page([subscription_type], [2, 3, 4, 1]) == [
         (
             subscription_type,
             LinkedMedia(
@@ -52,46 +100,33 @@ async def test_get_inline_images_uses_catalog_ids_and_resolves_only_pending_urls
                 url="https://storage.example/day/2.png",
             ),
         ),
+        (
+            subscription_type,
+            CachedMedia(
+                name="1.png",
+                mime_type="image/png",
+                path="day/1.png",
+                source_revision="sha256:1",
+                id="telegram-file-id",
+            ),
+        ),
     ]
     assert requested_paths == ["day/2.png"]
+    assert cached_urls == {"download-url:sha256:2:day/2.png": "https://storage.example/day/2.png"}
 
 
-async def test_get_inline_images_limits_before_resolving_urls(monkeypatch: MonkeyPatch) -> None:
-    media = [_media(index) for index in range(52)]
-    requested_paths: list[str] = []
-
-    async def get_urls(paths: Iterable[str]) -> list[str | None]:
-        requested_paths.extend(paths)
-        return [f"https://storage.example/{path}" for path in requested_paths]
-
-    monkeypatch.setattr(
-        inline_images,
-        "get_category_media_by_subscription_types",
-        lambda category_ids: _async_result(media),
-    )
-    monkeypatch.setattr(inline_images, "get_download_urls", get_urls)
-
-    results = await inline_images.get_inline_images([_subscription_type()])
-
-    assert len(results) == inline_images.MAX_INLINE_QUERY_RESULTS
-    assert requested_paths == [f"day/{index}.png" for index in range(50)]
-
-
-async def test_get_inline_images_skips_only_missing_download_url(monkeypatch: MonkeyPatch) -> None:
+async def test_get_inline_page_skips_only_missing_download_url(monkeypatch: MonkeyPatch) -> None:
     media = [_media(1), _media(2)]
+    monkeypatch.setattr(inline_images, "get_category_media_by_ids", lambda media_ids: _async_result(media))
     monkeypatch.setattr(
-        inline_images,
-        "get_category_media_by_subscription_types",
-        lambda category_ids: _async_result(media),
-    )
-    monkeypatch.setattr(
-        inline_images,
-        "get_download_urls",
+        download_urls,
+        "get_yandex_download_urls",
         lambda paths: _async_result(["https://storage.example/day/1.png", None]),
     )
+    _patch_download_url_cache(monkeypatch)
 
     subscription_type = _subscription_type()
-    assert await inline_images.get_inline_images([subscription_type]) == [
+    assert await inline_images.get_inline_page([subscription_type], [1, 2]) == [
         (
             subscription_type,
             LinkedMedia(
@@ -105,16 +140,88 @@ async def test_get_inline_images_skips_only_missing_download_url(monkeypatch: Mo
     ]
 
 
+async def test_get_inline_page_caps_yandex_lookups_and_prefetches_the_rest(monkeypatch: MonkeyPatch) -> None:
+    media = [_media(media_id) for media_id in range(1, 16)]
+    requested_paths: list[list[str]] = []
+
+    async def get_urls(paths: Iterable[str]) -> list[str | None]:
+        paths = list(paths)
+        requested_paths.append(paths)
+        return [f"https://storage.example/{path}" for path in paths]
+
+    monkeypatch.setattr(inline_images, "get_category_media_by_ids", lambda media_ids: _async_result(media))
+    monkeypatch.setattr(download_urls, "get_yandex_download_urls", get_urls)
+    monkeypatch.setattr(inline_images, "MAX_INLINE_PENDING_RESOLVES", 3)
+    cached_urls = _patch_download_url_cache(
+        monkeypatch,
+        {"download-url:sha256:1:day/1.png": "https://cache.example/day/1.png"},
+    )
+
+    results = await inline_images.get_inline_page(
+        [_subscription_type()],
+        list(range(1, 11)),
+        prefetch_ids=list(range(9, 16)),
+    )
+    await asyncio.gather(*inline_images._background_tasks)
+
+    assert [cast(LinkedMedia, image).url for _, image in results] == [
+        "https://cache.example/day/1.png",
+        *(f"https://storage.example/day/{media_id}.png" for media_id in range(2, 5)),
+    ]
+    assert ["day/2.png", "day/3.png", "day/4.png"] in requested_paths
+    assert sorted(path for paths in requested_paths for path in paths) == sorted(
+        f"day/{media_id}.png" for media_id in range(2, 16)
+    )
+    assert len(cached_urls) == 15
+    assert not inline_images._prefetching_paths
+
+
 async def _async_result[T](value: T) -> T:
     return value
 
 
-def _media(media_id: int, *, file_id: str | None = None) -> CategoryMedia:
+def _patch_download_url_cache(monkeypatch: MonkeyPatch, cached_urls: dict[str, str] | None = None) -> dict[str, str]:
+    cached_urls = {} if cached_urls is None else cached_urls
+
+    async def get_many(*, keys: list[str], cls: type[str]) -> list[str | None]:
+        return [cached_urls.get(key) for key in keys]
+
+    async def set_many(*, values: dict[str, str], cls: type[str], ttl: timedelta) -> None:
+        assert ttl == download_urls.DOWNLOAD_URL_TTL
+        cached_urls.update(values)
+
+    monkeypatch.setattr(download_urls.cache, "get_many", get_many)
+    monkeypatch.setattr(download_urls.cache, "set_many", set_many)
+    return cached_urls
+
+
+def _summary(
+    media_id: int,
+    *,
+    is_ready: bool = False,
+    subscription_type_id: int = 2,
+    source_path: str | None = None,
+) -> CategoryMediaSummary:
+    return CategoryMediaSummary(
+        id=media_id,
+        subscription_type_id=subscription_type_id,
+        source_path=source_path or f"day/{media_id}.png",
+        is_ready=is_ready,
+    )
+
+
+def _media(
+    media_id: int,
+    *,
+    file_id: str | None = None,
+    subscription_type_id: int = 2,
+    source_path: str | None = None,
+) -> CategoryMedia:
     now = datetime(2026, 8, 19, tzinfo=UTC)
     return CategoryMedia(
         id=media_id,
-        subscription_type_id=2,
-        source_path=f"day/{media_id}.png",
+        subscription_type_id=subscription_type_id,
+        source_path=source_path or f"day/{media_id}.png",
         source_revision=f"sha256:{media_id}",
         name=f"{media_id}.png",
         mime_type="image/png",
@@ -130,11 +237,11 @@ def _media(media_id: int, *, file_id: str | None = None) -> CategoryMedia:
     )
 
 
-def _subscription_type() -> SubscriptionType:
+def _subscription_type(subscription_type_id: int = 2, name: str = "/day") -> SubscriptionType:
     now = datetime(2026, 8, 19, tzinfo=UTC)
     return SubscriptionType(
-        id=2,
-        name="/day",
+        id=subscription_type_id,
+        name=name,
         time=time(13),
         s3_directory_path="day",
         search_aliases=(),
@@ -0,0 +1,84 @@
+from typing import Any
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.methods import SendAnimation, SendPhoto
+
+from cringe_pics_telebot.bot import media
+from cringe_pics_telebot.services.random_image import CachedMedia, LinkedMedia
+
+
+def test_prepared_send_matches_direct_request() -> None:
+    prepared = media.prepare_image_send(_cached("photo-file-id"))
+
+    assert prepared.for_chat(42) == SendPhoto(chat_id=42, photo="photo-file-id")
+    assert prepared.for_chat(43).chat_id == 43
+    assert prepared.request.chat_id == 0
+
+
+def test_animation_is_prepared_as_animation_request() -> None:
+    image = LinkedMedia(
+        name="1.gif",
+        mime_type="image/gif",
+        path="day/1.gif",
+        source_revision="sha256:1",
+        url="https://media.test/1.gif",
+    )
+
+    assert media.prepare_image_send(image).for_chat(42) == SendAnimation(
+        chat_id=42, animation="https://media.test/1.gif"
+    )
+
+
+async def test_send_plan_prepares_each_image_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    prepare = _CountingPrepare()
+    monkeypatch.setattr(media, "prepare_image_send", prepare)
+    bot = AsyncMock()
+    plan = media.ImageSendPlan()
+
+    for chat_id in range(10):
+        await plan.send(bot=bot, chat_id=chat_id, image=_cached("first" if chat_id % 2 else "second"))
+
+    assert prepare.calls == 2
+    assert [call.args[0].chat_id for call in bot.await_args_list] == list(range(10))
+
+
+async def test_send_plan_validates_request_once_and_copies_it_per_chat(monkeypatch: pytest.MonkeyPatch) -> None:
+    built: list[_CountingSendPhoto] = []
+
+    class _CountingSendPhoto(SendPhoto):
+        def __init__(self, **kwargs: Any) -> None:
+            super().__init__(**kwargs)
+            built.append(self)
+
+    monkeypatch.setattr(media, "SendPhoto", _CountingSendPhoto)
+    bot = AsyncMock()
+    plan = media.ImageSendPlan()
+
+    for chat_id in range(1, 101):
+        await plan.send(bot=bot, chat_id=chat_id, image=_cached("photo-file-id"))
+
+    assert len(built) == 1
+    sent = [call.args[0] for call in bot.await_args_list]
+    assert [request.chat_id for request in sent] == list(range(1, 101))
+    assert {request.photo for request in sent} == {"photo-file-id"}
+    assert built[0].chat_id == 0
+
+
+class _CountingPrepare:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, image: LinkedMedia | CachedMedia) -> media.PreparedImageSend:
+        self.calls += 1
+        return media.PreparedImageSend(SendPhoto(chat_id=0, photo=image.name))
+
+
+def _cached(file_id: str) -> CachedMedia:
+    return CachedMedia(
+        name=f"{file_id}.png",
+        mime_type="image/png",
+        path=f"day/{file_id}.png",
+        source_revision=f"sha256:{file_id}",
+        id=file_id,
+    )
@@ -0,0 +1,136 @@
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock
+from uuid import UUID
+
+import pytest
+
+from cringe_pics_telebot.repositories.postgres import CategoryMediaSource, TelegramMediaType
+from cringe_pics_telebot.services import media_catalog
+
+
+class _Transactions:
+    def __init__(self) -> None:
+        self.active = False
+        self.opened = 0
+
+    @asynccontextmanager
+    async def __call__(self) -> AsyncGenerator[None]:
+        assert not self.active
+        self.active = True
+        self.opened += 1
+        try:
+            yield
+        finally:
+            self.active = False
+
+
+async def test_snapshot_is_staged_chunk_by_chunk_in_short_transactions(monkeypatch: pytest.MonkeyPatch) -> None:
+    transactions = _Transactions()
+    read_in_transaction: list[bool] = []
+    staged: list[list[str]] = []
+    run_ids: set[UUID] = set()
+    merged_in_transaction: list[bool] = []
+
+    async def sources():
+        for index in range(5):
+            read_in_transaction.append(transactions.active)
+            yield _source(index)
+
+    async def stage(*, sync_run_id: UUID, sources: list[CategoryMediaSource]) -> None:
+        assert transactions.active
+        run_ids.add(sync_run_id)
+        staged.append([source.source_path for source in sources])
+
+    async def on_merged() -> None:
+        merged_in_transaction.append(transactions.active)
+
+    merge = AsyncMock(return_value=object())
+    delete = AsyncMock()
+    monkeypatch.setattr(media_catalog, "transaction", transactions)
+    monkeypatch.setattr(media_catalog, "stage_category_media_sources", stage)
+    monkeypatch.setattr(media_catalog, "merge_staged_category_media", merge)
+    monkeypatch.setattr(media_catalog, "delete_staged_category_media", delete)
+    seen_at = datetime(2026, 10, 18, tzinfo=UTC)
+
+    result = await media_catalog.reconcile_category_media_snapshot(
+        subscription_type_id=1,
+        sources=sources(),
+        seen_at=seen_at,
+        chunk_size=2,
+        on_merged=on_merged,
+    )
+
+    assert result is merge.return_value
+    assert read_in_transaction == [False] * 5
+    assert staged == [["day/0.png", "day/1.png"], ["day/2.png", "day/3.png"], ["day/4.png"]]
+    (run_id,) = run_ids
+    merge.assert_awaited_once_with(sync_run_id=run_id, subscription_type_id=1, seen_at=seen_at)
+    assert merged_in_transaction == [True]
+    assert delete.await_args_list[0].kwargs["sync_run_id"] == run_id
+    # три порции, слияние и очистка — каждая своей транзакцией
+    assert transactions.opened == 5
+
+
+async def test_long_snapshot_is_never_held_in_memory_whole(monkeypatch: pytest.MonkeyPatch) -> None:
+    produced = 0
+    staged = 0
+    max_buffered = 0
+
+    async def sources():
+        nonlocal produced, max_buffered
+        for index in range(10_000):
+            produced += 1
+            max_buffered = max(max_buffered, produced - staged)
+            yield _source(index)
+
+    async def stage(*, sync_run_id: UUID, sources: list[CategoryMediaSource]) -> None:
+        nonlocal staged
+        staged += len(sources)
+
+    monkeypatch.setattr(media_catalog, "transaction", _Transactions())
+    monkeypatch.setattr(media_catalog, "stage_category_media_sources", stage)
+    monkeypatch.setattr(media_catalog, "merge_staged_category_media", AsyncMock())
+    monkeypatch.setattr(media_catalog, "delete_staged_category_media", AsyncMock())
+
+    await media_catalog.reconcile_category_media_snapshot(subscription_type_id=1, sources=sources(), chunk_size=100)
+
+    assert staged == 10_000
+    assert max_buffered == 100
+
+
+async def test_failed_snapshot_read_discards_staged_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def sources():
+        for index in range(3):
+            yield _source(index)
+        raise ConnectionError("Yandex Disk listing failed")
+
+    stage = AsyncMock()
+    merge = AsyncMock()
+    delete = AsyncMock()
+    monkeypatch.setattr(media_catalog, "transaction", _Transactions())
+    monkeypatch.setattr(media_catalog, "stage_category_media_sources", stage)
+    monkeypatch.setattr(media_catalog, "merge_staged_category_media", merge)
+    monkeypatch.setattr(media_catalog, "delete_staged_category_media", delete)
+
+    with pytest.raises(ConnectionError):
+        await media_catalog.reconcile_category_media_snapshot(
+            subscription_type_id=1,
+            sources=sources(),
+            chunk_size=2,
+        )
+
+    assert stage.await_count == 1
+    merge.assert_not_awaited()
+    assert delete.await_args_list[0].kwargs["sync_run_id"] == stage.await_args_list[0].kwargs["sync_run_id"]
+
+
+def _source(index: int) -> CategoryMediaSource:
+    return CategoryMediaSource(
+        source_path=f"day/{index}.png",
+        source_revision=f"sha256:{index}",
+        name=f"{index}.png",
+        mime_type="image/png",
+        telegram_media_type=TelegramMediaType.photo,
+    )
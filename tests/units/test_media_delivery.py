@@ -1,6 +1,6 @@
 import asyncio
 from contextlib import asynccontextmanager
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from typing import cast
 from unittest.mock import AsyncMock
 
@@ -27,6 +27,14 @@ def no_database_transaction(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(media_delivery, "transaction", transaction)
 
 
+@pytest.fixture(autouse=True)
+def local_materialization_notifications(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def publish(*, channel: str, message: str = "") -> None:
+        media_delivery.notify_materialization_waiters(channel)
+
+    monkeypatch.setattr(media_delivery.cache, "publish", publish)
+
+
 async def test_ready_media_is_sent_without_redis_or_yandex(monkeypatch: pytest.MonkeyPatch) -> None:
     send = AsyncMock(return_value=_message())
     acquire = AsyncMock()
@@ -82,8 +90,8 @@ async def test_concurrent_delivery_uploads_pending_revision_once(monkeypatch: py
     ready = _media(file_id="telegram-file-id")
     owner_started = asyncio.Event()
     allow_owner_to_finish = asyncio.Event()
-    materialized = asyncio.Event()
     acquire_calls = 0
+    waiters_count = 20
 
     async def acquire(**kwargs) -> bool:
         nonlocal acquire_calls
@@ -96,35 +104,142 @@ async def test_concurrent_delivery_uploads_pending_revision_once(monkeypatch: py
             await allow_owner_to_finish.wait()
         return _message()
 
-    async def materialize(**kwargs) -> CategoryMedia:
-        materialized.set()
-        return ready
-
-    async def wait_for_materialization(seconds: float) -> None:
-        await materialized.wait()
-
     monkeypatch.setattr(media_delivery.cache, "set_if_absent", acquire)
     monkeypatch.setattr(media_delivery.cache, "delete_if_value", AsyncMock(return_value=True))
     download = AsyncMock(return_value=["https://media.test/image.png"])
     monkeypatch.setattr(media_delivery, "get_download_urls", download)
     monkeypatch.setattr(media_delivery, "get_message_media_file_ids", lambda message: ("telegram-file-id", "unique"))
-    monkeypatch.setattr(media_delivery, "materialize_category_media", materialize)
-    monkeypatch.setattr(media_delivery, "get_category_media", AsyncMock(return_value=ready))
+    monkeypatch.setattr(media_delivery, "materialize_category_media", AsyncMock(return_value=ready))
+    get_media = AsyncMock(return_value=ready)
+    monkeypatch.setattr(media_delivery, "get_category_media", get_media)
 
     owner = asyncio.create_task(media_delivery.deliver_category_media(pending, send=send))
     await owner_started.wait()
-    waiter = asyncio.create_task(
-        media_delivery.deliver_category_media(
-            pending,
-            send=send,
-            sleep=wait_for_materialization,
-        )
-    )
+    waiters = [
+        asyncio.create_task(media_delivery.deliver_category_media(pending, send=send)) for _ in range(waiters_count)
+    ]
+    await asyncio.sleep(0)
     allow_owner_to_finish.set()
-    await asyncio.gather(owner, waiter)
+    await asyncio.gather(owner, *waiters)
 
     download.assert_awaited_once()
-    assert acquire_calls == 2
+    # остальные корутины процесса получают результат ведущей, не обращаясь к Redis и базе
+    assert acquire_calls == 1
+    get_media.assert_not_awaited()
+    assert media_delivery._in_flight == {}
+
+
+async def test_local_callers_share_one_wait_for_another_instance(monkeypatch: pytest.MonkeyPatch) -> None:
+    pending = _media()
+    ready = _media(file_id="telegram-file-id")
+    callers_count = 20
+    acquire = AsyncMock(return_value=False)
+    monkeypatch.setattr(media_delivery.cache, "set_if_absent", acquire)
+    get_media = AsyncMock(return_value=ready)
+    monkeypatch.setattr(media_delivery, "get_category_media", get_media)
+    send = AsyncMock(return_value=_message())
+
+    callers = [
+        asyncio.create_task(media_delivery.deliver_category_media(pending, send=send)) for _ in range(callers_count)
+    ]
+    while not acquire.await_count:
+        await asyncio.sleep(0)
+    # владелец аренды в другом процессе закончил загрузку
+    media_delivery.notify_materialization_waiters(media_delivery._materialization_lease_key(pending))
+    await asyncio.gather(*callers)
+
+    acquire.assert_awaited_once()
+    get_media.assert_awaited_once_with(pending.id)
+    assert send.await_count == callers_count
+    assert all(isinstance(call.args[0], CachedMedia) for call in send.await_args_list)
+    assert media_delivery._waiters == {}
+    assert media_delivery._in_flight == {}
+
+
+async def test_failed_owner_does_not_fail_local_followers(monkeypatch: pytest.MonkeyPatch) -> None:
+    pending = _media()
+    owner_started = asyncio.Event()
+    allow_owner_to_fail = asyncio.Event()
+    sends = 0
+
+    async def send(image: LinkedMedia | CachedMedia) -> Message:
+        nonlocal sends
+        sends += 1
+        if sends == 1:
+            owner_started.set()
+            await allow_owner_to_fail.wait()
+            raise RuntimeError("owner chat is unavailable")
+        return _message()
+
+    monkeypatch.setattr(media_delivery.cache, "set_if_absent", AsyncMock(return_value=True))
+    monkeypatch.setattr(media_delivery.cache, "delete_if_value", AsyncMock(return_value=True))
+    monkeypatch.setattr(media_delivery, "get_download_urls", AsyncMock(return_value=["https://media.test/image.png"]))
+    monkeypatch.setattr(media_delivery, "get_message_media_file_ids", lambda message: ("telegram-file-id", "unique"))
+    monkeypatch.setattr(
+        media_delivery,
+        "materialize_category_media",
+        AsyncMock(return_value=_media(file_id="telegram-file-id")),
+    )
+    get_media = AsyncMock(return_value=pending)
+    monkeypatch.setattr(media_delivery, "get_category_media", get_media)
+
+    owner = asyncio.create_task(media_delivery.deliver_category_media(pending, send=send))
+    await owner_started.wait()
+    follower = asyncio.create_task(media_delivery.deliver_category_media(pending, send=send))
+    await asyncio.sleep(0)
+    allow_owner_to_fail.set()
+
+    with pytest.raises(RuntimeError):
+        await owner
+    await follower
+    get_media.assert_awaited_once_with(pending.id)
+    assert sends == 2
+
+
+async def test_waiter_rechecks_media_without_notification(monkeypatch: pytest.MonkeyPatch) -> None:
+    ready = _media(file_id="telegram-file-id")
+    send = AsyncMock(return_value=_message())
+    monkeypatch.setattr(media_delivery.cache, "set_if_absent", AsyncMock(return_value=False))
+    get_media = AsyncMock(return_value=ready)
+    monkeypatch.setattr(media_delivery, "get_category_media", get_media)
+
+    await media_delivery.deliver_category_media(_media(), send=send, recheck_interval=timedelta(milliseconds=1))
+
+    get_media.assert_awaited_once_with(ready.id)
+    assert isinstance(send.await_args_list[0].args[0], CachedMedia)
+    assert media_delivery._waiters == {}
+
+
+async def test_notifications_listener_wakes_waiters_of_published_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    channels: asyncio.Queue[str] = asyncio.Queue()
+    subscribed = asyncio.Event()
+
+    @asynccontextmanager
+    async def listen(pattern: str):
+        assert pattern == "media-materialization:*"
+
+        async def receive():
+            while True:
+                yield await channels.get()
+
+        subscribed.set()
+        yield receive()
+
+    monkeypatch.setattr(media_delivery.cache, "listen", listen)
+    listener = asyncio.create_task(media_delivery.run_materialization_notifications())
+    await subscribed.wait()
+    try:
+        with (
+            media_delivery._wait_for_materialization("media-materialization:1:rev-1") as notified,
+            media_delivery._wait_for_materialization("media-materialization:2:rev-1") as other,
+        ):
+            await channels.put("media-materialization:1:rev-1")
+            await asyncio.wait_for(notified, timeout=1)
+            assert not other.done()
+    finally:
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
 
 
 async def test_invalid_file_id_is_cleared_and_retried_once(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -154,6 +269,23 @@ async def test_invalid_file_id_is_cleared_and_retried_once(monkeypatch: pytest.M
     assert isinstance(send.await_args_list[1].args[0], LinkedMedia)
 
 
+async def test_rejected_download_url_is_dropped_from_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    error = TelegramBadRequest(
+        method=SendPhoto(chat_id=1, photo="https://media.test/image.png"),
+        message="Bad Request: failed to get HTTP URL content",
+    )
+    monkeypatch.setattr(media_delivery.cache, "set_if_absent", AsyncMock(return_value=True))
+    monkeypatch.setattr(media_delivery.cache, "delete_if_value", AsyncMock(return_value=True))
+    monkeypatch.setattr(media_delivery, "get_download_urls", AsyncMock(return_value=["https://media.test/image.png"]))
+    forget = AsyncMock()
+    monkeypatch.setattr(media_delivery, "forget_download_url", forget)
+
+    with pytest.raises(TelegramBadRequest):
+        await media_delivery.deliver_category_media(_media(), send=AsyncMock(side_effect=error))
+
+    forget.assert_awaited_once_with(_media())
+
+
 async def test_cancellation_releases_owner_lease_without_materializing(monkeypatch: pytest.MonkeyPatch) -> None:
     async def cancel_send(image: LinkedMedia | CachedMedia) -> Message:
         raise asyncio.CancelledError
@@ -1,15 +1,19 @@
 import asyncio
+from collections.abc import AsyncGenerator, AsyncIterable, Awaitable, Callable, Iterable
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime, time, timedelta
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 
 from cringe_pics_telebot.repositories.postgres import (
     CategoryMediaReconcileResult,
+    CategoryMediaSource,
+    CategoryMediaSyncState,
     SubscriptionType,
     TelegramMediaType,
 )
-from cringe_pics_telebot.repositories.yandex import Image
+from cringe_pics_telebot.repositories.yandex import DirectoryInfo, Image
 from cringe_pics_telebot.services import media_sync
 
 
@@ -24,7 +28,59 @@ async def test_runner_synchronizes_immediately_then_waits(monkeypatch: pytest.Mo
     with pytest.raises(asyncio.CancelledError):
         await media_sync.run_media_sync(sleep=cancel_during_sleep)
 
-    synchronize.assert_awaited_once_with()
+    synchronize.assert_awaited_once_with(full_reconcile_interval=None)
+
+
+async def test_runner_picks_up_recent_uploads_between_catalog_passes(monkeypatch: pytest.MonkeyPatch) -> None:
+    synchronize = AsyncMock()
+    recent_uploads = AsyncMock()
+    monkeypatch.setattr(media_sync, "synchronize_media_catalog", synchronize)
+    monkeypatch.setattr(media_sync, "synchronize_recent_uploads", recent_uploads)
+    now = 0.0
+    sleeps = 0
+
+    async def sleep(seconds: float) -> None:
+        nonlocal now, sleeps
+        assert seconds == 300
+        now += seconds
+        sleeps += 1
+        if sleeps == 5:
+            raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        await media_sync.run_media_sync(
+            interval=timedelta(minutes=15),
+            full_reconcile_interval=timedelta(hours=12),
+            recent_uploads_interval=timedelta(minutes=5),
+            recent_uploads_limit=20,
+            sleep=sleep,
+            clock=lambda: now,
+        )
+
+    assert synchronize.await_count == 2
+    synchronize.assert_awaited_with(full_reconcile_interval=timedelta(hours=12))
+    assert recent_uploads.await_count == 3
+    recent_uploads.assert_awaited_with(limit=20)
+
+
+async def test_runner_calls_after_sync_only_when_this_instance_synchronized(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    summaries = [media_sync.MediaSyncSummary(acquired=True), media_sync.MediaSyncSummary(acquired=False)]
+    monkeypatch.setattr(media_sync, "synchronize_media_catalog", AsyncMock(side_effect=summaries))
+    after_sync = AsyncMock()
+    sleeps = 0
+
+    async def sleep(seconds: float) -> None:
+        nonlocal sleeps
+        sleeps += 1
+        if sleeps == 2:
+            raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        await media_sync.run_media_sync(after_sync=after_sync, sleep=sleep, clock=lambda: sleeps * 43_200)
+
+    after_sync.assert_awaited_once_with()
 
 
 async def test_synchronization_isolates_category_failures(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -41,16 +97,7 @@ async def test_synchronization_isolates_category_failures(monkeypatch: pytest.Mo
         yield _image("day/image.gif", mime_type="image/gif")
 
     monkeypatch.setattr(media_sync, "list_dir", list_images)
-    reconcile = AsyncMock(
-        return_value=CategoryMediaReconcileResult(
-            discovered=1,
-            created=1,
-            changed=0,
-            reactivated=0,
-            deactivated=0,
-            unchanged=0,
-        )
-    )
+    reconcile, reconciled = _reconcile_mock(_reconcile_result(discovered=1))
     monkeypatch.setattr(media_sync, "reconcile_category_media_snapshot", reconcile)
 
     result = await media_sync.synchronize_media_catalog()
@@ -59,9 +106,7 @@ async def test_synchronization_isolates_category_failures(monkeypatch: pytest.Mo
     assert result.categories == 1
     assert result.failed == 1
     assert result.discovered == result.created == 1
-    await_args = reconcile.await_args
-    assert await_args is not None
-    source = await_args.kwargs["sources"][0]
+    source, *_ = reconciled[1]
     assert source.telegram_media_type is TelegramMediaType.animation
     delete_lease.assert_awaited_once()
 
@@ -77,18 +122,260 @@ async def test_lost_lease_does_not_publish_snapshot(monkeypatch: pytest.MonkeyPa
     monkeypatch.setattr(media_sync.cache, "delete_if_value", AsyncMock(return_value=False))
 
     async def list_images(directory: str):
+        # листинг дольше интервала продления аренды: heartbeat успевает узнать о её потере
+        await asyncio.sleep(0.05)
         yield _image(f"{directory}/image.png")
 
     monkeypatch.setattr(media_sync, "list_dir", list_images)
-    reconcile = AsyncMock()
+    reconcile, reconciled = _reconcile_mock(_reconcile_result(discovered=1))
     monkeypatch.setattr(media_sync, "reconcile_category_media_snapshot", reconcile)
 
-    result = await media_sync.synchronize_media_catalog()
+    result = await media_sync.synchronize_media_catalog(lease_ttl=timedelta(milliseconds=30))
 
     assert result.acquired is True
     assert result.categories == 0
     assert result.failed == 1
-    reconcile.assert_not_awaited()
+    assert reconciled == {}
+
+
+async def test_synchronization_lists_categories_concurrently_with_bounded_workers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    categories = [_subscription_type(index, f"/category-{index}", f"category-{index}") for index in range(5)]
+    monkeypatch.setattr(media_sync, "get_subscription_types", AsyncMock(return_value=categories))
+    monkeypatch.setattr(media_sync.cache, "set_if_absent", AsyncMock(return_value=True))
+    refresh = AsyncMock(return_value=True)
+    monkeypatch.setattr(media_sync.cache, "refresh_if_value", refresh)
+    monkeypatch.setattr(media_sync.cache, "delete_if_value", AsyncMock(return_value=True))
+    listing = 0
+    max_listing = 0
+    all_workers_busy = asyncio.Event()
+
+    async def list_images(directory: str):
+        nonlocal listing, max_listing
+        listing += 1
+        max_listing = max(max_listing, listing)
+        if listing == 2:
+            all_workers_busy.set()
+        await asyncio.wait_for(all_workers_busy.wait(), timeout=1)
+        listing -= 1
+        yield _image(f"{directory}/image.png")
+
+    monkeypatch.setattr(media_sync, "list_dir", list_images)
+    reconcile, _ = _reconcile_mock(_reconcile_result(discovered=1))
+    monkeypatch.setattr(media_sync, "reconcile_category_media_snapshot", reconcile)
+
+    result = await media_sync.synchronize_media_catalog(workers=2)
+
+    assert result.categories == 5
+    assert result.failed == 0
+    assert max_listing == 2
+    refresh.assert_not_awaited()
+
+
+async def test_lease_heartbeat_keeps_lease_while_redis_is_briefly_unavailable(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    now = 0.0
+    refresh = AsyncMock(side_effect=[ConnectionError("Redis is unavailable"), True, False])
+    monkeypatch.setattr(media_sync.cache, "refresh_if_value", refresh)
+    lease = media_sync._MediaSyncLease(token="token", ttl=timedelta(seconds=30), clock=lambda: now)
+    held: list[bool] = []
+
+    async def sleep(seconds: float) -> None:
+        nonlocal now
+        assert seconds == 10
+        now += seconds
+        held.append(lease.held)
+
+    await lease.keep_alive(sleep=sleep)
+
+    assert held == [True, True, True]
+    assert refresh.await_count == 3
+    assert lease.held is False
+
+
+async def test_incremental_sync_skips_folders_with_unchanged_fingerprint(monkeypatch: pytest.MonkeyPatch) -> None:
+    categories = [
+        _subscription_type(1, "unchanged", "unchanged"),
+        _subscription_type(2, "touched", "touched"),
+        _subscription_type(3, "changed", "changed"),
+        _subscription_type(4, "new", "new"),
+    ]
+    listings = {
+        "unchanged": [_image("unchanged/a.png")],
+        "touched": [_image("touched/a.png")],
+        "changed": [_image("changed/a.png"), _image("changed/b.png")],
+        "new": [_image("new/a.png")],
+    }
+    modified = datetime(2026, 10, 18, tzinfo=UTC)
+    reconciled_at = datetime.now(UTC) - timedelta(hours=1)
+    states = [
+        _sync_state(1, "unchanged", modified=modified, listing=listings["unchanged"], reconciled_at=reconciled_at),
+        # время изменения папки сдвинулось, но набор файлов тот же
+        _sync_state(2, "touched", modified=modified, listing=listings["touched"], reconciled_at=reconciled_at),
+        _sync_state(3, "changed", modified=modified, listing=listings["changed"][:1], reconciled_at=reconciled_at),
+    ]
+    _patch_lease(monkeypatch)
+    monkeypatch.setattr(media_sync, "get_subscription_types", AsyncMock(return_value=categories))
+    monkeypatch.setattr(media_sync, "get_category_media_sync_states", AsyncMock(return_value=states))
+
+    async def get_dir_info(directory: str) -> DirectoryInfo:
+        folder_modified = modified if directory == "unchanged" else modified + timedelta(minutes=1)
+        return DirectoryInfo(modified=folder_modified, total=len(listings[directory]))
+
+    listed: list[str] = []
+
+    async def list_images(directory: str):
+        listed.append(directory)
+        for image in listings[directory]:
+            yield image
+
+    monkeypatch.setattr(media_sync, "get_dir_info", get_dir_info)
+    monkeypatch.setattr(media_sync, "list_dir", list_images)
+    reconcile, reconciled = _reconcile_mock(_reconcile_result(discovered=1))
+    monkeypatch.setattr(media_sync, "reconcile_category_media_snapshot", reconcile)
+    save_state = AsyncMock()
+    monkeypatch.setattr(media_sync, "save_category_media_sync_state", save_state)
+
+    result = await media_sync.synchronize_media_catalog(full_reconcile_interval=timedelta(hours=12))
+
+    assert sorted(listed) == ["changed", "new", "touched"]
+    assert sorted(reconciled) == [3, 4]
+    assert [source.source_path for source in reconciled[3]] == ["changed/a.png", "changed/b.png"]
+    assert result.categories == 2
+    assert result.skipped == 2
+    saved = {call.args[0].subscription_type_id: call.args[0] for call in save_state.await_args_list}
+    assert sorted(saved) == [2, 3, 4]
+    assert saved[2].reconciled_at == reconciled_at
+    assert saved[2].folder_modified == modified + timedelta(minutes=1)
+    assert saved[3].reconciled_at > reconciled_at
+
+
+async def test_incremental_sync_forces_full_reconcile_after_interval(monkeypatch: pytest.MonkeyPatch) -> None:
+    images = [_image("day/a.png")]
+    modified = datetime(2026, 10, 18, tzinfo=UTC)
+    stale = _sync_state(
+        1,
+        "day",
+        modified=modified,
+        listing=images,
+        reconciled_at=datetime.now(UTC) - timedelta(hours=13),
+    )
+    _patch_lease(monkeypatch)
+    monkeypatch.setattr(
+        media_sync,
+        "get_subscription_types",
+        AsyncMock(return_value=[_subscription_type(1, "day", "day")]),
+    )
+    monkeypatch.setattr(media_sync, "get_category_media_sync_states", AsyncMock(return_value=[stale]))
+    monkeypatch.setattr(media_sync, "get_dir_info", AsyncMock(return_value=DirectoryInfo(modified=modified, total=1)))
+
+    async def list_images(directory: str):
+        for image in images:
+            yield image
+
+    monkeypatch.setattr(media_sync, "list_dir", list_images)
+    reconcile, reconciled = _reconcile_mock(_reconcile_result(discovered=1))
+    monkeypatch.setattr(media_sync, "reconcile_category_media_snapshot", reconcile)
+    monkeypatch.setattr(media_sync, "save_category_media_sync_state", AsyncMock())
+
+    result = await media_sync.synchronize_media_catalog(full_reconcile_interval=timedelta(hours=12))
+
+    assert list(reconciled) == [1]
+    assert result.categories == 1
+    assert result.skipped == 0
+
+
+async def test_incremental_sync_reads_listing_outside_transaction(monkeypatch: pytest.MonkeyPatch) -> None:
+    in_transaction = False
+    listed_in_transaction: list[bool] = []
+
+    @asynccontextmanager
+    async def transaction() -> AsyncGenerator[None]:
+        nonlocal in_transaction
+        in_transaction = True
+        try:
+            yield
+        finally:
+            in_transaction = False
+
+    async def list_images(directory: str):
+        for image in [_image("day/a.png"), _image("day/b.png")]:
+            listed_in_transaction.append(in_transaction)
+            yield image
+
+    _patch_lease(monkeypatch)
+    monkeypatch.setattr(media_sync, "transaction", transaction)
+    monkeypatch.setattr(
+        media_sync,
+        "get_subscription_types",
+        AsyncMock(return_value=[_subscription_type(1, "day", "day")]),
+    )
+    monkeypatch.setattr(media_sync, "get_category_media_sync_states", AsyncMock(return_value=[]))
+    monkeypatch.setattr(
+        media_sync,
+        "get_dir_info",
+        AsyncMock(return_value=DirectoryInfo(modified=datetime(2026, 10, 18, tzinfo=UTC), total=2)),
+    )
+    monkeypatch.setattr(media_sync, "list_dir", list_images)
+    reconcile, reconciled = _reconcile_mock(_reconcile_result(discovered=2))
+    monkeypatch.setattr(media_sync, "reconcile_category_media_snapshot", reconcile)
+    monkeypatch.setattr(media_sync, "save_category_media_sync_state", AsyncMock())
+
+    await media_sync.synchronize_media_catalog(full_reconcile_interval=timedelta(hours=12))
+
+    assert listed_in_transaction == [False, False]
+    assert [source.source_path for source in reconciled[1]] == ["day/a.png", "day/b.png"]
+
+
+async def test_recent_uploads_are_added_to_categories_by_folder(monkeypatch: pytest.MonkeyPatch) -> None:
+    _patch_lease(monkeypatch)
+    monkeypatch.setattr(
+        media_sync,
+        "get_last_uploaded",
+        AsyncMock(
+            return_value=[
+                _image("day/new.png"),
+                _image("night/new.gif", mime_type="image/gif"),
+                _image("day/nested/skipped.png"),
+                _image("unknown/skipped.png"),
+            ]
+        ),
+    )
+    monkeypatch.setattr(
+        media_sync,
+        "get_subscription_types",
+        AsyncMock(
+            return_value=[
+                _subscription_type(1, "day", "/day/"),
+                _subscription_type(2, "night", "night"),
+                _subscription_type(3, "empty", "empty"),
+            ]
+        ),
+    )
+    add_sources = AsyncMock(side_effect=[1, 0])
+    monkeypatch.setattr(media_sync, "add_category_media_sources", add_sources)
+    invalidate = Mock()
+    monkeypatch.setattr(media_sync, "invalidate_random_image_index", invalidate)
+
+    result = await media_sync.synchronize_recent_uploads(limit=10)
+
+    added = {call.kwargs["subscription_type_id"]: call.kwargs["sources"] for call in add_sources.await_args_list}
+    assert [source.source_path for source in added[1]] == ["day/new.png"]
+    assert [source.telegram_media_type for source in added[2]] == [TelegramMediaType.animation]
+    assert result.categories == 2
+    assert result.discovered == 2
+    assert result.created == 1
+    invalidate.assert_called_once_with(1)
+
+
+def test_listing_digest_does_not_depend_on_listing_order() -> None:
+    images = [_image(f"day/{index}.png") for index in range(3)]
+
+    assert _listing_hash(images) == _listing_hash(images[::-1])
+    assert _listing_hash(images) != _listing_hash(images[:2])
+    assert _listing_hash(images[:1]) != _listing_hash([_image("day/0.png", revision="sha256:other")])
 
 
 @pytest.mark.parametrize("interval", [timedelta(0), timedelta(seconds=-1)])
@@ -110,10 +397,81 @@ def _subscription_type(subscription_type_id: int, name: str, directory: str) ->
     )
 
 
-def _image(path: str, *, mime_type: str = "image/png") -> Image:
+def _patch_lease(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(media_sync.cache, "set_if_absent", AsyncMock(return_value=True))
+    monkeypatch.setattr(media_sync.cache, "refresh_if_value", AsyncMock(return_value=True))
+    monkeypatch.setattr(media_sync.cache, "delete_if_value", AsyncMock(return_value=True))
+    monkeypatch.setattr(media_sync, "transaction", _transaction)
+
+
+@asynccontextmanager
+async def _transaction() -> AsyncGenerator[None]:
+    yield
+
+
+def _sync_state(
+    subscription_type_id: int,
+    directory: str,
+    *,
+    modified: datetime,
+    listing: list[Image],
+    reconciled_at: datetime,
+) -> CategoryMediaSyncState:
+    return CategoryMediaSyncState(
+        subscription_type_id=subscription_type_id,
+        directory_path=directory,
+        folder_modified=modified,
+        item_count=len(listing),
+        listing_hash=_listing_hash(listing),
+        reconciled_at=reconciled_at,
+        checked_at=reconciled_at,
+    )
+
+
+def _listing_hash(listing: list[Image]) -> str:
+    digest = media_sync._ListingDigest()
+    for image in listing:
+        digest.add(image)
+    return digest.hexdigest()
+
+
+def _reconcile_mock(
+    result: CategoryMediaReconcileResult,
+) -> tuple[AsyncMock, dict[int, list[CategoryMediaSource]]]:
+    """Сверка, которая дочитывает поток снимка; в словарь попадают только снимки, прочитанные без ошибок"""
+    reconciled: dict[int, list[CategoryMediaSource]] = {}
+
+    async def reconcile(
+        *,
+        subscription_type_id: int,
+        sources: Iterable[CategoryMediaSource] | AsyncIterable[CategoryMediaSource],
+        seen_at: datetime | None = None,
+        on_merged: Callable[[], Awaitable[None]] | None = None,
+    ) -> CategoryMediaReconcileResult:
+        staged = list(sources) if isinstance(sources, Iterable) else [source async for source in sources]
+        reconciled[subscription_type_id] = staged
+        if on_merged is not None:
+            await on_merged()
+        return result
+
+    return AsyncMock(side_effect=reconcile), reconciled
+
+
+def _reconcile_result(*, discovered: int) -> CategoryMediaReconcileResult:
+    return CategoryMediaReconcileResult(
+        discovered=discovered,
+        created=discovered,
+        changed=0,
+        reactivated=0,
+        deactivated=0,
+        unchanged=0,
+    )
+
+
+def _image(path: str, *, mime_type: str = "image/png", revision: str | None = None) -> Image:
     return Image(
         name=path.rsplit("/", maxsplit=1)[-1],
         mime_type=mime_type,
         path=path,
-        source_revision=f"sha256:{path}",
+        source_revision=revision or f"sha256:{path}",
     )
@@ -0,0 +1,127 @@
+from datetime import UTC, datetime, timedelta
+from typing import cast
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot
+
+from cringe_pics_telebot.bot.rate_limit import SendPriority, _send_priority
+from cringe_pics_telebot.repositories.postgres import (
+    CategoryMedia,
+    CategoryMediaStatus,
+    TelegramMediaType,
+)
+from cringe_pics_telebot.services import media_warmup
+from cringe_pics_telebot.services.random_image import LinkedMedia
+
+
+@pytest.fixture(autouse=True)
+def reset_cursor() -> None:
+    media_warmup.reset_warm_up_cursor()
+
+
+async def test_warm_up_uploads_pending_media_into_warmup_chat_at_bulk_priority(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    pending = [_media(1), _media(2), _media(3)]
+    get_pending = AsyncMock(return_value=pending)
+    monkeypatch.setattr(media_warmup, "get_pending_category_media", get_pending)
+    sent: list[tuple[int, int, SendPriority]] = []
+
+    async def send_image_to_chat(*, bot: Bot, chat_id: int, image: LinkedMedia) -> object:
+        sent.append((chat_id, int(image.path.removeprefix("day/").removesuffix(".png")), _send_priority.get()))
+        return object()
+
+    async def deliver(media: CategoryMedia, *, send) -> object:
+        if media.id == 2:
+            raise RuntimeError("Yandex is unavailable")
+        return await send(
+            LinkedMedia(
+                name=media.name,
+                mime_type=media.mime_type,
+                path=media.source_path,
+                source_revision=media.source_revision,
+                url="https://media.test/image.png",
+            )
+        )
+
+    monkeypatch.setattr(media_warmup, "send_image_to_chat", send_image_to_chat)
+    monkeypatch.setattr(media_warmup, "deliver_category_media", deliver)
+    sleep = AsyncMock()
+
+    warmed = await media_warmup.warm_up_pending_media(
+        cast(Bot, object()),
+        chat_id=-100,
+        batch_size=3,
+        interval=timedelta(milliseconds=500),
+        sleep=sleep,
+    )
+
+    assert warmed == 2
+    assert sent == [(-100, 1, SendPriority.bulk), (-100, 3, SendPriority.bulk)]
+    assert [call.args for call in sleep.await_args_list] == [(0.5,), (0.5,)]
+    get_pending.assert_awaited_once_with(limit=3, after_id=0)
+
+
+async def test_failed_batch_does_not_block_newer_pending_media(monkeypatch: pytest.MonkeyPatch) -> None:
+    queue = [_media(media_id) for media_id in range(1, 6)]
+    get_pending = AsyncMock(
+        side_effect=lambda *, limit, after_id: [media for media in queue if media.id > after_id][:limit]
+    )
+    monkeypatch.setattr(media_warmup, "get_pending_category_media", get_pending)
+    delivered: list[int] = []
+
+    async def deliver(media: CategoryMedia, *, send) -> object:
+        if media.id <= 2:
+            raise RuntimeError("File was deleted from Yandex Disk")
+        delivered.append(media.id)
+        return object()
+
+    monkeypatch.setattr(media_warmup, "deliver_category_media", deliver)
+
+    async def warm_up() -> int:
+        bot = cast(Bot, object())
+        return await media_warmup.warm_up_pending_media(bot, chat_id=-100, batch_size=2, sleep=AsyncMock())
+
+    assert await warm_up() == 0
+    assert await warm_up() == 2
+    assert await warm_up() == 1
+    # очередь пройдена до конца: следующий проход снова пробует неудачные файлы
+    assert await warm_up() == 0
+    assert delivered == [3, 4, 5]
+    assert [call.kwargs["after_id"] for call in get_pending.await_args_list] == [0, 2, 4, 0]
+
+
+@pytest.mark.parametrize(
+    ("batch_size", "interval"),
+    [(0, timedelta(seconds=1)), (1, timedelta(seconds=-1))],
+)
+async def test_warm_up_rejects_invalid_settings(batch_size: int, interval: timedelta) -> None:
+    with pytest.raises(ValueError):
+        await media_warmup.warm_up_pending_media(
+            cast(Bot, object()),
+            chat_id=-100,
+            batch_size=batch_size,
+            interval=interval,
+        )
+
+
+def _media(media_id: int) -> CategoryMedia:
+    now = datetime(2026, 10, 18, tzinfo=UTC)
+    return CategoryMedia(
+        id=media_id,
+        subscription_type_id=1,
+        source_path=f"day/{media_id}.png",
+        source_revision=f"sha256:{media_id}",
+        name=f"{media_id}.png",
+        mime_type="image/png",
+        telegram_media_type=TelegramMediaType.photo,
+        telegram_file_id=None,
+        telegram_file_unique_id=None,
+        is_active=True,
+        status=CategoryMediaStatus.pending,
+        last_seen_at=now,
+        materialized_at=None,
+        created_at=now,
+        updated_at=now,
+    )
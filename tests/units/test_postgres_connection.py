@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.pool import QueuePool
+
+from cringe_pics_telebot.repositories.postgres import (
+    ListenUnavailableError,
+    PoolSettings,
+    connect,
+    get_pool_stats,
+    listen,
+)
+from cringe_pics_telebot.repositories.postgres.connection import _connect_args
+
+
+async def test_connect_applies_pool_settings_without_opening_connections() -> None:
+    async with connect(
+        username="user",
+        password="password",
+        database="database",
+        port=5432,
+        host="127.0.0.1",
+        pool=PoolSettings(pool_size=3, max_overflow=2, pool_timeout=timedelta(seconds=5)),
+    ) as (engine, _):
+        stats = get_pool_stats()
+
+        assert isinstance(engine.pool, QueuePool)
+        assert engine.pool.timeout() == 5
+        assert stats.size == 3
+        assert stats.checked_out == 0
+        assert stats.overflow == -3
+        assert stats.checkouts == 0
+        assert stats.max_wait == timedelta(0)
+
+
+def test_pgbouncer_mode_disables_prepared_statement_caches() -> None:
+    connect_args = _connect_args(PoolSettings(statement_cache_size=500, pgbouncer=True))
+
+    assert connect_args["prepared_statement_cache_size"] == 0
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_name_func"]() != connect_args["prepared_statement_name_func"]()
+    assert _connect_args(PoolSettings(statement_cache_size=500)) == {
+        "prepared_statement_cache_size": 500,
+        "statement_cache_size": 500,
+    }
+
+
+async def test_listen_is_unavailable_through_pgbouncer() -> None:
+    async with connect(
+        username="user",
+        password="password",
+        database="database",
+        port=5432,
+        host="127.0.0.1",
+        pool=PoolSettings(pgbouncer=True),
+    ):
+        with pytest.raises(ListenUnavailableError):
+            async with listen("subscription_types_changed"):
+                pass
@@ -0,0 +1,162 @@
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from cringe_pics_telebot.repositories.postgres import (
+    CategoryMedia,
+    CategoryMediaStatus,
+    TelegramMediaType,
+)
+from cringe_pics_telebot.services import hot_media, random_image
+
+
+@pytest.fixture(autouse=True)
+def empty_index() -> None:
+    random_image.clear_random_image_index()
+    hot_media.clear_hot_media()
+
+
+async def test_random_image_loads_category_ids_once_and_fetches_single_row(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_ids = AsyncMock(return_value=[1, 2, 3])
+    get_media = AsyncMock(side_effect=_get_media_by_ids)
+    monkeypatch.setattr(random_image, "get_category_media_ids", get_ids)
+    monkeypatch.setattr(random_image, "get_category_media_by_ids", get_media)
+
+    first = await random_image.get_random_image(2)
+    second = await random_image.get_random_image(2)
+
+    assert {first.id, second.id} <= {1, 2, 3}
+    get_ids.assert_awaited_once_with([2])
+    assert [len(call.args[0]) for call in get_media.await_args_list] == [1, 1]
+
+
+async def test_random_images_draw_independent_picks_with_one_row_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_media = AsyncMock(side_effect=_get_media_by_ids)
+    monkeypatch.setattr(random_image, "get_category_media_ids", AsyncMock(return_value=[1, 2]))
+    monkeypatch.setattr(random_image, "get_category_media_by_ids", get_media)
+
+    media = await random_image.get_random_images(2, 100)
+
+    assert len(media) == 100
+    assert {item.id for item in media} <= {1, 2}
+    get_media.assert_awaited_once()
+
+
+async def test_random_images_skip_queries_for_zero_count(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_ids = AsyncMock()
+    monkeypatch.setattr(random_image, "get_category_media_ids", get_ids)
+
+    assert await random_image.get_random_images(2, 0) == []
+    get_ids.assert_not_awaited()
+
+
+async def test_random_image_reloads_index_after_stale_pick(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_ids = AsyncMock(side_effect=[[1], [2]])
+    monkeypatch.setattr(random_image, "get_category_media_ids", get_ids)
+    monkeypatch.setattr(
+        random_image,
+        "get_category_media_by_ids",
+        AsyncMock(side_effect=lambda media_ids: [_media(media_id) for media_id in media_ids if media_id != 1]),
+    )
+
+    media = await random_image.get_random_image(2)
+
+    assert media.id == 2
+    assert get_ids.await_count == 2
+
+
+async def test_random_image_rejects_media_from_another_category(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(random_image, "get_category_media_ids", AsyncMock(return_value=[1]))
+    monkeypatch.setattr(
+        random_image,
+        "get_category_media_by_ids",
+        AsyncMock(return_value=[_media(1, subscription_type_id=3)]),
+    )
+
+    with pytest.raises(random_image.RandomImageUnavailableError):
+        await random_image.get_random_image(2)
+
+
+async def test_random_image_does_not_cache_empty_category(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_ids = AsyncMock(side_effect=[[], [5]])
+    monkeypatch.setattr(random_image, "get_category_media_ids", get_ids)
+    monkeypatch.setattr(random_image, "get_category_media_by_ids", AsyncMock(side_effect=_get_media_by_ids))
+
+    with pytest.raises(IndexError):
+        await random_image.get_random_image(2)
+    assert (await random_image.get_random_image(2)).id == 5
+
+
+async def test_invalidation_drops_category_and_catalog_indexes(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_ids = AsyncMock(return_value=[1])
+    monkeypatch.setattr(random_image, "get_category_media_ids", get_ids)
+    monkeypatch.setattr(random_image, "get_category_media_by_ids", AsyncMock(side_effect=_get_media_by_ids))
+
+    await random_image.get_random_image(2)
+    await random_image.get_random_image()
+    random_image.invalidate_random_image_index(2)
+    await random_image.get_random_image(2)
+    await random_image.get_random_image()
+
+    assert [call.args for call in get_ids.await_args_list] == [([2],), (None,), ([2],), (None,)]
+
+
+async def test_materialized_media_is_served_without_row_query(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_media = AsyncMock(side_effect=lambda media_ids: [_media(media_id, file_id="file-id") for media_id in media_ids])
+    monkeypatch.setattr(random_image, "get_category_media_ids", AsyncMock(return_value=[1]))
+    monkeypatch.setattr(random_image, "get_category_media_by_ids", get_media)
+
+    await random_image.get_random_image(2)
+    media = await random_image.get_random_images(2, 10)
+
+    assert {item.telegram_file_id for item in media} == {"file-id"}
+    get_media.assert_awaited_once_with([1])
+
+
+async def test_pending_media_is_read_from_database_every_time(monkeypatch: pytest.MonkeyPatch) -> None:
+    get_media = AsyncMock(side_effect=_get_media_by_ids)
+    monkeypatch.setattr(random_image, "get_category_media_ids", AsyncMock(return_value=[1]))
+    monkeypatch.setattr(random_image, "get_category_media_by_ids", get_media)
+
+    await random_image.get_random_image(2)
+    await random_image.get_random_image(2)
+
+    assert get_media.await_count == 2
+
+
+def _get_media_by_ids(media_ids: list[int]) -> list[CategoryMedia]:
+    return [_media(media_id) for media_id in sorted(set(media_ids))]
+
+
+def _media(
+    media_id: int,
+    *,
+    subscription_type_id: int = 2,
+    is_active: bool = True,
+    file_id: str | None = None,
+) -> CategoryMedia:
+    now = datetime(2026, 8, 19, tzinfo=UTC)
+    return CategoryMedia(
+        id=media_id,
+        subscription_type_id=subscription_type_id,
+        source_path=f"day/{media_id}.png",
+        source_revision=f"sha256:{media_id}",
+        name=f"{media_id}.png",
+        mime_type="image/png",
+        telegram_media_type=TelegramMediaType.photo,
+        telegram_file_id=file_id,
+        telegram_file_unique_id=file_id,
+        is_active=is_active,
+        status=(
+            CategoryMediaStatus.inactive
+            if not is_active
+            else CategoryMediaStatus.pending
+            if file_id is None
+            else CategoryMediaStatus.ready
+        ),
+        last_seen_at=now,
+        materialized_at=None if file_id is None else now,
+        created_at=now,
+        updated_at=now,
+    )
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetMe, SendMessage
+from pytest import MonkeyPatch
+
+from cringe_pics_telebot.bot import rate_limit
+from cringe_pics_telebot.bot.rate_limit import TelegramRateLimitMiddleware, TelegramRateLimits, bulk_sends
+from cringe_pics_telebot.repositories.redis import RateLimitBucket
+
+
+async def test_rate_limit_waits_until_token_is_available(monkeypatch: MonkeyPatch) -> None:
+    waits = [timedelta(milliseconds=250), timedelta(0)]
+    taken: list[list[RateLimitBucket]] = []
+    sleeps: list[float] = []
+
+    async def take_rate_limit_token(*, pause_key: str, buckets: list[RateLimitBucket]) -> timedelta:
+        taken.append(buckets)
+        return waits.pop(0)
+
+    async def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(rate_limit.cache, "take_rate_limit_token", take_rate_limit_token)
+    middleware = TelegramRateLimitMiddleware(sleep=sleep)
+    requests: list[SendMessage] = []
+
+    async def make_request(bot: object, method: SendMessage) -> str:
+        requests.append(method)
+        return "sent"
+
+    result = await middleware(make_request, object(), SendMessage(chat_id=42, text="hi"))  # type: ignore[arg-type]
+
+    assert result == "sent"
+    assert sleeps == [0.25]
+    assert len(requests) == 1
+    assert [bucket.key for bucket in taken[0]] == ["telegram-rate-limit:global", "telegram-rate-limit:chat:42"]
+    assert taken[0][0].reserve == 0
+    assert taken[0][1].rate == 1
+
+
+async def test_bulk_sends_keep_interactive_reserve_and_group_rate(monkeypatch: MonkeyPatch) -> None:
+    taken: list[list[RateLimitBucket]] = []
+
+    async def take_rate_limit_token(*, pause_key: str, buckets: list[RateLimitBucket]) -> timedelta:
+        taken.append(buckets)
+        return timedelta(0)
+
+    async def make_request(bot: object, method: SendMessage) -> str:
+        return "sent"
+
+    monkeypatch.setattr(rate_limit.cache, "take_rate_limit_token", take_rate_limit_token)
+    middleware = TelegramRateLimitMiddleware(TelegramRateLimits(interactive_reserve=7))
+
+    with bulk_sends():
+        await middleware(make_request, object(), SendMessage(chat_id=-100, text="hi"))  # type: ignore[arg-type]
+    await middleware(make_request, object(), SendMessage(chat_id=42, text="hi"))  # type: ignore[arg-type]
+
+    assert taken[0][0].reserve == 7
+    assert taken[0][1].rate == pytest.approx(20 / 60)
+    assert taken[1][0].reserve == 0
+
+
+async def test_retry_after_is_shared_and_request_is_retried(monkeypatch: MonkeyPatch) -> None:
+    pauses: list[timedelta] = []
+    attempts = 0
+
+    async def take_rate_limit_token(*, pause_key: str, buckets: list[RateLimitBucket]) -> timedelta:
+        return timedelta(0)
+
+    async def pause_rate_limit(*, pause_key: str, ttl: timedelta) -> None:
+        pauses.append(ttl)
+
+    async def make_request(bot: object, method: SendMessage) -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=3)
+        return "sent"
+
+    monkeypatch.setattr(rate_limit.cache, "take_rate_limit_token", take_rate_limit_token)
+    monkeypatch.setattr(rate_limit.cache, "pause_rate_limit", pause_rate_limit)
+    middleware = TelegramRateLimitMiddleware()
+
+    result = await middleware(make_request, object(), SendMessage(chat_id=42, text="hi"))  # type: ignore[arg-type]
+
+    assert result == "sent"
+    assert attempts == 2
+    assert pauses == [timedelta(seconds=3)]
+
+
+async def test_rate_limit_sends_without_limit_when_redis_fails(monkeypatch: MonkeyPatch) -> None:
+    async def take_rate_limit_token(*, pause_key: str, buckets: list[RateLimitBucket]) -> timedelta:
+        raise ConnectionError("redis is down")
+
+    async def make_request(bot: object, method: SendMessage) -> str:
+        return "sent"
+
+    monkeypatch.setattr(rate_limit.cache, "take_rate_limit_token", take_rate_limit_token)
+
+    result = await TelegramRateLimitMiddleware()(make_request, object(), SendMessage(chat_id=42, text="hi"))  # type: ignore[arg-type]
+
+    assert result == "sent"
+
+
+async def test_methods_without_chat_are_not_limited(monkeypatch: MonkeyPatch) -> None:
+    async def take_rate_limit_token(*, pause_key: str, buckets: list[RateLimitBucket]) -> timedelta:
+        raise AssertionError("Methods without chat_id must not take rate limit tokens")
+
+    async def make_request(bot: object, method: GetMe) -> str:
+        return "me"
+
+    monkeypatch.setattr(rate_limit.cache, "take_rate_limit_token", take_rate_limit_token)
+
+    assert await TelegramRateLimitMiddleware()(make_request, object(), GetMe()) == "me"  # type: ignore[arg-type]
+
+
+async def test_throttled_bulk_sends_poll_redis_one_at_a_time(monkeypatch: MonkeyPatch) -> None:
+    polling = 0
+    max_polling = 0
+    calls = 0
+
+    async def take_rate_limit_token(*, pause_key: str, buckets: list[RateLimitBucket]) -> timedelta:
+        nonlocal polling, max_polling, calls
+        calls += 1
+        polling += 1
+        max_polling = max(max_polling, polling)
+        await asyncio.sleep(0)
+        polling -= 1
+        return timedelta(milliseconds=10) if calls % 2 else timedelta(0)
+
+    async def sleep(seconds: float) -> None:
+        await asyncio.sleep(0)
+
+    async def make_request(bot: object, method: SendMessage) -> str:
+        return "sent"
+
+    monkeypatch.setattr(rate_limit.cache, "take_rate_limit_token", take_rate_limit_token)
+    middleware = TelegramRateLimitMiddleware(sleep=sleep)
+
+    with bulk_sends():
+        results = await asyncio.gather(
+            *(
+                middleware(make_request, object(), SendMessage(chat_id=chat_id, text="hi"))  # type: ignore[arg-type]
+                for chat_id in range(1, 51)
+            )
+        )
+
+    assert results == ["sent"] * 50
+    assert max_polling == 1
+    # каждый получатель ждёт своей очереди локально и делает не больше двух запросов к Redis
+    assert calls == 100
@@ -0,0 +1,161 @@
+import hashlib
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, cast
+
+from pytest import MonkeyPatch
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from redis.connection import Encoder
+from redis.exceptions import NoScriptError
+
+from cringe_pics_telebot.repositories.redis import repo
+
+
+async def test_set_many_if_absent_pipelines_chunks_and_preserves_key_order(monkeypatch: MonkeyPatch) -> None:
+    client = _FakeRedis(existing={"key-1", "key-4"})
+
+    @asynccontextmanager
+    async def get_connection() -> AsyncGenerator[_FakeRedis]:
+        yield client
+
+    monkeypatch.setattr(repo, "get_connection", get_connection)
+    monkeypatch.setattr(repo, "PIPELINE_CHUNK_SIZE", 2)
+
+    result = await repo.set_many_if_absent(
+        keys=[f"key-{index}" for index in range(5)],
+        value=True,
+        cls=bool,
+        ttl=timedelta(minutes=2),
+    )
+
+    assert result == [True, False, True, True, False]
+    assert client.executed_batches == [2, 2, 1]
+    assert client.values == {f"key-{index}": "true" for index in (0, 2, 3)}
+    assert client.ttls == {timedelta(minutes=2)}
+
+
+async def test_set_many_if_absent_skips_connection_for_empty_input(monkeypatch: MonkeyPatch) -> None:
+    @asynccontextmanager
+    async def unexpected_connection() -> AsyncGenerator[None]:
+        raise AssertionError("Empty input must not open a Redis connection")
+        yield
+
+    monkeypatch.setattr(repo, "get_connection", unexpected_connection)
+
+    assert await repo.set_many_if_absent(keys=[], value=True, cls=bool) == []
+
+
+async def test_set_many_and_get_many_round_trip_in_chunks(monkeypatch: MonkeyPatch) -> None:
+    client = _FakeRedis(existing=set())
+
+    @asynccontextmanager
+    async def get_connection() -> AsyncGenerator[_FakeRedis]:
+        yield client
+
+    monkeypatch.setattr(repo, "get_connection", get_connection)
+    monkeypatch.setattr(repo, "PIPELINE_CHUNK_SIZE", 2)
+
+    await repo.set_many(values={"key-0": "zero", "key-2": "two", "key-3": "three"}, cls=str, ttl=timedelta(minutes=2))
+
+    assert await repo.get_many(keys=[f"key-{index}" for index in range(4)], cls=str) == [
+        "zero",
+        None,
+        "two",
+        "three",
+    ]
+    assert client.executed_batches == [2, 1]
+    assert client.mget_batches == [2, 2]
+    assert client.ttls == {timedelta(minutes=2)}
+
+
+async def test_rate_limit_script_is_loaded_once_and_called_by_sha(monkeypatch: MonkeyPatch) -> None:
+    client = _FakeScriptRedis()
+
+    @asynccontextmanager
+    async def get_connection() -> AsyncGenerator[_FakeScriptRedis]:
+        yield client
+
+    monkeypatch.setattr(repo, "get_connection", get_connection)
+    monkeypatch.setattr(repo, "_scripts", {})
+    buckets = [repo.RateLimitBucket(key="global", rate=30, capacity=30)]
+
+    for _ in range(3):
+        assert await repo.take_rate_limit_token(pause_key="pause", buckets=buckets) == timedelta(milliseconds=0)
+
+    assert client.loaded == [repo._TAKE_RATE_LIMIT_TOKEN_SCRIPT]
+    assert client.calls == [(client.sha, 2, "pause", "global", 30, 30, 0)] * 4
+
+
+class _FakeRedis:
+    def __init__(self, *, existing: set[str]) -> None:
+        self._existing = existing
+        self.values: dict[str, str] = {}
+        self.ttls: set[Any] = set()
+        self.executed_batches: list[int] = []
+        self.mget_batches: list[int] = []
+
+    def pipeline(self, *, transaction: bool) -> _FakePipeline:
+        assert transaction is False
+        return _FakePipeline(self)
+
+    def set(self, *, name: str, value: str, ex: Any, nx: bool = False) -> bool | None:
+        self.ttls.add(ex)
+        if not nx:
+            self.values[name] = value
+            return True
+        if name in self._existing or name in self.values:
+            return None
+        self.values[name] = value
+        return True
+
+    async def mget(self, keys: list[str]) -> list[str | None]:
+        self.mget_batches.append(len(keys))
+        return [self.values.get(key) for key in keys]
+
+
+class _FakePipeline:
+    def __init__(self, client: _FakeRedis) -> None:
+        self._client = client
+        self._commands: list[dict[str, Any]] = []
+
+    async def __aenter__(self) -> _FakePipeline:
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        return None
+
+    def set(self, **kwargs: Any) -> _FakePipeline:
+        self._commands.append(kwargs)
+        return self
+
+    async def execute(self) -> list[bool | None]:
+        self._client.executed_batches.append(len(self._commands))
+        return [self._client.set(**command) for command in self._commands]
+
+
+class _FakeScriptRedis:
+    """Клиент, который, как Redis после рестарта, не знает скрипт до `SCRIPT LOAD`"""
+
+    def __init__(self) -> None:
+        self.connection_pool = self
+        self.loaded: list[str] = []
+        self.calls: list[tuple[Any, ...]] = []
+        self.sha = hashlib.sha1(repo._TAKE_RATE_LIMIT_TOKEN_SCRIPT.encode()).hexdigest()
+
+    def get_encoder(self) -> Encoder:
+        return Encoder(encoding="utf-8", encoding_errors="strict", decode_responses=False)
+
+    def register_script(self, script: str) -> AsyncScript:
+        return AsyncScript(cast(Redis, self), script)
+
+    async def evalsha(self, sha: str, numkeys: int, *args: Any) -> int:
+        self.calls.append((sha, numkeys, *args))
+        if not self.loaded:
+            raise NoScriptError
+        return 0
+
+    async def script_load(self, script: str) -> str:
+        self.loaded.append(script)
+        return self.sha
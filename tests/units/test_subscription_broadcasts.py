@@ -1,38 +1,152 @@
-from datetime import UTC, datetime, time, timedelta, timezone
+import asyncio
+from datetime import UTC, datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 
-from cringe_pics_telebot.services.subscription_broadcasts import _same_local_minute
+from cringe_pics_telebot.repositories.postgres import CategoryMedia
+from cringe_pics_telebot.services import subscription_broadcasts
+from cringe_pics_telebot.services.subscription_broadcasts import _utc_minute_of_day
 
 
 @pytest.mark.parametrize(
-    ("scheduled_time", "current_time", "timezone_offset_minutes", "expected"),
+    ("current_time", "expected"),
     [
-        (time(10, 0), datetime(2026, 8, 16, 3, 0, tzinfo=UTC), 7 * 60, True),
-        (time(10, 0), datetime(2026, 8, 16, 3, 0, tzinfo=UTC), 4 * 60, False),
-        (time(10, 0), datetime(2026, 8, 16, 6, 0, tzinfo=UTC), 4 * 60, True),
-        (time(23, 30), datetime(2026, 8, 17, 4, 30, tzinfo=UTC), -5 * 60, True),
-        (time(1, 15), datetime(2026, 8, 16, 11, 15, tzinfo=UTC), 14 * 60, True),
-        (
-            time(10, 0, tzinfo=timezone(timedelta(hours=9))),
-            datetime(2026, 8, 16, 3, 0, tzinfo=UTC),
-            7 * 60,
-            True,
-        ),
-        (time(10, 0), datetime(2026, 8, 16, 3, 1, tzinfo=UTC), 7 * 60, False),
+        (datetime(2026, 8, 16, 0, 0, tzinfo=UTC), 0),
+        (datetime(2026, 8, 16, 3, 0, 45, tzinfo=UTC), 3 * 60),
+        (datetime(2026, 8, 16, 23, 59, tzinfo=UTC), 1439),
+        (datetime(2026, 8, 16, 10, 0, tzinfo=timezone(timedelta(hours=7))), 3 * 60),
+        (datetime(2026, 8, 16, 1, 15, tzinfo=timezone(timedelta(hours=14))), 11 * 60 + 15),
+        (datetime(2026, 8, 16, 4, 30), 4 * 60 + 30),
     ],
 )
-def test_same_local_minute(
-    scheduled_time: time,
-    current_time: datetime,
-    timezone_offset_minutes: int,
-    expected: bool,
+def test_utc_minute_of_day(current_time: datetime, expected: int) -> None:
+    assert _utc_minute_of_day(current_time) == expected
+
+
+async def test_broadcast_sends_through_bounded_worker_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def deliver(media: CategoryMedia, *, send: object) -> None:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+
+    async def reserve(*, keys: list[str], value: bool, cls: type[bool], ttl: timedelta) -> list[bool]:
+        return [True] * len(keys)
+
+    user_ids = {1: list(range(100)), 2: list(range(100, 150))}
+    monkeypatch.setattr(subscription_broadcasts, "get_due_subscription_user_ids", AsyncMock(return_value=user_ids))
+    monkeypatch.setattr(
+        subscription_broadcasts,
+        "get_subscription_types",
+        AsyncMock(return_value=[Mock(id=1), Mock(id=2)]),
+    )
+    monkeypatch.setattr(subscription_broadcasts.cache, "set_many_if_absent", reserve)
+    monkeypatch.setattr(
+        subscription_broadcasts,
+        "get_random_images",
+        AsyncMock(side_effect=lambda category_id, count: [Mock(id=index) for index in range(count)]),
+    )
+    monkeypatch.setattr(subscription_broadcasts, "deliver_category_media", deliver)
+
+    sent = await subscription_broadcasts.run_due_subscription_broadcasts(
+        Mock(),
+        now=datetime(2026, 8, 16, 3, 0, tzinfo=UTC),
+        send_workers=4,
+    )
+
+    assert sent == 150
+    assert max_in_flight == 4
+
+
+async def test_scheduler_does_not_wait_for_slow_passes(monkeypatch: pytest.MonkeyPatch) -> None:
+    ticks = iter(
+        [
+            datetime(2026, 8, 16, 3, 0, tzinfo=UTC),
+            datetime(2026, 8, 16, 3, 0, 30, tzinfo=UTC),
+            datetime(2026, 8, 16, 3, 1, tzinfo=UTC),
+            # цикл событий простоял две минуты
+            datetime(2026, 8, 16, 3, 4, 5, tzinfo=UTC),
+        ]
+    )
+    current_time = next(ticks)
+    started: list[tuple[datetime, datetime | None]] = []
+    stalled = asyncio.Event()
+    done = asyncio.Event()
+
+    async def run_due(bot: object, *, current_time: datetime, reserve_before: datetime | None, **kwargs: object) -> int:
+        started.append((current_time, reserve_before))
+        await stalled.wait()
+        return 0
+
+    async def sleep(seconds: float) -> None:
+        nonlocal current_time
+        await asyncio.sleep(0)
+        try:
+            current_time = next(ticks)
+        except StopIteration:
+            done.set()
+            await asyncio.Event().wait()
+
+    monkeypatch.setattr(subscription_broadcasts, "_run_due_subscription_broadcasts", run_due)
+    scheduler = asyncio.create_task(
+        subscription_broadcasts.run_subscription_broadcasts(Mock(), now=lambda: current_time, sleep=sleep)
+    )
+    await done.wait()
+    await asyncio.sleep(0)
+    scheduler.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await scheduler
+
+    assert [pass_time for pass_time, _ in started] == [
+        datetime(2026, 8, 16, 3, 0, tzinfo=UTC),
+        datetime(2026, 8, 16, 3, 0, 30, tzinfo=UTC),
+        datetime(2026, 8, 16, 3, 1, tzinfo=UTC),
+        datetime(2026, 8, 16, 3, 2, tzinfo=UTC),
+        datetime(2026, 8, 16, 3, 3, tzinfo=UTC),
+        datetime(2026, 8, 16, 3, 4, 5, tzinfo=UTC),
+    ]
+    assert started[-1][1] == datetime(2026, 8, 16, 3, 4, tzinfo=UTC) + subscription_broadcasts._DEDUPE_TTL
+
+
+def test_missed_minutes_are_caught_up_within_limit() -> None:
+    previous = datetime(2026, 8, 16, 3, 0, tzinfo=UTC)
+
+    assert subscription_broadcasts._missed_minutes(None, previous) == ([], 0)
+    assert subscription_broadcasts._missed_minutes(previous, datetime(2026, 8, 16, 3, 1, tzinfo=UTC)) == ([], 0)
+    assert subscription_broadcasts._missed_minutes(previous, datetime(2026, 8, 16, 3, 3, tzinfo=UTC)) == (
+        [datetime(2026, 8, 16, 3, 1, tzinfo=UTC), datetime(2026, 8, 16, 3, 2, tzinfo=UTC)],
+        0,
+    )
+    minutes, dropped = subscription_broadcasts._missed_minutes(previous, datetime(2026, 8, 16, 5, 0, tzinfo=UTC))
+    assert minutes[0] == datetime(2026, 8, 16, 4, 50, tzinfo=UTC)
+    assert len(minutes) == 10
+    assert dropped == 109
+
+
+async def test_late_pass_does_not_reserve_sends(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
 ) -> None:
-    assert (
-        _same_local_minute(
-            scheduled_time,
-            current_time,
-            timezone_offset_minutes=timezone_offset_minutes,
-        )
-        is expected
+    reserve = AsyncMock()
+    monkeypatch.setattr(
+        subscription_broadcasts,
+        "get_due_subscription_user_ids",
+        AsyncMock(return_value={1: [10, 11]}),
     )
+    monkeypatch.setattr(subscription_broadcasts, "get_subscription_types", AsyncMock(return_value=[Mock(id=1)]))
+    monkeypatch.setattr(subscription_broadcasts.cache, "set_many_if_absent", reserve)
+    monkeypatch.setattr(subscription_broadcasts, "_now", lambda: datetime(2026, 8, 16, 3, 11, tzinfo=UTC))
+
+    sent = await subscription_broadcasts.run_due_subscription_broadcasts(
+        Mock(),
+        now=datetime(2026, 8, 16, 3, 0, tzinfo=UTC),
+        reserve_before=datetime(2026, 8, 16, 3, 0, tzinfo=UTC) + subscription_broadcasts._DEDUPE_TTL,
+    )
+
+    assert sent == 0
+    reserve.assert_not_awaited()
+    assert "Dropped subscription broadcast for 2 users" in caplog.text
@@ -0,0 +1,134 @@
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, time
+
+import pytest
+from pytest import MonkeyPatch
+
+from cringe_pics_telebot.repositories.postgres import ListenUnavailableError, SubscriptionType
+from cringe_pics_telebot.services import subscriptions
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache() -> None:
+    subscriptions.invalidate_subscription_types_cache()
+
+
+async def test_subscription_types_are_cached_until_invalidated(monkeypatch: MonkeyPatch) -> None:
+    calls = 0
+
+    async def get_subscription_types_pg() -> list[SubscriptionType]:
+        nonlocal calls
+        calls += 1
+        return [_subscription_type(calls)]
+
+    monkeypatch.setattr(subscriptions, "get_subscription_types_pg", get_subscription_types_pg)
+
+    assert [st.id for st in await subscriptions.get_subscription_types()] == [1]
+    assert [st.id for st in await subscriptions.get_subscription_types()] == [1]
+    assert calls == 1
+
+    subscriptions.invalidate_subscription_types_cache()
+
+    assert [st.id for st in await subscriptions.get_subscription_types()] == [2]
+    assert calls == 2
+
+
+async def test_invalidation_during_load_discards_loaded_list(monkeypatch: MonkeyPatch) -> None:
+    calls = 0
+
+    async def get_subscription_types_pg() -> list[SubscriptionType]:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            subscriptions.invalidate_subscription_types_cache()
+        return [_subscription_type(calls)]
+
+    monkeypatch.setattr(subscriptions, "get_subscription_types_pg", get_subscription_types_pg)
+
+    assert [st.id for st in await subscriptions.get_subscription_types()] == [1]
+    assert [st.id for st in await subscriptions.get_subscription_types()] == [2]
+    assert [st.id for st in await subscriptions.get_subscription_types()] == [2]
+    assert calls == 2
+
+
+async def test_listener_invalidates_cache_on_notification(monkeypatch: MonkeyPatch) -> None:
+    notifications: asyncio.Queue[str] = asyncio.Queue()
+    calls = 0
+
+    async def get_subscription_types_pg() -> list[SubscriptionType]:
+        nonlocal calls
+        calls += 1
+        return [_subscription_type(calls)]
+
+    @asynccontextmanager
+    async def listen(channel: str) -> AsyncGenerator[AsyncIterator[str]]:
+        async def receive() -> AsyncIterator[str]:
+            while True:
+                yield await notifications.get()
+
+        yield receive()
+
+    monkeypatch.setattr(subscriptions, "get_subscription_types_pg", get_subscription_types_pg)
+    monkeypatch.setattr(subscriptions, "listen", listen)
+    listener = asyncio.create_task(subscriptions.run_subscription_types_invalidation())
+    try:
+        await asyncio.sleep(0)
+        assert [st.id for st in await subscriptions.get_subscription_types()] == [1]
+
+        notifications.put_nowait("UPDATE")
+        await asyncio.sleep(0)
+
+        assert [st.id for st in await subscriptions.get_subscription_types()] == [2]
+    finally:
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+
+
+async def test_listener_stops_when_notifications_are_unavailable(
+    monkeypatch: MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    @asynccontextmanager
+    async def listen(channel: str) -> AsyncGenerator[AsyncIterator[str]]:
+        raise ListenUnavailableError(channel)
+        yield
+
+    monkeypatch.setattr(subscriptions, "listen", listen)
+
+    await asyncio.wait_for(subscriptions.run_subscription_types_invalidation(), timeout=1)
+
+    assert "change notifications are unavailable" in caplog.text
+
+
+async def test_search_index_is_rebuilt_only_when_search_terms_change(monkeypatch: MonkeyPatch) -> None:
+    loaded = [[_subscription_type(1)], [_subscription_type(1)], [_subscription_type(1, search_aliases=("утро",))]]
+
+    async def get_subscription_types_pg() -> list[SubscriptionType]:
+        return loaded.pop(0)
+
+    monkeypatch.setattr(subscriptions, "get_subscription_types_pg", get_subscription_types_pg)
+
+    _, first_index = await subscriptions.get_subscription_type_search_index()
+    subscriptions.invalidate_subscription_types_cache()
+    _, same_index = await subscriptions.get_subscription_type_search_index()
+    subscriptions.invalidate_subscription_types_cache()
+    _, changed_index = await subscriptions.get_subscription_type_search_index()
+
+    assert same_index is first_index
+    assert changed_index is not first_index
+    assert changed_index.find("утр") == {1}
+
+
+def _subscription_type(subscription_type_id: int, *, search_aliases: tuple[str, ...] = ()) -> SubscriptionType:
+    return SubscriptionType(
+        id=subscription_type_id,
+        name=f"category-{subscription_type_id}",
+        time=time(10, 0),
+        s3_directory_path="category",
+        search_aliases=search_aliases,
+        created_at=datetime(2026, 8, 17, tzinfo=UTC),
+        updated_at=datetime(2026, 8, 17, tzinfo=UTC),
+    )
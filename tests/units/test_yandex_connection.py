@@ -0,0 +1,63 @@
+from collections.abc import AsyncGenerator
+from time import monotonic
+
+import pytest
+from aiohttp import web
+
+from cringe_pics_telebot.repositories.yandex import connection, repo
+
+
+@pytest.fixture
+async def api_base_url() -> AsyncGenerator[str]:
+    async def download(request: web.Request) -> web.Response:
+        return web.json_response({"href": f"https://storage.example/{request.query['path']}"})
+
+    app = web.Application()
+    app.router.add_get("/v1/disk/resources/download", download)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        yield f"http://{host}:{port}/v1/disk/"
+    finally:
+        await runner.cleanup()
+
+
+async def test_connection_is_shared_and_reuses_sockets(api_base_url: str) -> None:
+    async with connection.connect("token", api_base_url=api_base_url) as client:
+        async with connection.get_connection() as first, connection.get_connection() as second:
+            assert first is second is client
+
+        for _ in range(3):
+            assert await repo.get_download_urls(["day/image.png"]) == ["https://storage.example/app:/day/image.png"]
+
+        stats = connection.get_connection_stats()
+
+    assert stats.requests == 3
+    assert stats.created == 1
+    assert stats.reused == 2
+
+
+async def test_get_connection_requires_connect() -> None:
+    with pytest.raises(connection.NotConnectedError):
+        async with connection.get_connection():
+            pass
+
+
+async def test_connect_rejects_nested_connection(api_base_url: str) -> None:
+    async with connection.connect("token", api_base_url=api_base_url):
+        with pytest.raises(connection.AlreadyConnectedError):
+            async with connection.connect("token", api_base_url=api_base_url):
+                pass
+
+
+async def test_connect_spreads_requests_under_rate_limit(api_base_url: str) -> None:
+    settings = connection.ConnectorSettings(requests_per_second=50)
+    async with connection.connect("token", api_base_url=api_base_url, connector=settings):
+        started_at = monotonic()
+        await repo.get_download_urls([f"day/{index}.png" for index in range(5)])
+        elapsed = monotonic() - started_at
+
+    assert elapsed >= 4 / 50
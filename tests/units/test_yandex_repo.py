@@ -1,11 +1,13 @@
 import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from datetime import UTC, datetime
 
+from aiohttp import web
 from pytest import MonkeyPatch
 
 from cringe_pics_telebot.repositories.yandex import repo
-from cringe_pics_telebot.repositories.yandex.yandex import resource_revision
+from cringe_pics_telebot.repositories.yandex.yandex import YandexS3Client, resource_revision
 
 
 def test_resource_revision_prefers_content_hash() -> None:
@@ -82,6 +84,46 @@ async def test_get_download_urls_skips_connection_for_empty_input(monkeypatch: M
     assert await repo.get_download_urls([]) == []
 
 
+async def test_list_dir_prefetches_next_page_while_current_page_is_consumed() -> None:
+    requested_offsets: list[int] = []
+
+    async def resources(request: web.Request) -> web.Response:
+        offset = int(request.query["offset"])
+        requested_offsets.append(offset)
+        items = [
+            {
+                "path": f"disk:/Приложения/bot/day/{index}.png",
+                "mime_type": "image/png",
+                "modified": "2026-08-19T00:00:00+00:00",
+                "size": 1,
+                "sha256": str(index),
+            }
+            for index in range(offset, min(offset + 2, 5))
+        ]
+        return web.json_response({"_embedded": {"items": items}})
+
+    app = web.Application()
+    app.router.add_get("/v1/disk/resources", resources)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        async with YandexS3Client("token", api_base_url=f"http://{host}:{port}/v1/disk/", fetch_size=2) as client:
+            paths: list[str] = []
+            async for image in client.list_dir("day"):
+                if not paths:
+                    await asyncio.sleep(0.05)
+                    assert requested_offsets == [0, 2]
+                paths.append(image.path)
+    finally:
+        await runner.cleanup()
+
+    assert paths == [f"day/{index}.png" for index in range(5)]
+    assert requested_offsets == [0, 2, 4]
+
+
 class _ControlledYandexClient:
     def __init__(self, paths: list[str], *, broken_path: str | None = None) -> None:
         self._expected_count = len(paths)
@@ -110,3 +152,43 @@ class _ControlledYandexClient:
 
     async def completed(self, path: str) -> None:
         await self._completions[path].wait()
+
+
+async def test_get_dir_info_and_last_uploaded_skip_listing_and_non_images() -> None:
+    async def resources(request: web.Request) -> web.Response:
+        assert request.query["limit"] == "0"
+        assert request.query["fields"] == "modified,_embedded.total"
+        return web.json_response({"modified": "2026-10-18T10:00:00+00:00", "_embedded": {"total": 7}})
+
+    async def last_uploaded(request: web.Request) -> web.Response:
+        assert request.query["media_type"] == "image"
+        items = [
+            {
+                "path": "disk:/Приложения/bot/day/new.png",
+                "mime_type": "image/png",
+                "modified": "2026-10-18T10:00:00+00:00",
+                "size": 1,
+                "sha256": "new",
+            },
+            {"path": "disk:/Приложения/bot/day/notes.txt", "mime_type": "text/plain"},
+        ]
+        return web.json_response({"items": items, "limit": int(request.query["limit"])})
+
+    app = web.Application()
+    app.router.add_get("/v1/disk/resources", resources)
+    app.router.add_get("/v1/disk/resources/last-uploaded", last_uploaded)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        async with YandexS3Client("token", api_base_url=f"http://{host}:{port}/v1/disk/") as client:
+            info = await client.get_dir_info("day")
+            images = await client.last_uploaded(10)
+    finally:
+        await runner.cleanup()
+
+    assert info.total == 7
+    assert info.modified == datetime(2026, 10, 18, 10, tzinfo=UTC)
+    assert [(image.path, image.source_revision) for image in images] == [("day/new.png", "sha256:new")]